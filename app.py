@@ -120,6 +120,7 @@ def system_status():
         "status": "operational",
         "version": "1.0",
         "service": "AdamAI",
+        "embedding": adam.db.embedding_model.stats(),
         "timestamp": datetime.datetime.now().isoformat()
     }), 200
 
@@ -0,0 +1,14 @@
+# Keeps the repository root importable (core.*) when pytest is run directly
+import logging
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _no_app_log_file():
+    """Some modules attach logs/adam_system.log on import; keep test runs out of it"""
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, logging.FileHandler)]:
+        root.removeHandler(handler)
+        handler.close()
+    yield
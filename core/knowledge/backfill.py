@@ -0,0 +1,190 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from .embedding_models import model_key, slot_fields
+from .vector_index import decode_id, encode_id
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = 'core/knowledge/data/backfill_checkpoint.json'
+
+
+class BackfillLease:
+    """
+    Mongo-held lease so only one process (of all gunicorn workers, hosts and
+    CLI runs) backfills at a time. The holder renews it after every batch;
+    a crashed holder's lease expires after `ttl_seconds`.
+    """
+
+    def __init__(self, locks, name: str = "embedding-backfill", ttl_seconds: float = 300):
+        self.locks = locks
+        self.name = name
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self) -> bool:
+        """Take (or renew) the lease unless another live process holds it"""
+        now = datetime.utcnow()
+        try:
+            self.locks.update_one(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + self.ttl}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False  # the lease document exists and belongs to someone else
+
+    renew = acquire
+
+    def release(self):
+        self.locks.delete_one({"_id": self.name, "owner": self.owner})
+
+
+class EmbeddingBackfill:
+    """
+    Resumable job that fills one vector slot with `embedder`'s model: entries
+    missing a vector there, or carrying one from a different model, are
+    processed in _id order in large batches.
+    Each batch is encoded, optionally across worker processes, and written
+    with an unordered bulk_write. The last finished _id is checkpointed to
+    disk, so a killed job resumes where it stopped. `max_rate` (docs/sec)
+    throttles the job so it leaves CPU and database capacity for live traffic.
+    """
+
+    def __init__(self, collection, embedder, checkpoint_path: str = DEFAULT_CHECKPOINT,
+                 batch_size: int = 512, processes: int = 1, max_rate: float = 0.0, slot: str = 'vector'):
+        self.collection = collection
+        self.embedder = embedder
+        self.slot = slot
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.processes = processes
+        self.max_rate = max_rate
+
+    def pending_query(self) -> Dict:
+        """Entries without a vector, or embedded by another model (untagged vectors count as current)"""
+        return {"$or": [
+            {self.slot: None},  # matches missing as well as null
+            {model_key(self.slot): {"$exists": True, "$ne": self.embedder.model_name}}
+        ]}
+
+    def remaining(self) -> int:
+        return self.collection.count_documents(self.pending_query())
+
+    def _load_checkpoint(self) -> Dict:
+        if not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if (checkpoint.get("model"), checkpoint.get("slot")) != (self.embedder.model_name, self.slot):
+            logger.info("Backfill checkpoint is for another model or slot - starting over")
+            return {}
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: Dict):
+        directory = os.path.dirname(self.checkpoint_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+            json.dump(checkpoint, f)
+        os.replace(f.name, self.checkpoint_path)
+
+    def _next_batch(self, last_id) -> List[Dict]:
+        query = self.pending_query()
+        if last_id is not None:
+            query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        return list(self.collection.find(query, {"content": 1}).sort("_id", 1).limit(self.batch_size))
+
+    def run(self, lease: Optional[BackfillLease] = None) -> Dict:
+        """Backfill until no entry is pending (or `lease`, renewed per batch, is lost)"""
+        checkpoint = self._load_checkpoint()
+        last_id = decode_id(checkpoint["last_id"]) if checkpoint.get("last_id") else None
+        done = checkpoint.get("done", 0)
+        if last_id is not None:
+            logger.info(f"Resuming embedding backfill after {done} entries")
+
+        started = time.monotonic()
+        processed = written = 0
+        completed = True
+        pool = self.embedder.start_process_pool(self.processes) if self.processes > 1 else None
+        try:
+            while True:
+                if lease is not None and not lease.renew():
+                    logger.warning("Lost the embedding backfill lease - stopping")
+                    completed = False
+                    break
+                batch = self._next_batch(last_id)
+                if not batch:
+                    break
+                vectors = self.embedder.encode_corpus(
+                    [doc.get('content') or '' for doc in batch], pool=pool
+                )
+                # updated_at lets the polling live index updater pick up the new vectors
+                updated_at = datetime.utcnow()
+                result = self.collection.bulk_write([
+                    UpdateOne({"_id": doc["_id"]}, {"$set": {
+                        **slot_fields(self.slot, vector, self.embedder.model_name), "updated_at": updated_at
+                    }})
+                    for doc, vector in zip(batch, vectors)
+                ], ordered=False)
+
+                last_id = batch[-1]["_id"]
+                done += len(batch)
+                processed += len(batch)
+                written += result.modified_count
+                self._save_checkpoint({
+                    "model": self.embedder.model_name,
+                    "slot": self.slot,
+                    "last_id": encode_id(last_id),
+                    "done": done
+                })
+                self._throttle(processed, started)
+                logger.info(f"Backfilled {done} entries ({processed / (time.monotonic() - started):.1f}/s)")
+        finally:
+            if pool is not None:
+                self.embedder.stop_process_pool(pool)
+
+        if completed and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        elapsed = time.monotonic() - started
+        stats = {
+            "processed": processed,
+            "written": written,
+            "total": done,
+            "seconds": round(elapsed, 1),
+            "per_second": round(processed / elapsed, 1) if elapsed else 0.0
+        }
+        logger.info(f"Embedding backfill complete: {stats}")
+        return stats
+
+    def _throttle(self, processed: int, started: float):
+        """Sleep just long enough to stay under max_rate docs/sec"""
+        if self.max_rate > 0:
+            ahead = processed / self.max_rate - (time.monotonic() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+def main():
+    from .knowledge_db import KnowledgeRetriever
+
+    parser = argparse.ArgumentParser(description="Embed entries that are missing vectors or use another model")
+    parser.add_argument("--batch-size", type=int, help="Entries per encode/write batch (BACKFILL_BATCH_SIZE)")
+    parser.add_argument("--processes", type=int, help="Encode worker processes (BACKFILL_PROCESSES)")
+    parser.add_argument("--max-rate", type=float, help="Throttle to this many entries/sec (BACKFILL_MAX_RATE)")
+    args = parser.parse_args()
+
+    stats = KnowledgeRetriever().backfill_embeddings(args.batch_size, args.processes, args.max_rate)
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
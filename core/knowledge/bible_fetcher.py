@@ -0,0 +1,93 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import BoundedSemaphore, Lock
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BIBLE_API = "https://cdn.jsdelivr.net/gh/wldeh/bible-api/bibles"
+
+
+class BibleFetcher:
+    """
+    Concurrent fetch stage for Bible chapters. Requests share one keep-alive
+    Session (connection pool sized to the thread pool, retry with exponential
+    backoff on 429/5xx) and at most `per_host` of them hit one host at a time.
+    Whole chapters are fetched in one request; if the API has no chapter file,
+    the chapter falls back to verse-by-verse requests until the first 404.
+    `base_url` (BIBLE_API_URL) can point at a local HTTP stand-in for offline benchmarks.
+    """
+
+    def __init__(self, base_url: str = None, max_workers: int = None, per_host: int = None,
+                 retries: int = 4, backoff: float = 0.5, timeout: float = 10.0):
+        self.base_url = (base_url or os.getenv("BIBLE_API_URL", DEFAULT_BIBLE_API)).rstrip('/')
+        self.max_workers = max_workers or int(os.getenv("BIBLE_FETCH_WORKERS", "16"))
+        self.per_host = per_host or int(os.getenv("BIBLE_FETCH_PER_HOST", "8"))
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=self.max_workers,
+            max_retries=Retry(total=retries, backoff_factor=backoff,
+                              status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._host_limits: Dict[str, BoundedSemaphore] = {}
+        self._host_lock = Lock()
+        self.requests = 0
+
+    def _get(self, url: str) -> requests.Response:
+        host = urlparse(url).netloc
+        with self._host_lock:
+            limit = self._host_limits.setdefault(host, BoundedSemaphore(self.per_host))
+            self.requests += 1
+        with limit:
+            return self.session.get(url, timeout=self.timeout)
+
+    def fetch_chapter(self, version: str, book: str, chapter: int) -> List[Dict]:
+        """[{"verse": n, "text": ...}] for one chapter, in verse order"""
+        book_url = f"{self.base_url}/{version}/books/{book.lower()}/chapters/{chapter}"
+        response = self._get(f"{book_url}.json")
+        if response.status_code != 404:
+            response.raise_for_status()
+            payload = response.json()
+            rows = payload.get("data", []) if isinstance(payload, dict) else payload
+            return sorted(({"verse": int(row["verse"]), "text": row["text"]} for row in rows),
+                          key=lambda row: row["verse"])
+
+        verses = []
+        while True:
+            response = self._get(f"{book_url}/verses/{len(verses) + 1}.json")
+            if response.status_code == 404:
+                return verses
+            response.raise_for_status()
+            verses.append({"verse": len(verses) + 1, "text": response.json()["text"]})
+
+    def fetch_books(self, version: str, books: List[Dict]) -> Iterator[Tuple[Dict, int, List[Dict]]]:
+        """
+        Yield (book, chapter, verses) for every chapter of `books`
+        ({"name", "chapters"}) as fetches complete. Failed chapters are
+        logged and skipped.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bible-fetch") as pool:
+            futures = {
+                pool.submit(self.fetch_chapter, version, book["name"], chapter): (book, chapter)
+                for book in books
+                for chapter in range(1, book["chapters"] + 1)
+            }
+            for future in as_completed(futures):
+                book, chapter = futures[future]
+                try:
+                    yield book, chapter, future.result()
+                except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                    logger.error(f"Request failed for {book['name']} {chapter}: {str(e)}")
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,215 @@
+import json
+import logging
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from nltk.stem import PorterStemmer
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from .vector_index import decode_id, encode_id, top_k
+
+logger = logging.getLogger(__name__)
+
+BM25_ARRAYS = 'bm25.npz'
+BM25_META = 'bm25.json'
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_stemmer = PorterStemmer()
+
+
+@lru_cache(maxsize=65536)
+def _stem(word: str) -> str:
+    return _stemmer.stem(word)
+
+
+def analyze(text: str) -> List[str]:
+    """Lower-case, drop stop words and Porter-stem"""
+    return [
+        _stem(token) for token in _TOKEN_PATTERN.findall(text.lower())
+        if token not in ENGLISH_STOP_WORDS and len(token) > 1
+    ]
+
+
+def encode_varints(values: Iterable[int]) -> bytearray:
+    """LEB128-style variable-length encoding of non-negative ints"""
+    out = bytearray()
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return out
+
+
+def decode_varints(data: np.ndarray) -> np.ndarray:
+    """Vectorized inverse of encode_varints over a uint8 array"""
+    if data.size == 0:
+        return np.empty(0, dtype=np.int64)
+    ends = data < 0x80
+    # Group id of every byte and its 7-bit position inside the group
+    group = np.concatenate([[0], np.cumsum(ends)[:-1]])
+    starts = np.concatenate([[0], np.flatnonzero(ends)[:-1] + 1])
+    position = np.arange(data.size) - starts[group]
+    payload = (data & 0x7F).astype(np.int64) << (7 * position)
+    return np.bincount(group, weights=payload).astype(np.int64)
+
+
+class BM25Index:
+    """
+    In-process Okapi BM25 over `entries.content`.
+    Posting lists are stored as varint-encoded (doc gap, term frequency)
+    pairs in one byte blob, addressed by per-term offsets.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], postings: np.ndarray, offsets: np.ndarray,
+                 doc_freq: np.ndarray, doc_lengths: np.ndarray, ids: List,
+                 source_codes: np.ndarray, source_names: List[str], k1: float = 1.2, b: float = 0.75):
+        self.vocabulary = vocabulary
+        self.postings = postings
+        self.offsets = offsets
+        self.doc_freq = doc_freq
+        self.doc_lengths = doc_lengths.astype(np.float32)
+        self.ids = ids
+        self.source_codes = source_codes
+        self.source_names = source_names
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, cursor: Iterable[dict]) -> 'BM25Index':
+        """Build from documents carrying `_id`, `content` and `source`"""
+        vocabulary: Dict[str, int] = {}
+        term_postings: List[List[int]] = []
+        ids, lengths, sources = [], [], []
+        source_names: Dict[str, int] = {}
+
+        for row, doc in enumerate(cursor):
+            terms = analyze(doc.get('content') or '')
+            ids.append(doc['_id'])
+            lengths.append(len(terms))
+            sources.append(source_names.setdefault(doc.get('source', ''), len(source_names)))
+
+            counts: Dict[str, int] = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                term_id = vocabulary.get(term)
+                if term_id is None:
+                    term_id = vocabulary[term] = len(term_postings)
+                    term_postings.append([])
+                term_postings[term_id].extend((row, tf))
+
+        blob = bytearray()
+        offsets = np.zeros(len(term_postings) + 1, dtype=np.int64)
+        doc_freq = np.zeros(len(term_postings), dtype=np.int32)
+        for term_id, flat in enumerate(term_postings):
+            rows, tfs = flat[0::2], flat[1::2]
+            gaps = [rows[0]] + [rows[i] - rows[i - 1] for i in range(1, len(rows))]
+            blob += encode_varints(v for pair in zip(gaps, tfs) for v in pair)
+            offsets[term_id + 1] = len(blob)
+            doc_freq[term_id] = len(rows)
+
+        logger.info(f"Built BM25 index: {len(ids)} docs, {len(vocabulary)} terms, {len(blob)} posting bytes")
+        return cls(
+            vocabulary, np.frombuffer(bytes(blob), dtype=np.uint8), offsets, doc_freq,
+            np.asarray(lengths, dtype=np.float32), ids,
+            np.asarray(sources, dtype=np.int16), list(source_names)
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _posting(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        values = decode_varints(self.postings[self.offsets[term_id]:self.offsets[term_id + 1]])
+        return np.cumsum(values[0::2]), values[1::2].astype(np.float32)
+
+    def _idf(self, df: int) -> float:
+        n = len(self)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, limit: int, source: Optional[str] = None,
+               mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Return (row, BM25 score) pairs, optionally restricted to one source and a row mask"""
+        term_ids = {self.vocabulary[t] for t in analyze(query) if t in self.vocabulary}
+        if not term_ids or not len(self):
+            return []
+
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term_id in term_ids:
+            rows, tf = self._posting(term_id)
+            idf = self._idf(self.doc_freq[term_id])
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[rows] / (self.avg_length or 1))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if source is not None:
+            if source not in self.source_names:
+                return []
+            scores[self.source_codes != self.source_names.index(source)] = 0
+        if mask is not None:
+            scores[~mask] = 0
+
+        rows = [row for row in top_k(scores, limit) if scores[row] > 0]
+        return [(int(row), float(scores[row])) for row in rows]
+
+    def score_documents(self, query: str, documents: List[Dict[str, int]]) -> np.ndarray:
+        """
+        BM25 scores of documents outside the index (given as term -> count),
+        using this index's collection statistics so they rank alongside it.
+        """
+        scores = np.zeros(len(documents), dtype=np.float32)
+        for term in set(analyze(query)):
+            term_id = self.vocabulary.get(term)
+            idf = self._idf(self.doc_freq[term_id] if term_id is not None else 0)
+            for i, counts in enumerate(documents):
+                tf = counts.get(term, 0)
+                if tf:
+                    length = sum(counts.values())
+                    norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+                    scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    @staticmethod
+    def term_counts(text: str) -> Dict[str, int]:
+        """Analyzed term -> frequency for one document"""
+        counts: Dict[str, int] = {}
+        for term in analyze(text or ''):
+            counts[term] = counts.get(term, 0) + 1
+        return counts
+
+    def save(self, directory: str):
+        """Persist next to the vector store (arrays + JSON sidecar)"""
+        os.makedirs(directory, exist_ok=True)
+        np.savez(
+            os.path.join(directory, BM25_ARRAYS),
+            postings=self.postings, offsets=self.offsets, doc_freq=self.doc_freq,
+            doc_lengths=self.doc_lengths, source_codes=self.source_codes
+        )
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(os.path.join(directory, BM25_META), 'w') as f:
+            json.dump({
+                "terms": terms,
+                "ids": [encode_id(doc_id) for doc_id in self.ids],
+                "source_names": self.source_names,
+                "k1": self.k1,
+                "b": self.b
+            }, f)
+        logger.info(f"Saved BM25 index ({len(self)} docs) to {directory}")
+
+    @classmethod
+    def load(cls, directory: str) -> 'BM25Index':
+        with open(os.path.join(directory, BM25_META)) as f:
+            meta = json.load(f)
+        with np.load(os.path.join(directory, BM25_ARRAYS)) as data:
+            return cls(
+                {term: i for i, term in enumerate(meta["terms"])},
+                data['postings'], data['offsets'], data['doc_freq'], data['doc_lengths'],
+                [decode_id(value) for value in meta["ids"]],
+                data['source_codes'], meta["source_names"], meta["k1"], meta["b"]
+            )
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, BM25_META))
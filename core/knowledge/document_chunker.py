@@ -0,0 +1,132 @@
+import re
+import zlib
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+# A sentence runs to terminal punctuation (plus closing quotes/brackets), a blank line, or the end of the text
+SENTENCE = re.compile(r'\S.*?(?:[.!?]+["\'”’)\]]*(?=\s)|\n\s*\n|\Z)', re.S)
+WORD = re.compile(r'\S+')
+TOKEN_ESTIMATE = re.compile(r'\w+|[^\w\s]')
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough word-piece count (words + punctuation) when no tokenizer is available"""
+    return len(TOKEN_ESTIMATE.findall(text))
+
+
+class Chunk(NamedTuple):
+    index: int
+    text: str
+    start: int
+    end: int
+
+
+class DocumentChunker:
+    """
+    Splits long documents into sentence-aligned chunks of at most
+    `max_tokens` (the embedding model's window), each starting with up to
+    `overlap_tokens` worth of the previous chunk's trailing sentences so no
+    passage loses its context at a boundary. A sentence longer than the
+    window is cut on word boundaries.
+    """
+
+    def __init__(self, max_tokens: int = 254, overlap_tokens: int = 32,
+                 count_tokens: Optional[Callable[[str], int]] = None):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.count_tokens = count_tokens or estimate_tokens
+
+    def _sentences(self, text: str) -> List[Tuple[int, int, int]]:
+        """(start, end, tokens) spans, with oversized sentences pre-split into word windows"""
+        spans = []
+        for match in SENTENCE.finditer(text):
+            start, end = match.start(), match.start() + len(match.group().rstrip())
+            tokens = self.count_tokens(text[start:end])
+            if tokens <= self.max_tokens:
+                spans.append((start, end, tokens))
+                continue
+            window_start, window_tokens = start, 0
+            for word in WORD.finditer(text, start, end):
+                word_tokens = self.count_tokens(word.group())
+                if window_tokens and window_tokens + word_tokens > self.max_tokens:
+                    spans.append((window_start, previous_end, window_tokens))
+                    window_start, window_tokens = word.start(), 0
+                window_tokens += word_tokens
+                previous_end = word.end()
+            spans.append((window_start, end, window_tokens))
+        return spans
+
+    def split(self, text: str) -> List[Chunk]:
+        sentences = self._sentences(text or '')
+        chunks: List[Chunk] = []
+        first = 0
+        while first < len(sentences):
+            last, tokens = first, 0
+            while last < len(sentences) and (last == first or tokens + sentences[last][2] <= self.max_tokens):
+                tokens += sentences[last][2]
+                last += 1
+            start, end = sentences[first][0], sentences[last - 1][1]
+            chunks.append(Chunk(len(chunks), text[start:end], start, end))
+            if last == len(sentences):
+                break
+            # Step back over trailing sentences that fit the overlap, always moving forward
+            next_first, overlap = last, 0
+            while next_first - 1 > first and overlap + sentences[next_first - 1][2] <= self.overlap_tokens:
+                next_first -= 1
+                overlap += sentences[next_first][2]
+            first = next_first
+        return chunks
+
+
+class NearDuplicateFilter:
+    """
+    MinHash signatures over word 3-shingles with LSH banding. add() returns
+    False for text whose estimated Jaccard similarity to anything already
+    added reaches `threshold`, so only one copy of repeated or lightly edited
+    passages is embedded. `bands` x rows must equal `num_perm`.
+    """
+
+    PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        rng = np.random.default_rng(seed)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._a = rng.integers(1, 2 ** 31, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 31, num_perm, dtype=np.uint64)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []
+        self.kept = 0
+        self.dropped = 0
+
+    @staticmethod
+    def shingles(text: str, size: int = 3) -> set:
+        words = re.findall(r'\w+', text.lower())
+        if len(words) <= size:
+            return {' '.join(words)}
+        return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in self.shingles(text)), dtype=np.uint64)
+        # (a * h + b) mod p stays below 2**64 since a < 2**31 and h < 2**32
+        return ((np.outer(hashes, self._a) + self._b) % self.PRIME).min(axis=0)
+
+    def add(self, text: str) -> bool:
+        signature = self.signature(text)
+        keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+        candidates = {i for band, key in enumerate(keys) for i in self._buckets[band].get(key, ())}
+        for i in candidates:
+            if np.mean(self._signatures[i] == signature) >= self.threshold:
+                self.dropped += 1
+                return False
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(position)
+        self.kept += 1
+        return True
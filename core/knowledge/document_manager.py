@@ -38,15 +38,17 @@ class DocumentManager:
             
             logger.info(f"Generating embeddings for {len(self.scanner.thematic_index)} themes")
         
+            # Build aside and swap in whole, so semantic_search never sees a partial set
+            embeddings = {}
             for theme, verses in self.scanner.thematic_index.items():
                 texts = [v['text'] for v in verses]
-                self.embeddings[theme] = self.scanner.vectorizer.transform(texts)
+                embeddings[theme] = self.scanner.vectorizer.transform(texts)
+            self.embeddings = embeddings
             
             logger.info("Embeddings generated successfully")
         
         except Exception as e:
             logger.error(f"Embedding generation failed: {str(e)}")
-            self.embeddings = {}  # Reset embeddings
             raise
 
     def semantic_search(self, query: str, theme: str) -> List[Dict]:
@@ -0,0 +1,106 @@
+import logging
+import queue
+import time
+from concurrent.futures import Future
+from threading import Lock, Thread
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Cross-request micro-batcher for embedding inference.
+    Callers submit single texts and get a Future; a background thread
+    flushes the queue when `max_batch_size` texts are waiting or the oldest
+    one has waited `max_wait_ms`, and encodes them in one forward pass.
+    """
+
+    def __init__(self, encode_fn: Callable[..., np.ndarray], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, bucket_size: int = 16):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.bucket_size = bucket_size
+
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._stats_lock = Lock()
+        self._batches = 0
+        self._texts = 0
+        self._closed = False
+        self._worker = Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue one text; the Future resolves to its 1-D embedding"""
+        if self._closed:
+            raise RuntimeError("Embedding batcher is closed")
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join(timeout=1)
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        """Block for the first request, then gather more until full or the deadline passes"""
+        first = self._queue.get()
+        if first is None:
+            return []
+        pending = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._closed = True
+                break
+            pending.append(item)
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            if pending:
+                self._flush(pending)
+            if self._closed and self._queue.empty():
+                return
+
+    def _flush(self, pending: List[Tuple[str, Future]]):
+        # Encode each distinct text once, sorted by length so every inner
+        # batch of `bucket_size` pads to similar lengths
+        texts = sorted({text for text, _ in pending}, key=len)
+        try:
+            embeddings = self.encode_fn(texts, batch_size=self.bucket_size)
+        except Exception as e:
+            logger.error(f"Batched embedding of {len(texts)} texts failed: {str(e)}")
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        by_text = dict(zip(texts, embeddings))
+        for text, future in pending:
+            future.set_result(by_text[text])
+
+        with self._stats_lock:
+            self._batches += 1
+            self._texts += len(pending)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "texts": self._texts,
+                "avg_batch_size": round(self._texts / self._batches, 2) if self._batches else 0.0,
+                "queued": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000
+            }
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Hashable, List, Optional, Sequence
+import numpy as np
+
+DEFAULT_DISK_CACHE = 'core/knowledge/data/embedding_cache.sqlite'
+
+
+def normalize_text(text: str) -> str:
+    """Cache key form of a query: NFKC, case-folded, whitespace collapsed"""
+    return ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+
+def normalize_passage(text: str) -> str:
+    """
+    Disk cache key form of corpus text: NFKC with whitespace collapsed.
+    Case is kept, since documents (unlike queries) are embedded verbatim.
+    """
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+class EmbeddingCache:
+    """Thread-safe bounded LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_size: int = 4096, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: np.ndarray) -> np.ndarray:
+        """Store a read-only copy of `value` and return it"""
+        if self.max_size <= 0:
+            return value
+        # Cached arrays are shared between callers
+        value = np.array(value, copy=True)
+        value.flags.writeable = False
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class DiskEmbeddingCache:
+    """
+    Persistent content-addressed store of corpus embeddings, keyed by
+    (model id, SHA-256 of the normalized text), in one SQLite file (WAL mode,
+    float32 blobs). Re-importing or rebuilding on the same model reads
+    vectors from here instead of running the transformer again.
+    """
+
+    CHUNK = 500  # keys per IN (...) lookup, below SQLite's variable limit
+
+    def __init__(self, path: str = DEFAULT_DISK_CACHE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, digest BLOB NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, digest)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        return hashlib.sha256(text.encode('utf-8')).digest()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector for each (already normalized) text, or None"""
+        digests = [self.digest(text) for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(digests), self.CHUNK):
+                chunk = list(set(digests[start:start + self.CHUNK]))
+                rows = self._conn.execute(
+                    f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN "
+                    f"({','.join('?' * len(chunk))})",
+                    [model, *chunk]
+                )
+                found.update((digest, np.frombuffer(vector, dtype='<f4')) for digest, vector in rows)
+            vectors = [found.get(digest) for digest in digests]
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[np.ndarray]):
+        rows = [
+            (model, self.digest(text), np.asarray(vector, dtype='<f4').tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_disk_cache: Optional[DiskEmbeddingCache] = None
+_disk_cache_lock = Lock()
+
+
+def get_disk_cache() -> Optional[DiskEmbeddingCache]:
+    """Process-wide disk cache at EMBEDDING_DISK_CACHE (set it empty to disable)"""
+    global _disk_cache
+    path = os.getenv("EMBEDDING_DISK_CACHE", DEFAULT_DISK_CACHE)
+    if not path:
+        return None
+    with _disk_cache_lock:
+        if _disk_cache is None:
+            _disk_cache = DiskEmbeddingCache(path)
+        return _disk_cache
@@ -0,0 +1,145 @@
+import argparse
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Collection, Dict, List, NamedTuple, Optional
+from .embedding_service import DEFAULT_MODEL
+from .vector_codec import encode_vector
+
+logger = logging.getLogger(__name__)
+
+# Two vector fields used blue/green: one serves queries, the other receives a migration
+VECTOR_SLOTS = ("vector", "vector_alt")
+REGISTRY_ID = "vectors"
+
+
+class EmbeddingRoute(NamedTuple):
+    slot: str
+    model: str
+    dimensions: Optional[int]
+
+
+def model_key(slot: str) -> str:
+    return f"{slot}_model"
+
+
+def dimensions_key(slot: str) -> str:
+    return f"{slot}_dimensions"
+
+
+def slot_fields(slot: str, vector, model: str) -> Dict:
+    """Entry fields for one embedding: the vector plus the model id and dimension that produced it"""
+    return {slot: encode_vector(vector), model_key(slot): model, dimensions_key(slot): int(len(vector))}
+
+
+def slot_query(route: EmbeddingRoute) -> Dict:
+    """Entries whose `route.slot` vector came from `route.model` (untagged legacy vectors count)"""
+    return {
+        route.slot: {"$ne": None},
+        "$or": [{model_key(route.slot): route.model}, {model_key(route.slot): {"$exists": False}}]
+    }
+
+
+class EmbeddingRegistry:
+    """
+    Which vector slot and model serve queries, and which slot (if any) is
+    being re-embedded with a new model. Stored as one document in the
+    `embedding_config` collection so every process routes the same way.
+    """
+
+    def __init__(self, db):
+        self.config = db.embedding_config
+
+    def _state(self) -> Dict:
+        state = self.config.find_one({"_id": REGISTRY_ID})
+        if state is None:
+            state = {
+                "serving": {"slot": VECTOR_SLOTS[0], "model": os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL),
+                            "dimensions": None},
+                "migration": None
+            }
+        return state
+
+    def serving(self) -> EmbeddingRoute:
+        return EmbeddingRoute(**self._state()["serving"])
+
+    def migration(self) -> Optional[EmbeddingRoute]:
+        migration = self._state().get("migration")
+        return EmbeddingRoute(**migration) if migration else None
+
+    def routes(self) -> List[EmbeddingRoute]:
+        """Every slot writers must fill: the serving one and, during a migration, its target"""
+        migration = self.migration()
+        return [self.serving()] + ([migration] if migration else [])
+
+    def start_migration(self, model: str, dimensions: int) -> EmbeddingRoute:
+        state = self._state()
+        if state.get("migration"):
+            raise ValueError(f"A migration to {state['migration']['model']} is already in progress")
+        if model == state["serving"]["model"]:
+            raise ValueError(f"{model} is already the serving model")
+        slot = next(s for s in VECTOR_SLOTS if s != state["serving"]["slot"])
+        state["migration"] = {"slot": slot, "model": model, "dimensions": dimensions}
+        state["updated_at"] = datetime.utcnow()
+        self.config.replace_one({"_id": REGISTRY_ID}, state, upsert=True)
+        logger.info(f"Started embedding migration to {model} in '{slot}'")
+        return EmbeddingRoute(**state["migration"])
+
+    def cutover(self, search_fields: Optional[Collection[str]] = None) -> EmbeddingRoute:
+        """
+        Make the migrated slot the serving one; returns the route it replaced.
+        `search_fields` are the fields the Atlas search index maps (None when
+        Atlas is not used): the cutover is refused unless they include the slot.
+        """
+        state = self._state()
+        if not state.get("migration"):
+            raise ValueError("No embedding migration in progress")
+        slot = state["migration"]["slot"]
+        if search_fields is not None and slot not in search_fields:
+            raise ValueError(f"The Atlas search index does not map '{slot}' - update it (e.g. rerun the "
+                             f"importer) before cutting over")
+        retired = EmbeddingRoute(**state["serving"])
+        state["serving"], state["migration"] = state["migration"], None
+        state["retired"] = retired._asdict()
+        state["updated_at"] = datetime.utcnow()
+        self.config.replace_one({"_id": REGISTRY_ID}, state, upsert=True)
+        logger.info(f"Cut over embeddings from {retired.model} to {state['serving']['model']}")
+        return retired
+
+    def retired(self) -> Optional[EmbeddingRoute]:
+        retired = self._state().get("retired")
+        return EmbeddingRoute(**retired) if retired else None
+
+    def clear_retired(self):
+        self.config.update_one({"_id": REGISTRY_ID}, {"$unset": {"retired": ""}})
+
+
+def main():
+    from .embedding_service import get_embedding_service
+    from .knowledge_db import KnowledgeRetriever
+
+    parser = argparse.ArgumentParser(description="Migrate entry vectors to a new embedding model without downtime")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show serving and migration routes with their coverage")
+    start = commands.add_parser("start", help="Begin re-embedding into the idle vector slot")
+    start.add_argument("model")
+    run = commands.add_parser("run", help="Backfill the migration slot, then cut over once it is complete")
+    run.add_argument("--processes", type=int)
+    run.add_argument("--max-rate", type=float)
+    commands.add_parser("retire", help="Remove the previous model's vectors (after every worker has switched)")
+    args = parser.parse_args()
+
+    retriever = KnowledgeRetriever()
+    registry = retriever.embedding_registry
+
+    if args.command == "start":
+        registry.start_migration(args.model, get_embedding_service(args.model).dimensions)
+    elif args.command == "run":
+        retriever.migrate_embeddings(args.processes, args.max_rate)
+    elif args.command == "retire":
+        retriever.retire_embeddings()
+    print(json.dumps(retriever.embedding_status(), indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
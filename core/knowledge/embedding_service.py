@@ -0,0 +1,158 @@
+import logging
+import os
+import time
+from threading import Lock
+from typing import Dict, List, Union
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_cache import EmbeddingCache, get_disk_cache, normalize_passage, normalize_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+
+
+class EmbeddingService:
+    """
+    Process-wide wrapper around one SentenceTransformer.
+    Use get_embedding_service() rather than constructing this directly.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        self.model_name = model_name
+        started = time.perf_counter()
+        self.model = SentenceTransformer(model_name)
+        self.load_seconds = time.perf_counter() - started
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+        # Word pieces the model reads per text; anything beyond is truncated
+        self.max_seq_length = getattr(self.model, 'max_seq_length', None) or 256
+
+        self._stats_lock = Lock()
+        self._calls = 0
+        self._texts = 0
+        self._encode_seconds = 0.0
+        self.query_cache = EmbeddingCache(
+            max_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+            ttl_seconds=float(os.getenv("EMBEDDING_CACHE_TTL", "3600"))
+        )
+        # The SQLite cache opens on the first encode_corpus call, so query-only workers never touch it
+        self.corpus_cache = None
+        self.batcher = None
+        if os.getenv("EMBEDDING_MICROBATCH", "true").lower() == "true":
+            self.batcher = EmbeddingBatcher(
+                self.encode,
+                max_batch_size=int(os.getenv("EMBEDDING_BATCH_MAX", "32")),
+                max_wait_ms=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+            )
+        logger.info(f"Loaded embedding model {model_name} in {self.load_seconds:.2f}s")
+
+    def encode(self, texts: Union[str, List[str]], **kwargs) -> np.ndarray:
+        """
+        Encode one string (returns a 1-D vector) or a batch of strings
+        (returns a 2-D array). Extra kwargs go to SentenceTransformer.encode.
+        """
+        started = time.perf_counter()
+        embeddings = self.model.encode(texts, **kwargs)
+        elapsed = time.perf_counter() - started
+
+        with self._stats_lock:
+            self._calls += 1
+            self._texts += 1 if isinstance(texts, str) else len(texts)
+            self._encode_seconds += elapsed
+        return embeddings
+
+    def encode_corpus(self, texts: List[str], batch_size: int = 256, pool: Dict = None) -> np.ndarray:
+        """
+        Bulk encoding for imports, backfills and rebuilds. Texts are looked up
+        in the on-disk cache first (by normalized content); only misses are
+        encoded, each distinct text once, and then stored. With a pool from
+        start_process_pool the misses are split across its worker processes.
+        """
+        if self.corpus_cache is None:
+            self.corpus_cache = get_disk_cache()
+        if self.corpus_cache is None:
+            return self._encode_batch(texts, batch_size, pool)
+        keys = [normalize_passage(text) for text in texts]
+        vectors = self.corpus_cache.get_many(self.model_name, keys)
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missing:
+            encoded = dict(zip(missing, self._encode_batch(missing, batch_size, pool)))
+            self.corpus_cache.put_many(self.model_name, missing, [encoded[key] for key in missing])
+            vectors = [encoded[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        if not vectors:
+            return np.empty((0, self.dimensions), dtype=np.float32)
+        return np.stack(vectors).astype(np.float32, copy=False)
+
+    def _encode_batch(self, texts: List[str], batch_size: int, pool: Dict = None) -> np.ndarray:
+        if pool is None:
+            return self.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        started = time.perf_counter()
+        embeddings = self.model.encode_multi_process(texts, pool, batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+
+        with self._stats_lock:
+            self._calls += 1
+            self._texts += len(texts)
+            self._encode_seconds += elapsed
+        return embeddings
+
+    def start_process_pool(self, processes: int) -> Dict:
+        """Spawn `processes` CPU encode workers, each holding its own copy of the model"""
+        return self.model.start_multi_process_pool(target_devices=['cpu'] * processes)
+
+    @staticmethod
+    def stop_process_pool(pool: Dict):
+        SentenceTransformer.stop_multi_process_pool(pool)
+
+    def count_tokens(self, text: str) -> int:
+        """Word-piece count of `text` under the model's tokenizer (excluding special tokens)"""
+        return len(self.model.tokenizer.tokenize(text))
+
+    def encode_query(self, text: str) -> np.ndarray:
+        """
+        Encode a single query through the LRU cache. The normalized text is
+        what gets embedded, so equivalent spellings share one vector. Cache
+        misses are micro-batched with concurrent requests when enabled.
+        """
+        normalized = normalize_text(text)
+        key = (self.model_name, normalized)
+        embedding = self.query_cache.get(key)
+        if embedding is None:
+            if self.batcher is not None:
+                embedding = self.batcher.submit(normalized).result()
+            else:
+                embedding = self.encode(normalized)
+            embedding = self.query_cache.put(key, embedding)
+        return embedding
+
+    def stats(self) -> Dict:
+        """Load time and encode call statistics"""
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "dimensions": self.dimensions,
+                "load_seconds": round(self.load_seconds, 3),
+                "calls": self._calls,
+                "texts": self._texts,
+                "encode_seconds": round(self._encode_seconds, 3),
+                "avg_ms_per_call": round(1000 * self._encode_seconds / self._calls, 2) if self._calls else 0.0,
+                "query_cache": self.query_cache.stats(),
+                "corpus_cache": self.corpus_cache.stats() if self.corpus_cache else None,
+                "batcher": self.batcher.stats() if self.batcher else None
+            }
+
+
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = Lock()
+
+
+def get_embedding_service(model_name: str = DEFAULT_MODEL) -> EmbeddingService:
+    """Return the shared service for `model_name`, loading the model only once per process"""
+    service = _services.get(model_name)
+    if service is None:
+        with _services_lock:
+            service = _services.get(model_name)
+            if service is None:
+                service = _services[model_name] = EmbeddingService(model_name)
+    return service
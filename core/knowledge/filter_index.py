@@ -0,0 +1,143 @@
+import logging
+import os
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FILTER_FILENAME = 'filters.npz'
+
+# Filter name -> dotted document path (the fields mapped for Atlas in VerseImporter)
+FILTER_FIELDS = {
+    "tags": "tags",
+    "revelation_type": "metadata.revelation_type",
+    "book": "metadata.book",
+    "version": "metadata.version"
+}
+
+FilterValues = Union[str, Sequence[str]]
+
+
+def _normalize_value(value) -> str:
+    return str(value).strip().casefold()
+
+
+def _field_values(doc: Mapping, path: str) -> List[str]:
+    """All values at a dotted path (lists are flattened), normalized"""
+    value = doc
+    for key in path.split('.'):
+        if not isinstance(value, Mapping):
+            return []
+        value = value.get(key)
+    if value is None:
+        return []
+    values = value if isinstance(value, (list, tuple)) else [value]
+    return [_normalize_value(v) for v in values if v not in (None, '')]
+
+
+def _wanted(values: FilterValues) -> List[str]:
+    return [_normalize_value(values)] if isinstance(values, str) else [_normalize_value(v) for v in values]
+
+
+def _check_field(field: str) -> str:
+    if field not in FILTER_FIELDS:
+        raise ValueError(f"Unknown filter '{field}' (expected one of {list(FILTER_FIELDS)})")
+    return field
+
+
+class FilterIndex:
+    """
+    Bitmap index over entry metadata, aligned with the VectorIndex row order.
+    Every (field, value) pair owns one packed bit row, so a filter such as
+    {"tags": "mercy", "revelation_type": "meccan"} becomes a few vectorized
+    ANDs/ORs yielding a row mask that search applies before scoring.
+    """
+
+    PROJECTION = {path: 1 for path in FILTER_FIELDS.values()}
+
+    def __init__(self, row_count: int, values: Dict[str, List[str]], bitmaps: Dict[str, np.ndarray]):
+        self.row_count = row_count
+        # field -> value list, and field -> (n_values, ceil(rows / 8)) packed bits
+        self.values = values
+        self.bitmaps = bitmaps
+        self._positions = {field: {v: i for i, v in enumerate(vals)} for field, vals in values.items()}
+
+    @classmethod
+    def build(cls, ids: Sequence, cursor: Iterable[dict]) -> 'FilterIndex':
+        """Build from documents carrying `_id` and the FILTER_FIELDS paths; rows follow `ids`"""
+        row_of = {doc_id: row for row, doc_id in enumerate(ids)}
+        postings: Dict[str, Dict[str, List[int]]] = {field: {} for field in FILTER_FIELDS}
+
+        for doc in cursor:
+            row = row_of.get(doc['_id'])
+            if row is None:
+                continue
+            for field, path in FILTER_FIELDS.items():
+                for value in _field_values(doc, path):
+                    postings[field].setdefault(value, []).append(row)
+
+        values, bitmaps = {}, {}
+        for field, by_value in postings.items():
+            values[field] = sorted(by_value)
+            dense = np.zeros((len(values[field]), len(ids)), dtype=bool)
+            for i, value in enumerate(values[field]):
+                dense[i, by_value[value]] = True
+            bitmaps[field] = np.packbits(dense, axis=1)
+
+        logger.info(
+            f"Built filter index over {len(ids)} rows: "
+            + ", ".join(f"{len(vals)} {field}" for field, vals in values.items())
+        )
+        return cls(len(ids), values, bitmaps)
+
+    def _bits(self, field: str, value: str) -> Optional[np.ndarray]:
+        position = self._positions[field].get(value)
+        return None if position is None else self.bitmaps[field][position]
+
+    def mask(self, filters: Mapping[str, FilterValues]) -> np.ndarray:
+        """
+        Boolean row mask: rows must match every field, and any of the
+        values given for a field (a string or a list of strings).
+        """
+        packed = np.full((self.row_count + 7) // 8, 0xFF, dtype=np.uint8)
+        for field, wanted in filters.items():
+            _check_field(field)
+            any_of = np.zeros_like(packed)
+            for value in _wanted(wanted):
+                bits = self._bits(field, value)
+                if bits is not None:
+                    any_of |= bits
+            packed &= any_of
+        return np.unpackbits(packed, count=self.row_count).astype(bool)
+
+    @staticmethod
+    def matches(doc: Mapping, filters: Mapping[str, FilterValues]) -> bool:
+        """Same semantics as `mask`, for a single fetched document"""
+        return all(
+            set(_field_values(doc, FILTER_FIELDS[_check_field(field)])) & set(_wanted(wanted))
+            for field, wanted in filters.items()
+        )
+
+    def save(self, version_dir: str):
+        """Persist next to the vector store version it is aligned with"""
+        arrays = {"row_count": np.int64(self.row_count)}
+        for field in FILTER_FIELDS:
+            arrays[f"{field}_values"] = np.asarray(self.values[field], dtype=str)
+            arrays[f"{field}_bits"] = self.bitmaps[field]
+        np.savez(os.path.join(version_dir, FILTER_FILENAME), **arrays)
+        logger.info(f"Saved filter index to {version_dir}")
+
+    @classmethod
+    def load(cls, version_dir: str, row_count: int) -> 'FilterIndex':
+        with np.load(os.path.join(version_dir, FILTER_FILENAME)) as data:
+            if int(data['row_count']) != row_count:
+                raise ValueError("Filter index does not match the vector store it was loaded with")
+            return cls(
+                row_count,
+                {field: data[f"{field}_values"].tolist() for field in FILTER_FIELDS},
+                {field: data[f"{field}_bits"] for field in FILTER_FIELDS}
+            )
+
+    @staticmethod
+    def exists(version_dir: str) -> bool:
+        return os.path.exists(os.path.join(version_dir, FILTER_FILENAME))
@@ -0,0 +1,37 @@
+from typing import Dict, List, Sequence
+
+RRF_K = 60
+
+
+def _ranked(docs: Dict[str, Dict], scores: Dict[str, float]) -> List[Dict]:
+    for doc_id, doc in docs.items():
+        doc['combined_score'] = scores[doc_id]
+    return sorted(docs.values(), key=lambda x: x['combined_score'], reverse=True)
+
+
+def weighted_fusion(result_lists: Sequence[List[Dict]], weights: Sequence[float]) -> List[Dict]:
+    """
+    Max-normalize each list's `score` and sum the weighted scores per _id.
+    One pass over all results; each document keeps its first-seen copy.
+    """
+    docs: Dict[str, Dict] = {}
+    scores: Dict[str, float] = {}
+    for results, weight in zip(result_lists, weights):
+        max_score = max((doc.get('score', 0) for doc in results), default=0) or 1
+        for doc in results:
+            doc_id = str(doc['_id'])
+            docs.setdefault(doc_id, doc)
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight * doc.get('score', 0) / max_score
+    return _ranked(docs, scores)
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[List[Dict]], k: int = RRF_K) -> List[Dict]:
+    """Score each _id by sum(1 / (k + rank)) across the ranked lists"""
+    docs: Dict[str, Dict] = {}
+    scores: Dict[str, float] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            doc_id = str(doc['_id'])
+            docs.setdefault(doc_id, doc)
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return _ranked(docs, scores)
@@ -1,13 +1,22 @@
+import hashlib
 import os
 import requests
-from pymongo import MongoClient
-from sentence_transformers import SentenceTransformer
+from collections import defaultdict
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import OperationFailure
+from .bible_fetcher import BibleFetcher
+from .document_chunker import DocumentChunker, NearDuplicateFilter
+from .embedding_models import EmbeddingRegistry, EmbeddingRoute, model_key, slot_fields
+from .embedding_service import get_embedding_service
+from .ingest_pipeline import ingest_file, read_records
+from .theme_tagger import ThemeTagger
 from datetime import datetime
 import logging
 from enum import Enum
-from typing import List, Dict
+from typing import Dict, Iterable, List
 from dotenv import load_dotenv
 from tqdm import tqdm
+import argparse
 import json
 import time
 
@@ -20,8 +29,20 @@ load_dotenv('.env')
 class KnowledgeSource(Enum):
     QURAN = "quran"
     BIBLE = "bible"
+    BOOK = "book"
+    DOCUMENT = "document"
+    ARTICLE = "article"
     WIKIPEDIA = "wikipedia"
 
+# Substring keywords, so stems like 'forgiv' cover every inflection
+IMPORT_THEMES = {
+    'mercy': ['mercy', 'forgiv', 'compassion', 'pardon'],
+    'faith': ['faith', 'belief', 'trust', 'iman'],
+    'prophets': ['prophet', 'muhammad', 'isa', 'musa'],
+    'prayer': ['prayer', 'salah', 'worship', 'dua'],
+    'ethics': ['good', 'evil', 'moral', 'character']
+}
+
 class VerseImporter:
     def __init__(self, connection_string: str):
         self.client = MongoClient(
@@ -32,7 +53,10 @@ class VerseImporter:
         )
         self.db = self.client["AdamAI-KnowledgeDB"]
         self.entries = self.db.entries
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        # Fill every active vector slot (two of them while an embedding migration runs)
+        self.routes = EmbeddingRegistry(self.db).routes()
+        self.stats: Dict[str, Dict] = {}
+        self.theme_tagger = ThemeTagger(IMPORT_THEMES)
         self._initialize_database()
 
     def _initialize_database(self):
@@ -42,6 +66,7 @@ class VerseImporter:
             self.entries.create_index([("source", 1)])
             self.entries.create_index([("tags", 1)])
             self.entries.create_index([("metadata.reference", 1)])
+            self._ensure_import_key()
             
             # Configure Atlas Search index
             self._configure_search_index()
@@ -51,6 +76,16 @@ class VerseImporter:
             logger.error(f"Initialization failed: {str(e)}")
             raise
 
+    def _ensure_import_key(self):
+        """Unique (source, metadata.reference) index that imports upsert on"""
+        try:
+            self.entries.create_index([("source", 1), ("metadata.reference", 1)], unique=True,
+                                      name="source_reference_unique")
+        except OperationFailure as e:
+            # Duplicates left by older full re-imports; upserts still match on the key, just unenforced
+            logger.warning(f"Could not create unique import key, using a plain index: {str(e)}")
+            self.entries.create_index([("source", 1), ("metadata.reference", 1)], name="source_reference")
+
     def _configure_search_index(self):
         """Create or update the search index with the specified mapping"""
         index_definition = {
@@ -72,10 +107,13 @@ class VerseImporter:
                             "type": "string",
                             "analyzer": "lucene.keyword"
                         },
-                        "vector": {
-                            "type": "knnVector",
-                            "dimensions": 384,
-                            "similarity": "cosine"
+                        **{
+                            route.slot: {
+                                "type": "knnVector",
+                                "dimensions": route.dimensions or get_embedding_service(route.model).dimensions,
+                                "similarity": "cosine"
+                            }
+                            for route in self.routes
                         },
                         "metadata": {
                             "type": "document",
@@ -110,9 +148,9 @@ class VerseImporter:
 
         # Check if index exists
         existing_indexes = list(self.db.entries.list_search_indexes())
-        index_exists = any(idx['name'] == 'adamai_search' for idx in existing_indexes)
+        existing = next((idx for idx in existing_indexes if idx['name'] == 'adamai_search'), None)
 
-        if not index_exists:
+        if existing is None:
             try:
                 self.db.command({
                     "createSearchIndexes": "entries",
@@ -124,20 +162,18 @@ class VerseImporter:
             except Exception as e:
                 logger.warning(f"Index creation initiated. It may take a few minutes to complete. Error: {str(e)}")
         else:
-            logger.info("Using existing search index")
+            # An embedding migration needs its target slot mapped before the cutover
+            mapped = (existing.get("latestDefinition") or existing.get("definition") or {}).get("mappings", {})
+            missing = [route.slot for route in self.routes if route.slot not in mapped.get("fields", {})]
+            if missing:
+                self.entries.update_search_index("adamai_search", index_definition["definition"])
+                logger.info(f"Updated search index to map {', '.join(missing)}")
+            else:
+                logger.info("Using existing search index")
 
     def _generate_tags(self, text: str) -> List[str]:
         """Generate thematic tags using NLP"""
-        themes = {
-            'mercy': ['mercy', 'forgiv', 'compassion', 'pardon'],
-            'faith': ['faith', 'belief', 'trust', 'iman'],
-            'prophets': ['prophet', 'muhammad', 'isa', 'musa'],
-            'prayer': ['prayer', 'salah', 'worship', 'dua'],
-            'ethics': ['good', 'evil', 'moral', 'character']
-        }
-        text_lower = text.lower()
-        return [theme for theme, keywords in themes.items() 
-                if any(kw in text_lower for kw in keywords)] or ['general']
+        return self.theme_tagger.match(text) or ['general']
 
     def import_quran_verses(self, translation: str = "en.asad"):
         """Import Quran verses with proper embedding and metadata"""
@@ -145,15 +181,14 @@ class VerseImporter:
             logger.info("Starting Quran import...")
             response = requests.get(f"https://api.alquran.cloud/v1/quran/{translation}")
             data = response.json()['data']['surahs']
-            
-            operations = []
+
+            writer = self._batch_writer()
             for surah in tqdm(data, desc="Importing Surahs"):
                 for ayah in surah['ayahs']:
-                    doc = {
+                    writer.add({
                         "source": KnowledgeSource.QURAN.value,
                         "content": ayah['text'],
                         "tags": self._generate_tags(ayah['text']),
-                        "vector": self.embedder.encode(ayah['text']).tolist(),
                         "metadata": {
                             "reference": f"{surah['number']}:{ayah['numberInSurah']}",
                             "surah_number": surah['number'],
@@ -162,27 +197,18 @@ class VerseImporter:
                             "revelation_type": surah['revelationType']
                         },
                         "created_at": datetime.utcnow()
-                    }
-                    operations.append(doc)
-                    
-                    # Batch insert for better performance
-                    if len(operations) >= 100:
-                        self.entries.insert_many(operations)
-                        operations = []
-            
-            # Insert remaining documents
-            if operations:
-                self.entries.insert_many(operations)
-                
+                    })
+            self.stats["quran"] = writer.close()
+
             count = self.entries.count_documents({"source": "quran"})
-            logger.info(f"✅ Quran import complete: {count} verses")
+            logger.info(f"✅ Quran import complete: {count} verses ({self._summary('quran')})")
             return count
             
         except Exception as e:
             logger.error(f"❌ Quran import failed: {str(e)}")
             raise
 
-    def import_bible_verses(self, version: str = "kjv"):
+    def import_bible_verses(self, version: str = "kjv", fetcher: BibleFetcher = None):
         """Import Bible verses with proper embedding and metadata"""
         try:
             logger.info("Starting Bible import...")
@@ -193,67 +219,275 @@ class VerseImporter:
                 {"name": "Matthew", "chapters": 28},
                 {"name": "John", "chapters": 21}
             ]
-            base_url = "https://cdn.jsdelivr.net/gh/wldeh/bible-api/bibles"
-
-            operations = []
-            for book in tqdm(books, desc="Importing Books"):
-                book_name = book["name"].lower()
-                for chapter in range(1, book["chapters"] + 1):
-                    verse = 1
-                    while True:
-                        try:
-                            url = f"{base_url}/{version}/books/{book_name}/chapters/{chapter}/verses/{verse}.json"
-                            response = requests.get(url, timeout=10)
-
-                            if response.status_code == 404:
-                                break  # No more verses
-                                
-                            response.raise_for_status()
-                            data = response.json()
-
-                            doc = {
-                                "source": KnowledgeSource.BIBLE.value,
-                                "content": data["text"],
-                                "tags": self._generate_tags(data["text"]),
-                                "vector": self.embedder.encode(data["text"]).tolist(),
-                                "metadata": {
-                                    "reference": f"{book['name']} {chapter}:{verse}",
-                                    "book": book["name"],
-                                    "chapter": chapter,
-                                    "verse": verse,
-                                    "version": version
-                                },
-                                "created_at": datetime.utcnow()
-                            }
-                            operations.append(doc)
-                        
-                            # Batch insert
-                            if len(operations) >= 50:
-                                self.entries.insert_many(operations)
-                                operations = []
-                            
-                            verse += 1
-                        
-                        except requests.exceptions.RequestException as e:
-                            logger.error(f"Request failed for {book_name} {chapter}:{verse}: {str(e)}")
-                            break
-                        except Exception as e:
-                            logger.error(f"Error processing {book_name} {chapter}:{verse}: {str(e)}")
-                            verse += 1
-        
-            # Insert remaining documents
-            if operations:
-                self.entries.insert_many(operations)
-            
+            own_fetcher = fetcher is None
+            fetcher = fetcher or BibleFetcher()
+
+            # Chapters are fetched concurrently while earlier ones are embedded and written
+            writer = self._batch_writer()
+            chapters = sum(book["chapters"] for book in books)
+            for book, chapter, verses in tqdm(fetcher.fetch_books(version, books), total=chapters,
+                                              desc="Importing Chapters"):
+                for verse in verses:
+                    writer.add({
+                        "source": KnowledgeSource.BIBLE.value,
+                        "content": verse["text"],
+                        "tags": self._generate_tags(verse["text"]),
+                        "metadata": {
+                            "reference": f"{book['name']} {chapter}:{verse['verse']}",
+                            "book": book["name"],
+                            "chapter": chapter,
+                            "verse": verse["verse"],
+                            "version": version
+                        },
+                        "created_at": datetime.utcnow()
+                    })
+            self.stats["bible"] = writer.close()
+            self.stats["bible"]["requests"] = fetcher.requests
+            if own_fetcher:
+                fetcher.close()
+
             count = self.entries.count_documents({"source": "bible"})
-            logger.info(f"✅ Bible import complete: {count} verses")
+            logger.info(f"✅ Bible import complete: {count} verses ({self._summary('bible')}, "
+                        f"{fetcher.requests} requests)")
             return count
         
         except Exception as e:
             logger.error(f"❌ Bible import failed: {str(e)}")
             raise
 
+    def import_file(self, path: str, source: str) -> int:
+        """
+        Ingest a local JSON/JSONL/CSV dump through the staged pipeline
+        (read/normalize/tag -> batch embed -> bulk upsert, over bounded queues).
+        Records need `content` or `text`; `reference` keys the upsert.
+        """
+        try:
+            logger.info(f"Starting {source} import from {path}...")
+            self.stats[source] = ingest_file(
+                self._batch_writer(), self._generate_tags, path, source,
+                queue_size=int(os.getenv("IMPORT_QUEUE_BATCHES", "4"))
+            )
+            count = self.entries.count_documents({"source": source})
+            logger.info(f"✅ {source} import complete: {count} entries ({self._summary(source)})")
+            return count
+
+        except Exception as e:
+            logger.error(f"❌ {source} import from {path} failed: {str(e)}")
+            raise
+
+    def import_documents(self, documents: Iterable[Dict], source: str = KnowledgeSource.DOCUMENT.value) -> int:
+        """
+        Import long texts (books, documents, articles) as overlapping,
+        sentence-aligned chunks sized to the embedding model's window.
+        Chunks that near-duplicate one already seen in this run are dropped
+        before embedding. Each chunk is keyed "<document id>#<chunk index>"
+        and carries its parent document's id, title and metadata; chunks a
+        re-imported document no longer produces are removed.
+        """
+        try:
+            logger.info(f"Starting {source} document import...")
+            service = get_embedding_service(self.routes[0].model)
+            chunker = DocumentChunker(
+                max_tokens=int(os.getenv("CHUNK_MAX_TOKENS", str(service.max_seq_length - 2))),
+                overlap_tokens=int(os.getenv("CHUNK_OVERLAP_TOKENS", "32")),
+                count_tokens=service.count_tokens
+            )
+            duplicates = NearDuplicateFilter(threshold=float(os.getenv("CHUNK_DUPLICATE_THRESHOLD", "0.8")))
+            writer = self._batch_writer()
+            documents_seen = 0
+
+            for number, document in enumerate(documents, 1):
+                document = dict(document)
+                text = document.pop("content", None) or document.pop("text", None) or ""
+                document_id = str(document.pop("id", None) or document.pop("reference", None)
+                                  or document.get("title") or number)
+                tags = document.pop("tags", None)
+                document.pop("source", None)
+                metadata = {**(document.pop("metadata", None) or {}), **document}
+                chunks = chunker.split(text)
+                kept = []
+                for chunk in chunks:
+                    if not duplicates.add(chunk.text):
+                        continue
+                    reference = f"{document_id}#{chunk.index}"
+                    kept.append(reference)
+                    writer.add({
+                        "source": source,
+                        "content": chunk.text,
+                        "tags": tags or self._generate_tags(chunk.text),
+                        "metadata": {
+                            **metadata,
+                            "reference": reference,
+                            "document_id": document_id,
+                            "chunk_index": chunk.index,
+                            "chunk_count": len(chunks),
+                            "char_start": chunk.start,
+                            "char_end": chunk.end
+                        },
+                        "created_at": datetime.utcnow()
+                    })
+                self.entries.delete_many({
+                    "source": source,
+                    "metadata.document_id": document_id,
+                    "metadata.reference": {"$nin": kept}
+                })
+                documents_seen += 1
+
+            self.stats[source] = writer.close()
+            self.stats[source].update(documents=documents_seen, duplicate_chunks=duplicates.dropped)
+            count = self.entries.count_documents({"source": source})
+            logger.info(f"✅ {source} import complete: {documents_seen} documents, {count} chunks "
+                        f"({duplicates.dropped} near-duplicates dropped, {self._summary(source)})")
+            return count
+
+        except Exception as e:
+            logger.error(f"❌ {source} document import failed: {str(e)}")
+            raise
+
+    def _summary(self, source: str) -> str:
+        stats = self.stats[source]
+        return (f"{stats['inserted']} new, {stats['updated']} updated, {stats['unchanged']} unchanged, "
+                f"{stats['per_second']} verses/sec")
+
+    def _batch_writer(self) -> "ImportBatchWriter":
+        return ImportBatchWriter(
+            self.entries,
+            self.routes,
+            batch_size=int(os.getenv("IMPORT_BATCH_SIZE", "256")),
+            processes=int(os.getenv("IMPORT_PROCESSES", "1"))
+        )
+
+
+def content_hash(text: str) -> str:
+    """Fingerprint of the embedded text; an unchanged hash means the stored vectors are still valid"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ImportBatchWriter:
+    """
+    Collects import documents and upserts them in batches keyed on
+    (source, metadata.reference). Entries whose content hash and vector
+    models are unchanged are not re-embedded; if their tags and metadata
+    match too they are not written at all. Everything else is embedded in
+    one forward pass per batch and model (optionally spread over `processes`
+    encode workers, started on first use). close() flushes the remainder
+    and returns throughput stats.
+    """
+
+    def __init__(self, entries, routes: List[EmbeddingRoute], batch_size: int = 256, processes: int = 1):
+        self.entries = entries
+        self.routes = routes
+        self.batch_size = batch_size
+        self.processes = processes
+        self.services = {route.model: get_embedding_service(route.model) for route in routes}
+        self.pools: Dict[str, Dict] = {}
+        self._pending: List[Dict] = []
+        self.counts = {"inserted": 0, "updated": 0, "unchanged": 0, "embedded": 0}
+        self.count = 0
+        self.encode_seconds = 0.0
+        self.started = time.monotonic()
+
+    def add(self, doc: Dict):
+        doc["content_hash"] = content_hash(doc["content"])
+        self._pending.append(doc)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _existing(self, docs: List[Dict]) -> Dict[tuple, Dict]:
+        """Stored entries for this batch, by (source, reference)"""
+        references = defaultdict(list)
+        for doc in docs:
+            references[doc["source"]].append(doc["metadata"]["reference"])
+        projection = {"source": 1, "metadata": 1, "tags": 1, "content_hash": 1,
+                      **{model_key(route.slot): 1 for route in self.routes}}
+        query = {"$or": [{"source": source, "metadata.reference": {"$in": refs}}
+                         for source, refs in references.items()]}
+        return {(doc["source"], doc["metadata"]["reference"]): doc
+                for doc in self.entries.find(query, projection)}
+
+    def _vectors_current(self, stored: Dict, doc: Dict) -> bool:
+        return (stored.get("content_hash") == doc["content_hash"]
+                and all(stored.get(model_key(route.slot)) == route.model for route in self.routes))
+
+    def _encode(self, docs: List[Dict]):
+        started = time.monotonic()
+        texts = [doc["content"] for doc in docs]
+        for route in self.routes:
+            service = self.services[route.model]
+            if self.processes > 1 and route.model not in self.pools:
+                self.pools[route.model] = service.start_process_pool(self.processes)
+            vectors = service.encode_corpus(texts, batch_size=self.batch_size, pool=self.pools.get(route.model))
+            for doc, vector in zip(docs, vectors):
+                doc.update(slot_fields(route.slot, vector, route.model))
+        self.encode_seconds += time.monotonic() - started
+        self.counts["embedded"] += len(docs)
+
+    def flush(self):
+        if not self._pending:
+            return
+        docs, self._pending = self._pending, []
+        self.write(self.prepare(docs))
+
+    def prepare(self, docs: List[Dict]) -> List[UpdateOne]:
+        """Embed what changed in a batch and return its upserts (nothing for unchanged entries)"""
+        existing = self._existing(docs)
+
+        changed, to_embed = [], []
+        for doc in docs:
+            stored = existing.get((doc["source"], doc["metadata"]["reference"]))
+            if stored is None or not self._vectors_current(stored, doc):
+                to_embed.append(doc)
+            elif stored.get("tags") == doc["tags"] and stored.get("metadata") == doc["metadata"]:
+                self.counts["unchanged"] += 1
+                continue
+            changed.append(doc)
+        if to_embed:
+            self._encode(to_embed)
+        self.count += len(docs)
+
+        now = datetime.utcnow()
+        operations = []
+        for doc in changed:
+            created_at = doc.pop("created_at", now)
+            operations.append(UpdateOne(
+                {"source": doc["source"], "metadata.reference": doc["metadata"]["reference"]},
+                {"$set": {**doc, "updated_at": now}, "$setOnInsert": {"created_at": created_at}},
+                upsert=True
+            ))
+        return operations
+
+    def write(self, operations: List[UpdateOne]):
+        if operations:
+            result = self.entries.bulk_write(operations, ordered=False)
+            self.counts["inserted"] += result.upserted_count
+            self.counts["updated"] += result.modified_count
+
+    def close(self) -> Dict:
+        try:
+            self.flush()
+        finally:
+            for model, pool in self.pools.items():
+                self.services[model].stop_process_pool(pool)
+            self.pools = {}
+        elapsed = time.monotonic() - self.started
+        return {
+            "verses": self.count,
+            **self.counts,
+            "seconds": round(elapsed, 1),
+            "encode_seconds": round(self.encode_seconds, 1),
+            "per_second": round(self.count / elapsed, 1) if elapsed else 0.0
+        }
+
 def main():
+    parser = argparse.ArgumentParser(description="Import verses from the Quran/Bible APIs or local corpus files")
+    parser.add_argument("--file", action="append", default=[],
+                        help="Local .jsonl/.json/.csv dump to ingest instead of the web APIs (repeatable)")
+    parser.add_argument("--source", default=KnowledgeSource.WIKIPEDIA.value,
+                        help="Source for records that do not name one")
+    parser.add_argument("--documents", action="store_true",
+                        help="Treat each --file record as a whole document to chunk (books, documents, articles)")
+    args = parser.parse_args()
+
     atlas_uri = os.getenv("MONGODB_URI")
     if not atlas_uri:
         raise ValueError("MONGODB_URI environment variable not set")
@@ -261,18 +495,22 @@ def main():
     importer = VerseImporter(atlas_uri)
     
     try:
-        # Clear existing data for fresh import
-        logger.info("Clearing existing data...")
-        importer.entries.delete_many({})
-        
-        # Run imports
-        importer.import_quran_verses()
-        importer.import_bible_verses()
+        # Run imports (upserts keep the knowledge base searchable and touch only changed verses)
+        if args.file:
+            for path in args.file:
+                if args.documents:
+                    importer.import_documents(read_records(path), args.source)
+                else:
+                    importer.import_file(path, args.source)
+        else:
+            importer.import_quran_verses()
+            importer.import_bible_verses()
         
         # Print summary
         stats = {
-            "quran_verses": importer.entries.count_documents({"source": "quran"}),
-            "bible_verses": importer.entries.count_documents({"source": "bible"})
+            "entries": {source: importer.entries.count_documents({"source": source})
+                        for source in importer.stats},
+            "throughput": importer.stats
         }
         logger.info(f"\n📊 Import Summary:\n{json.dumps(stats, indent=2)}")
         
@@ -0,0 +1,27 @@
+import argparse
+import json
+import logging
+from .knowledge_db import ANN_BACKENDS, KnowledgeRetriever
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build on-disk knowledge indexes")
+    parser.add_argument("--path", help="Vector store directory (defaults to VECTOR_STORE_PATH)")
+    parser.add_argument("--ann", choices=ANN_BACKENDS,
+                        help="Also build and persist an ANN index (defaults to VECTOR_SEARCH_BACKEND)")
+    parser.add_argument("--report", action="store_true",
+                        help="Print recall@k and memory footprint of every ANN backend")
+    args = parser.parse_args()
+
+    retriever = KnowledgeRetriever()
+    version_dir = retriever.build_vector_store(args.path, ann=args.ann)
+    logger.info(f"Vector store written to {version_dir}")
+    print(f"Vector store written to {version_dir}")
+
+    if args.report:
+        print(json.dumps(retriever.vector_backend_report(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, Dict, Hashable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class IndexGeneration:
+    """
+    One published set of resident knowledge indexes (vectors, ANN, BM25,
+    filter bitmaps and the live delta over them). Searches read the current
+    generation once and use it throughout, so publishing a new one is a single
+    reference swap that never disturbs queries already in flight (RCU-style).
+    Members still None are loaded lazily under `lock`. `route` is the
+    embedding slot/model the generation's vectors come from; queries against
+    it are encoded with that model.
+    """
+
+    def __init__(self, version_dir: Optional[str] = None, route=None):
+        self.version_dir = version_dir
+        self.route = route
+        self.vector_index = None
+        self.ann_indexes: Dict[str, object] = {}
+        self.bm25_index = None
+        self.filter_index = None
+        self.delta = None
+        self.lock = Lock()
+
+
+class BackgroundBuilder:
+    """
+    Builds index generations off the serving path, one at a time.
+    `build` produces a complete, warmed generation; `validate` raises to
+    reject it; `publish` swaps it in. A request joins a pending build with
+    the same `key` (the build's arguments) instead of starting another;
+    a request with a different key is queued behind it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._lock = Lock()
+        self._pending: Dict[Hashable, Future] = {}
+
+    def submit(self, build: Callable[[], T], validate: Callable[[T], None],
+               publish: Callable[[T], None], key: Hashable = None) -> Future:
+        with self._lock:
+            self._pending = {k: f for k, f in self._pending.items() if not f.done()}
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = self._executor.submit(self._run, build, validate, publish)
+            return future
+
+    def _run(self, build: Callable[[], T], validate: Callable[[T], None],
+             publish: Callable[[T], None]) -> T:
+        started = time.monotonic()
+        try:
+            generation = build()
+            validate(generation)
+            publish(generation)
+        except Exception as e:
+            logger.error(f"{self.name} rebuild failed; keeping the current generation: {str(e)}")
+            raise
+        logger.info(f"{self.name} rebuilt and published in {time.monotonic() - started:.1f}s")
+        return generation
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
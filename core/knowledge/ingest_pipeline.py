@@ -0,0 +1,190 @@
+import csv
+import json
+import logging
+import os
+from datetime import datetime
+from queue import Full, Queue
+from threading import Event, Thread
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CONTENT_FIELDS = ("content", "text")
+_DONE = object()
+
+
+class _Aborted(Exception):
+    pass
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """
+    Stream records from a local dump: JSONL line by line, CSV row by row
+    (header = field names), or a JSON list / {"data": [...]} document
+    (loaded whole, so prefer JSONL for very large corpora).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='' if extension == '.csv' else None) as f:
+        if extension == '.jsonl':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif extension == '.csv':
+            yield from csv.DictReader(f)
+        elif extension == '.json':
+            payload = json.load(f)
+            yield from payload.get("data", []) if isinstance(payload, dict) else payload
+        else:
+            raise ValueError(f"Unsupported corpus file type '{extension}' (expected .jsonl, .json or .csv)")
+
+
+def normalize_record(record: Dict, source: str, tagger: Callable[[str], List[str]],
+                     default_reference: str) -> Optional[Dict]:
+    """
+    Shape one raw record as an entry: `content`/`text` becomes content
+    (whitespace collapsed), `reference` and any other fields go into
+    metadata, and tags come from the record or from `tagger`.
+    Returns None for records without text.
+    """
+    record = dict(record)
+    content = None
+    for field in CONTENT_FIELDS:
+        value = record.pop(field, None)
+        content = content or value
+    content = " ".join(str(content or "").split())
+    if not content:
+        return None
+
+    metadata = dict(record.pop("metadata", None) or {})
+    reference = record.pop("reference", None) or metadata.get("reference") or default_reference
+    tags = record.pop("tags", None)
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.replace(';', ',').split(',') if tag.strip()]
+    source = record.pop("source", None) or source
+    metadata.update({key: value for key, value in record.items() if value not in (None, "")})
+    metadata["reference"] = str(reference)
+
+    return {
+        "source": source,
+        "content": content,
+        "tags": tags or tagger(content),
+        "metadata": metadata,
+        "created_at": datetime.utcnow()
+    }
+
+
+class IngestPipeline:
+    """
+    Staged ingestion over bounded queues:
+    read + normalize + tag (thread) -> batch embed (caller's thread) -> bulk write (thread).
+    Each stage blocks when the next one falls behind, so memory stays bounded
+    by `queue_size` batches while embedding overlaps the MongoDB writes.
+    `writer` supplies batch_size, prepare(docs) -> operations, write(operations)
+    and close() -> stats (see importer.ImportBatchWriter). The first error
+    stops every stage and is re-raised from run().
+    """
+
+    def __init__(self, writer, tagger: Callable[[str], List[str]], queue_size: int = 4):
+        self.writer = writer
+        self.tagger = tagger
+        self.queue_size = queue_size
+        self._failed = Event()
+        self._error: Optional[BaseException] = None
+        self.skipped = 0
+
+    def run(self, records: Iterable[Dict], source: str, name: str = "records") -> Dict:
+        docs: Queue = Queue(maxsize=self.writer.batch_size * self.queue_size)
+        operations: Queue = Queue(maxsize=self.queue_size)
+        reader = Thread(target=self._read_stage, args=(records, source, name, docs),
+                        name="ingest-read", daemon=True)
+        writer = Thread(target=self._write_stage, args=(operations,), name="ingest-write", daemon=True)
+        reader.start()
+        writer.start()
+        try:
+            self._embed_stage(docs, operations)
+        finally:
+            reader.join()
+            writer.join()
+            stats = self.writer.close()
+        if self._error is not None:
+            raise self._error
+        stats["skipped"] = self.skipped
+        return stats
+
+    def _fail(self, error: BaseException):
+        if not self._failed.is_set():
+            self._error = error
+            self._failed.set()
+            logger.error(f"Ingestion failed: {str(error)}")
+
+    def _put(self, queue: Queue, item):
+        """Blocking put that gives up once another stage has failed"""
+        while True:
+            if self._failed.is_set() and item is not _DONE:
+                raise _Aborted()
+            try:
+                queue.put(item, timeout=0.1)
+                return
+            except Full:
+                continue
+
+    def _read_stage(self, records: Iterable[Dict], source: str, name: str, docs: Queue):
+        try:
+            for number, record in enumerate(records, 1):
+                doc = normalize_record(record, source, self.tagger, f"{name}:{number}")
+                if doc is None:
+                    self.skipped += 1
+                    continue
+                self._put(docs, doc)
+        except _Aborted:
+            pass
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(docs, _DONE)
+
+    def _embed_stage(self, docs: Queue, operations: Queue):
+        batch: List[Dict] = []
+        finished = False
+        try:
+            while True:
+                doc = docs.get()
+                if doc is _DONE:
+                    finished = True
+                    break
+                if self._failed.is_set():
+                    continue
+                batch.append(doc)
+                if len(batch) >= self.writer.batch_size:
+                    self._put(operations, self.writer.prepare(batch))
+                    batch = []
+            if batch and not self._failed.is_set():
+                self._put(operations, self.writer.prepare(batch))
+        except _Aborted:
+            pass
+        except Exception as e:
+            self._fail(e)
+        finally:
+            # Drain so a blocked reader can finish
+            while not finished:
+                finished = docs.get() is _DONE
+            self._put(operations, _DONE)
+
+    def _write_stage(self, operations: Queue):
+        while True:
+            batch = operations.get()
+            if batch is _DONE:
+                return
+            if self._failed.is_set():
+                continue
+            try:
+                self.writer.write(batch)
+            except Exception as e:
+                self._fail(e)
+
+
+def ingest_file(writer, tagger: Callable[[str], List[str]], path: str, source: str,
+                queue_size: int = 4) -> Dict:
+    """Run one local corpus file through an IngestPipeline"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return IngestPipeline(writer, tagger, queue_size).run(read_records(path), source, name)
@@ -0,0 +1,114 @@
+import logging
+import os
+from typing import List, Optional, Tuple
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from .vector_index import VectorIndex, normalize_query, normalize_rows, top_k
+
+logger = logging.getLogger(__name__)
+
+IVF_FILENAME = 'ivf.npz'
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over a VectorIndex.
+    A k-means coarse quantizer splits the rows into `nlist` lists; a query
+    only scores the rows in its `nprobe` closest lists.
+    """
+
+    def __init__(self, vector_index: VectorIndex, centroids: np.ndarray,
+                 list_offsets: np.ndarray, list_rows: np.ndarray, nprobe: int = 8):
+        self.vector_index = vector_index
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(cls, vector_index: VectorIndex, nlist: Optional[int] = None, nprobe: int = 8,
+              max_training_points: int = 256, seed: int = 42) -> 'IVFIndex':
+        """Train the coarse quantizer and assign every row to its closest list"""
+        vectors = vector_index.vectors
+        n = len(vector_index)
+        if n == 0:
+            raise ValueError("Cannot build an IVF index over an empty vector index")
+
+        nlist = min(nlist or max(1, int(4 * np.sqrt(n))), n)
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, nlist * max_training_points)
+        sample = vectors[np.sort(rng.choice(n, sample_size, replace=False))]
+
+        kmeans = MiniBatchKMeans(n_clusters=nlist, random_state=seed, n_init=3,
+                                 batch_size=max(1024, nlist * 4))
+        kmeans.fit(sample)
+        # Spherical k-means: compare by cosine like the rows themselves
+        centroids = normalize_rows(kmeans.cluster_centers_.astype(np.float32))
+
+        assignments = cls._assign(vectors, centroids)
+        list_rows = np.argsort(assignments, kind='stable').astype(np.int32)
+        counts = np.bincount(assignments, minlength=nlist)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        logger.info(f"Built IVF index: {n} rows in {nlist} lists (largest {counts.max()})")
+        return cls(vector_index, centroids, list_offsets, list_rows, nprobe)
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        """Closest centroid per row, computed in chunks to bound memory"""
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
+
+    def search(self, embedding, limit: int, nprobe: Optional[int] = None,
+               mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Return (row, cosine score) pairs from the `nprobe` closest lists.
+        With a row `mask`, only masked rows are scored and nprobe is widened
+        until `limit` matching rows are found or every list has been probed.
+        """
+        query = normalize_query(embedding)
+        nprobe = nprobe or self.nprobe
+        centroid_order = top_k(self.centroids @ query, self.nlist)
+
+        while True:
+            probe = centroid_order[:nprobe]
+            candidates = np.concatenate([
+                self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe
+            ]) if len(probe) else np.empty(0, dtype=np.int32)
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            if candidates.size >= limit or nprobe >= self.nlist:
+                break
+            nprobe = min(nprobe * 2, self.nlist)
+        if candidates.size == 0:
+            return []
+
+        candidates.sort()  # sequential reads from the (possibly memory-mapped) matrix
+        scores = self.vector_index.vectors[candidates] @ query
+        best = top_k(scores, limit)
+        return [(int(candidates[i]), float(scores[i])) for i in best]
+
+    def save(self, version_dir: str):
+        """Persist next to the vector store version it was built from"""
+        np.savez(
+            os.path.join(version_dir, IVF_FILENAME),
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_rows=self.list_rows,
+            row_count=np.int64(len(self.vector_index))
+        )
+        logger.info(f"Saved IVF index with {self.nlist} lists to {version_dir}")
+
+    @classmethod
+    def load(cls, version_dir: str, vector_index: VectorIndex, nprobe: int = 8) -> 'IVFIndex':
+        with np.load(os.path.join(version_dir, IVF_FILENAME)) as data:
+            if int(data['row_count']) != len(vector_index):
+                raise ValueError("IVF index does not match the vector store it was loaded with")
+            return cls(vector_index, data['centroids'], data['list_offsets'], data['list_rows'], nprobe)
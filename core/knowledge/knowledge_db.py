@@ -1,14 +1,30 @@
 from logging.handlers import RotatingFileHandler
 import os
+import re
+import shutil
+import time
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple, Union
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, OperationFailure
-from sentence_transformers import SentenceTransformer
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 from dotenv import load_dotenv
 from enum import Enum
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 import numpy as np
+from .embedding_service import get_embedding_service
+from .fusion import reciprocal_rank_fusion, weighted_fusion
+from .bm25_index import BM25Index
+from .filter_index import FilterIndex, FilterValues
+from .live_index import DeltaSegment, LiveIndexUpdater, merge_hits
+from .index_generation import BackgroundBuilder, IndexGeneration
+from .backfill import DEFAULT_CHECKPOINT, BackfillLease, EmbeddingBackfill
+from .embedding_models import (EmbeddingRegistry, EmbeddingRoute, dimensions_key, model_key,
+                               slot_query)
+from .reference_table import ParsedReference, ReferenceTable, parse_reference
+from .vector_index import VectorIndex
+from .ivf_index import IVFIndex, IVF_FILENAME
+from .quantization import QuantizedIndex, QUANTIZED_FILENAMES, recall_at_k
 
 def configure_logging():
     """Configure dual logging - file and console"""
@@ -62,6 +78,11 @@ class KnowledgeSource(Enum):
     ARTICLE = "article"
     WIKIPEDIA = "wikipedia"
 
+ANN_BACKENDS = ("ivf", "int8", "pq")
+
+# Fields returned with search results; vectors never leave the database
+RESULT_PROJECTION = {"content": 1, "source": 1, "tags": 1, "metadata": 1}
+
 class KnowledgeRetriever:
     def __init__(self, db_uri: str = None, db_name: str = "AdamAI-KnowledgeDB"):
         """
@@ -73,9 +94,27 @@ class KnowledgeRetriever:
             raise ValueError("MongoDB URI not provided and MONGODB_URI not found in .env")
             
         self.db_name = db_name
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.vector_store_path = os.getenv("VECTOR_STORE_PATH", "core/knowledge/data/vector_store")
+        self._live_updater = None
+        self._index_builder = BackgroundBuilder("knowledge-indexes")
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("SEARCH_THREADS", "8")),
+            thread_name_prefix="knowledge-search"
+        )
+        # Separate pool so shard fan-out inside a search task cannot starve the search pool
+        self._shard_executor = ThreadPoolExecutor(
+            max_workers=len(KnowledgeSource),
+            thread_name_prefix="vector-shard"
+        )
         self._connect()
         self._ensure_indexes()
+        # Which vector slot/model serves queries; re-read periodically to notice a cutover
+        self.embedding_registry = EmbeddingRegistry(self.db)
+        self._route = self.embedding_registry.serving()
+        self._route_checked = time.monotonic()
+        self.embedding_model = get_embedding_service(self._route.model)
+        self._generation = self._new_generation()
+        self._load_reference_table()
 
     @retry(stop=stop_after_attempt(3),
            wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -113,6 +152,9 @@ class KnowledgeRetriever:
             # Other indexes
             self.collection.create_index([("source", 1)])
             self.collection.create_index([("metadata.reference", 1)])
+            # Live index polling looks for entries created or updated since its watermark
+            self.collection.create_index([("created_at", 1)])
+            self.collection.create_index([("updated_at", 1)])
             logging.getLogger("Database indexes verified")
         except Exception as e:
             logging.getLogger(f"Index creation failed: {str(e)}")
@@ -127,6 +169,13 @@ class KnowledgeRetriever:
         except Exception as e:
             logging.getLogger(f"Vector index check failed: {str(e)}")
 
+    def _search_index_fields(self) -> Set[str]:
+        """Top-level fields mapped by the Atlas search index (empty if it does not exist)"""
+        for index in self.collection.list_search_indexes(name="adamai_search"):
+            definition = index.get("latestDefinition") or index.get("definition") or {}
+            return set(definition.get("mappings", {}).get("fields", {}))
+        return set()
+
     # Add this method to the KnowledgeRetriever class
     def create_text_index(self):
         """Public method to create text index if needed"""
@@ -147,15 +196,65 @@ class KnowledgeRetriever:
             logging.getLogger(f"Text index creation failed: {str(e)}")
             raise RuntimeError("Failed to create text index") from e
 
+    def _vector_backend(self, atlas_default: str = "false") -> str:
+        """
+        Resolve the vector search backend: "atlas", "exact" or "ivf".
+        VECTOR_SEARCH_BACKEND wins; otherwise USE_ATLAS_VECTOR_SEARCH picks atlas or exact.
+        """
+        backend = os.getenv("VECTOR_SEARCH_BACKEND")
+        if backend:
+            return backend.lower()
+        return "atlas" if os.getenv("USE_ATLAS_VECTOR_SEARCH", atlas_default).lower() == "true" else "exact"
+
     def _generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for text using the configured model"""
-        return self.embedding_model.encode(text).tolist()
+        """Generate embedding for text using the configured model (cached per query)"""
+        return self.encode_query(text).tolist()
+
+    def encode_query(self, text: str) -> np.ndarray:
+        """
+        Embed a query with the model of the vectors it will be searched
+        against: the serving slot for Atlas, the resident generation otherwise.
+        """
+        self._refresh_route()
+        if self._vector_backend() == "atlas":
+            model = self._route.model
+        else:
+            model = self._generation.route.model
+        return get_embedding_service(model).encode_query(text)
+
+    def _refresh_route(self, force: bool = False):
+        """
+        Pick up an embedding cutover made by another process. The current
+        generation keeps serving (with its own model) until one built from
+        the new slot is swapped in.
+        """
+        interval = float(os.getenv("EMBEDDING_ROUTE_CHECK_SECONDS", "60"))
+        if not force and time.monotonic() - self._route_checked < interval:
+            return
+        self._route_checked = time.monotonic()
+        try:
+            route = self.embedding_registry.serving()
+        except Exception as e:
+            logging.error(f"Embedding route check failed: {str(e)}")
+            return
+        if route != self._route:
+            logging.info(f"Embedding route changed to {route.model} in '{route.slot}' - rebuilding indexes")
+            self._route = route
+            self.embedding_model = get_embedding_service(route.model)
+            self._refresh_generation_async()
+
+    def _keyword_backend(self) -> str:
+        """Keyword search backend: "bm25" (in-process, default) or "mongo" ($text index)"""
+        return os.getenv("KEYWORD_SEARCH_BACKEND", "bm25").lower()
 
     def text_search(self, query: str, limit: int = 15, source: str = None) -> List[Dict]:
         """
         Perform text search on the existing knowledge base.
-        Uses the existing text index on 'content' field.
+        Uses the resident BM25 index, or the MongoDB text index on 'content'
+        when KEYWORD_SEARCH_BACKEND=mongo.
         """
+        if self._keyword_backend() == "bm25":
+            return self._bm25_search(query, limit, source)
         try:
             query_filter = {"$text": {"$search": query}}
             if source:
@@ -163,135 +262,102 @@ class KnowledgeRetriever:
                 
             return list(self.collection.find(
                 query_filter,
-                {
-                    "_id": 1,
-                    "content": 1,
-                    "source": 1,
-                    "tags": 1,
-                    "metadata": 1,
-                    "score": {"$meta": "textScore"}
-                }
+                {**RESULT_PROJECTION, "score": {"$meta": "textScore"}}
             ).sort([("score", -1)]).limit(limit))
         except Exception as e:
             logging.getLogger(f"Text search failed for query '{query}': {str(e)}")
             return []
 
-    def vector_search(self, query: str, limit: int = 10, source: str = None) -> List[Dict]:
+    def vector_search(self, query: str, limit: int = 10,
+                      source: Union[str, List[str]] = None,
+                      filters: Dict[str, FilterValues] = None) -> List[Dict]:
         """
         Perform vector similarity search using existing embeddings.
         Works with both Atlas vector search and local approximate search.
+        `source` (one or several) and metadata `filters` such as
+        {"tags": "mercy", "revelation_type": "meccan"} are pushed into the
+        local search, which masks candidates before scoring and so returns
+        a full `limit` hits.
+        """
+        return self.vector_search_with_embedding(query, limit, source, filters)[1]
+
+    def vector_search_with_embedding(self, query: str, limit: int = 10,
+                                     source: Union[str, List[str]] = None,
+                                     filters: Dict[str, FilterValues] = None
+                                     ) -> Tuple[Optional[np.ndarray], List[Dict]]:
+        """
+        vector_search that also returns the query embedding, for callers that
+        re-rank with it. The backend (and for local search, the generation) is
+        resolved once, so the query is encoded by the model of the vectors it
+        is searched against. The embedding is None if encoding failed.
         """
+        query_embedding = None
         try:
-            query_embedding = self._generate_embedding(query)
+            self._refresh_route()
+            sources = [source] if isinstance(source, str) else source
             
-            if os.getenv("USE_ATLAS_VECTOR_SEARCH", "false").lower() == "true":
-                # Atlas vector search
-                pipeline = [
-                    {
-                        "$vectorSearch": {
-                            "index": "adamai_search",
-                            "path": "vector",
-                            "queryVector": query_embedding,
-                            "numCandidates": 150,
-                            "limit": limit
-                        }
-                    },
-                    {
-                        "$project": {
-                            "_id": 1,
-                            "content": 1,
-                            "source": 1,
-                            "tags": 1,
-                            "metadata": 1,
-                            "score": {"$meta": "vectorSearchScore"}
-                        }
-                    }
-                ]
-                results = list(self.collection.aggregate(pipeline))
+            if self._vector_backend() == "atlas":
+                query_embedding = get_embedding_service(self._route.model).encode_query(query)
+                # Over-fetch so the post-filter can still fill `limit`
+                fetch = limit * 4 if sources or filters else limit
+                results = self._atlas_vector_search(query_embedding, fetch)
+                if sources:
+                    results = [doc for doc in results if doc.get('source') in sources]
+                if filters:
+                    results = [doc for doc in results if FilterIndex.matches(doc, filters)]
+                results = results[:limit]
             else:
-                # Local approximate search (slower)
-                results = list(self.collection.aggregate([
-                    {
-                        "$addFields": {
-                            "similarity": {
-                                "$let": {
-                                    "vars": {
-                                        "dotProduct": {"$dotProduct": ["$vector", query_embedding]},
-                                        "magnitudeA": {"$sqrt": {"$dotProduct": ["$vector", "$vector"]}},
-                                        "magnitudeB": {"$sqrt": {"$dotProduct": [query_embedding, query_embedding]}}
-                                    },
-                                    "in": {
-                                        "$divide": [
-                                            "$$dotProduct",
-                                            {"$multiply": ["$$magnitudeA", "$$magnitudeB"]}
-                                        ]
-                                    }
-                                }
-                            }
-                        }
-                    },
-                    {"$sort": {"similarity": -1}},
-                    {"$limit": limit},
-                    {
-                        "$project": {
-                            "_id": 1,
-                            "content": 1,
-                            "source": 1,
-                            "tags": 1,
-                            "metadata": 1,
-                            "score": "$similarity"
-                        }
-                    }
-                ]))
+                # Resident in-process index (exact, IVF or quantized), queried with its own model
+                generation = self._generation
+                query_embedding = get_embedding_service(generation.route.model).encode_query(query)
+                results = self._local_similarity_search(query_embedding, limit, sources, filters, generation)
             
-            if source:
-                results = [doc for doc in results if doc.get('source') == source]
-            
-            return results
+            return query_embedding, results
         except Exception as e:
-            logging.getLogger(f"Vector search failed: {str(e)}")
-            return []
+            logging.error(f"Vector search failed: {str(e)}")
+            return query_embedding, []
 
-    def hybrid_search(self, query: str, limit: int = 5, source: str = None) -> List[Dict]:
+    def hybrid_search(self, query: str, limit: int = 5, source: str = None,
+                      fusion: str = None, timeout: float = None) -> List[Dict]:
         """
         Combine text and vector search results from existing data.
+        Both searches run concurrently; a search that misses the deadline
+        contributes nothing. fusion is "weighted" (0.6 vector / 0.4 text)
+        or "rrf" (reciprocal-rank fusion), defaulting to HYBRID_FUSION.
         """
         try:
-            vector_results = self.vector_search(query, limit, source)
-            text_results = self.text_search(query, limit, source)
-            
-            # Combine and deduplicate
-            seen_ids = set()
-            combined = []
-            
-            for doc in vector_results + text_results:
-                doc_id = str(doc['_id'])
-                if doc_id not in seen_ids:
-                    seen_ids.add(doc_id)
-                    combined.append(doc)
-            
-            # Normalize and combine scores
-            max_vector = max(doc.get('score', 0) for doc in vector_results) or 1
-            max_text = max(doc.get('score', 0) for doc in text_results) or 1
-            
-            for doc in combined:
-                vector_score = next(
-                    (d['score']/max_vector for d in vector_results 
-                    if str(d['_id']) == str(doc['_id'])), 0)
-                text_score = next(
-                    (d['score']/max_text for d in text_results 
-                    if str(d['_id']) == str(doc['_id'])), 0)
-                doc['combined_score'] = (0.6 * vector_score) + (0.4 * text_score)
-            
-            return sorted(combined, key=lambda x: x['combined_score'], reverse=True)[:limit]
+            fusion = (fusion or os.getenv("HYBRID_FUSION", "weighted")).lower()
+            if timeout is None:
+                timeout = float(os.getenv("HYBRID_SEARCH_TIMEOUT", "2.0"))
+
+            futures = {
+                "vector": self._search_executor.submit(self.vector_search, query, limit, source),
+                "text": self._search_executor.submit(self.text_search, query, limit, source)
+            }
+            wait(futures.values(), timeout=timeout)
+
+            results = {}
+            for name, future in futures.items():
+                if future.done():
+                    results[name] = future.result()
+                else:
+                    future.cancel()
+                    logging.warning(f"Hybrid search: {name} search exceeded {timeout}s deadline")
+                    results[name] = []
+
+            if fusion == "rrf":
+                combined = reciprocal_rank_fusion([results["vector"], results["text"]])
+            else:
+                combined = weighted_fusion([results["vector"], results["text"]], [0.6, 0.4])
+            return combined[:limit]
         except Exception as e:
-            logging.getLogger(f"Hybrid search failed: {str(e)}")
+            logging.error(f"Hybrid search failed: {str(e)}")
             return []
         
     # Add this method to the KnowledgeRetriever class
     def keyword_search(self, query: str, limit: int = 5, source: str = None) -> List[Dict]:
         """
-        Perform keyword search using MongoDB's text index.
+        Perform keyword search (BM25 or MongoDB's text index).
         This is an alias for the existing text_search method.
         """
         return self.text_search(query, limit, source)
@@ -301,37 +367,14 @@ class KnowledgeRetriever:
         """Perform similarity search using a pre-computed embedding."""
         try:
             # Ensure embedding is in the correct format
-            if isinstance(embedding, np.ndarray):
-                embedding = embedding.tolist()
-            elif not isinstance(embedding, list):
+            if not isinstance(embedding, (list, np.ndarray)):
                 raise ValueError("Embedding must be a list or numpy array")
 
             logging.info(f"Performing vector search with embedding length: {len(embedding)}")
         
-            if os.getenv("USE_ATLAS_VECTOR_SEARCH", "true").lower() == "true":
-                pipeline = [
-                    {
-                        "$vectorSearch": {
-                            "index": "adamai_search",
-                            "path": "vector",
-                            "queryVector": embedding,
-                            "numCandidates": 150,
-                            "limit": limit
-                        }
-                    },
-                    {
-                        "$project": {
-                            "_id": 1,
-                            "content": 1,
-                            "source": 1,
-                            "tags": 1,
-                            "metadata": 1,
-                            "score": {"$meta": "vectorSearchScore"}
-                        }
-                    }
-                ]
-                logging.info(f"Executing pipeline: {pipeline}")
-                results = list(self.collection.aggregate(pipeline))
+            # Same backend resolution as encode_query, so the embedding matches the searched vectors
+            if self._vector_backend() == "atlas":
+                results = self._atlas_vector_search(embedding, limit)
                 logging.info(f"Found {len(results)} results from vector search")
                 return results
             else:
@@ -342,53 +385,554 @@ class KnowledgeRetriever:
             logging.error(f"Vector search failed with embedding {embedding[:5]}...: {str(e)}", exc_info=True)
             return []
 
-    def _local_similarity_search(self, embedding: List[float], limit: int) -> List[Dict]:
-        """Fallback local similarity search implementation"""
+    def _atlas_vector_search(self, embedding, limit: int) -> List[Dict]:
+        """Atlas $vectorSearch returning only RESULT_PROJECTION fields"""
+        if isinstance(embedding, np.ndarray):
+            embedding = embedding.tolist()
+        pipeline = [
+            {
+                "$vectorSearch": {
+                    "index": "adamai_search",
+                    "path": self._route.slot,
+                    "queryVector": embedding,
+                    "numCandidates": max(150, limit * 15),
+                    "limit": limit
+                }
+            },
+            {
+                "$project": {
+                    **RESULT_PROJECTION,
+                    "score": {"$meta": "vectorSearchScore"}
+                }
+            }
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+    def _load_vector_index_from_db(self, route: EmbeddingRoute) -> VectorIndex:
+        """Pull every vector stored in the route's slot by its model from MongoDB into a new index"""
+        cursor = self.collection.find(
+            slot_query(route),
+            {route.slot: 1, "source": 1, "metadata.reference": 1}
+        )
+        return VectorIndex.from_cursor(cursor, field=route.slot, model_name=route.model)
+
+    def _new_generation(self) -> IndexGeneration:
+        """Empty generation over the published store (its members load lazily)"""
+        return IndexGeneration(VectorIndex.current_version(self.vector_store_path), self._route)
+
+    def _get_vector_index(self, generation: IndexGeneration = None) -> VectorIndex:
+        """
+        Load the resident vector index on first use.
+        Prefers the memory-mapped on-disk store so workers share one copy.
+        """
+        generation = generation or self._generation
+        if generation.vector_index is None:
+            with generation.lock:
+                if generation.vector_index is None:
+                    if generation.version_dir:
+                        index = VectorIndex.load_version(generation.version_dir)
+                        if index.model_name == generation.route.model:
+                            generation.vector_index = index
+                        else:
+                            logging.warning(f"Vector store was built with {index.model_name}, not "
+                                            f"{generation.route.model} - loading vectors from MongoDB")
+                            generation.version_dir = None
+                    if generation.vector_index is None:
+                        if not generation.version_dir:
+                            logging.info("No vector store on disk - loading vectors from MongoDB")
+                        generation.vector_index = self._load_vector_index_from_db(generation.route)
+        return generation.vector_index
+
+    def _build_ann_index(self, backend: str, index: VectorIndex):
+        if backend == "ivf":
+            nlist = os.getenv("IVF_NLIST")
+            return IVFIndex.build(index, int(nlist) if nlist else None,
+                                  nprobe=int(os.getenv("IVF_NPROBE", "8")))
+        return QuantizedIndex.build(index, backend,
+                                    rerank_factor=int(os.getenv("QUANTIZED_RERANK_FACTOR", "4")))
+
+    def _load_ann_index(self, backend: str, version_dir: str, index: VectorIndex):
+        if backend == "ivf":
+            return IVFIndex.load(version_dir, index, nprobe=int(os.getenv("IVF_NPROBE", "8")))
+        return QuantizedIndex.load(version_dir, index, backend,
+                                   rerank_factor=int(os.getenv("QUANTIZED_RERANK_FACTOR", "4")))
+
+    def _get_ann_index(self, backend: str, generation: IndexGeneration = None):
+        """Load (or build) an IVF / int8 / PQ index over the resident vectors on first use"""
+        if backend not in ANN_BACKENDS:
+            raise ValueError(f"Unknown vector search backend '{backend}'")
+        generation = generation or self._generation
+        if backend not in generation.ann_indexes:
+            index = self._get_vector_index(generation)
+            with generation.lock:
+                if backend not in generation.ann_indexes:
+                    filename = IVF_FILENAME if backend == "ivf" else QUANTIZED_FILENAMES[backend]
+                    version_dir = generation.version_dir
+                    if (index.version and version_dir and
+                            os.path.exists(os.path.join(version_dir, filename))):
+                        generation.ann_indexes[backend] = self._load_ann_index(backend, version_dir, index)
+                    else:
+                        logging.info(f"No {backend} index on disk - building one in memory")
+                        generation.ann_indexes[backend] = self._build_ann_index(backend, index)
+        return generation.ann_indexes[backend]
+
+    def _get_filter_index(self, generation: IndexGeneration = None) -> FilterIndex:
+        """Load the metadata bitmaps stored with the vector store, or build them on first use"""
+        generation = generation or self._generation
+        if generation.filter_index is None:
+            index = self._get_vector_index(generation)
+            with generation.lock:
+                if generation.filter_index is None:
+                    version_dir = generation.version_dir
+                    if index.version and version_dir and FilterIndex.exists(version_dir):
+                        generation.filter_index = FilterIndex.load(version_dir, len(index))
+                    else:
+                        logging.info("No filter index on disk - building it from MongoDB")
+                        generation.filter_index = self._load_filter_index_from_db(index, generation.route)
+        return generation.filter_index
+
+    def _load_filter_index_from_db(self, index: VectorIndex, route: EmbeddingRoute) -> FilterIndex:
+        """Bitmaps for every vector row's tags/revelation_type/book/version"""
+        cursor = self.collection.find(slot_query(route), FilterIndex.PROJECTION)
+        return FilterIndex.build(index.ids, cursor)
+
+    def _load_bm25_index_from_db(self) -> BM25Index:
+        """Stream every entry's content from MongoDB into a new BM25 index"""
+        return BM25Index.build(self.collection.find({}, {"content": 1, "source": 1}))
+
+    def _get_bm25_index(self, generation: IndexGeneration = None) -> BM25Index:
+        """Load the BM25 index stored next to the vector store, or build it on first use"""
+        generation = generation or self._generation
+        if generation.bm25_index is None:
+            with generation.lock:
+                if generation.bm25_index is None:
+                    version_dir = generation.version_dir
+                    if version_dir and BM25Index.exists(version_dir):
+                        generation.bm25_index = BM25Index.load(version_dir)
+                    else:
+                        logging.info("No BM25 index on disk - building it from MongoDB")
+                        generation.bm25_index = self._load_bm25_index_from_db()
+        return generation.bm25_index
+
+    def build_vector_store(self, path: str = None, ann: str = None) -> str:
+        """
+        Snapshot all entry vectors, the BM25 keyword index, the filter bitmaps
+        and an optional ANN index to a new on-disk store version, then validate
+        and hot-swap it in. Blocks until done; see rebuild_indexes_async.
+        """
+        return self._rebuild(path, ann).version_dir
+
+    def rebuild_indexes_async(self, path: str = None, ann: str = None) -> Future:
+        """
+        Build, validate and publish a new index generation on a background
+        thread while the current one keeps serving. Resolves to the new generation.
+        """
+        return self._index_builder.submit(
+            lambda: self._build_generation(path, ann),
+            self._validate_generation,
+            lambda generation: self._publish_generation(generation, path),
+            key=("store", path, ann)
+        )
+
+    def _rebuild(self, path: str = None, ann: str = None) -> IndexGeneration:
+        return self.rebuild_indexes_async(path, ann).result()
+
+    def _build_generation(self, path: str = None, ann: str = None) -> IndexGeneration:
+        """
+        Write an unpublished store version and reopen it exactly as serving
+        would (memory-mapped, checksum-verified, every member loaded) so the
+        swap leaves nothing to load on the first query.
+        """
+        if ann is None and self._vector_backend() in ANN_BACKENDS:
+            ann = self._vector_backend()
+        route = self._route
+        index = self._load_vector_index_from_db(route)
+        version_dir = index.save(path or self.vector_store_path, publish=False)
+        self._load_bm25_index_from_db().save(version_dir)
+        self._load_filter_index_from_db(index, route).save(version_dir)
+        if ann:
+            self._build_ann_index(ann, index).save(version_dir)
+
+        generation = IndexGeneration(version_dir, route)
         try:
-            all_docs = list(self.collection.find({"vector": {"$exists": True}}))
-            if not all_docs:
-                return []
-
-            # Calculate cosine similarity
-            for doc in all_docs:
-                doc_vector = doc['vector']
-                if len(doc_vector) != len(embedding):
-                    continue
-                dot_product = sum(a*b for a, b in zip(embedding, doc_vector))
-                mag_a = sum(a**2 for a in embedding)**0.5
-                mag_b = sum(b**2 for b in doc_vector)**0.5
-                doc['score'] = dot_product / (mag_a * mag_b) if (mag_a * mag_b) != 0 else 0
-
-            return sorted(all_docs, key=lambda x: x.get('score', 0), reverse=True)[:limit]
+            self._get_vector_index(generation)
+            self._get_bm25_index(generation)
+            self._get_filter_index(generation)
+            if ann:
+                self._get_ann_index(ann, generation)
+        except Exception:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+        return generation
+
+    def _validate_generation(self, generation: IndexGeneration):
+        """
+        Reject a generation that shrank unexpectedly or cannot find its own
+        rows (the checksum was verified when it was loaded).
+        """
+        try:
+            index = generation.vector_index
+            current = self._generation.vector_index
+            max_shrink = float(os.getenv("INDEX_MAX_SHRINK", "0.1"))
+            # Compare with what is searchable now, so deletes already applied live are not a "shrink"
+            delta = self._generation.delta
+            expected = delta.live_rows() if delta is not None else len(current or ())
+            if current is not None and len(index) < expected * (1 - max_shrink):
+                raise ValueError(f"New vector index has {len(index)} rows, down from {expected}")
+            if current is None and not len(index):
+                raise ValueError("New vector index is empty")
+
+            backend = self._vector_backend()
+            searcher = generation.ann_indexes.get(backend, index)
+            recall = self._self_recall(searcher, index)
+            min_recall = float(os.getenv("INDEX_MIN_RECALL", "0.9"))
+            if recall < min_recall:
+                raise ValueError(f"Recall probe {recall:.3f} is below {min_recall}")
+            logging.info(f"Validated index generation {index.version}: {len(index)} rows, recall probe {recall:.3f}")
+        except Exception:
+            shutil.rmtree(generation.version_dir, ignore_errors=True)
+            raise
+
+    @staticmethod
+    def _self_recall(searcher, index: VectorIndex, k: int = 10, sample_size: int = 50) -> float:
+        """Fraction of sampled rows that come back in their own top-k"""
+        if not len(index):
+            return 1.0
+        rng = np.random.default_rng(42)
+        rows = rng.choice(len(index), min(sample_size, len(index)), replace=False)
+        found = sum(
+            any(hit == row for hit, _ in searcher.search(np.asarray(index.vectors[row]), k))
+            for row in rows
+        )
+        return found / len(rows)
+
+    def _publish_generation(self, generation: IndexGeneration, path: str = None):
+        """Point CURRENT at the new version, then swap it in with one reference assignment"""
+        directory = path or self.vector_store_path
+        VectorIndex.publish(directory, generation.vector_index.version)
+        if os.path.abspath(directory) == os.path.abspath(self.vector_store_path):
+            self._generation = generation
+
+    def vector_backend_report(self, k: int = 10, sample_size: int = 100) -> Dict[str, Dict]:
+        """Recall@k against exact search plus memory footprint for each ANN backend"""
+        generation = self._generation
+        index = self._get_vector_index(generation)
+        if not len(index):
+            return {}
+        rng = np.random.default_rng(42)
+        rows = np.sort(rng.choice(len(index), min(sample_size, len(index)), replace=False))
+        queries = np.asarray(index.vectors[rows], dtype=np.float32)
+
+        report = {}
+        for backend in ANN_BACKENDS:
+            ann_index = self._get_ann_index(backend, generation)
+            stats = {f"recall@{k}": round(recall_at_k(ann_index, index, queries, k), 4)}
+            if isinstance(ann_index, QuantizedIndex):
+                stats.update(ann_index.memory_footprint())
+            report[backend] = stats
+        return report
+
+    def reload_vector_index(self):
+        """Swap in a fresh generation over the published store; it loads on next search"""
+        self._generation = self._new_generation()
+
+    def _local_similarity_search(self, embedding: List[float], limit: int,
+                                 sources: List[str] = None,
+                                 filters: Dict[str, FilterValues] = None,
+                                 generation: IndexGeneration = None) -> List[Dict]:
+        """
+        Cosine search against the resident vector index (exact, IVF or quantized backend).
+        Exact search scores only the requested source shards, fanning out across
+        shards on a thread pool; ANN backends restrict candidates with a source mask.
+        Metadata filters become a bitmap row mask applied before scoring.
+        """
+        try:
+            # One generation for the whole query, even if a rebuild swaps in another meanwhile
+            generation = generation or self._generation
+            index = self._get_vector_index(generation)
+            backend = self._vector_backend()
+            mask = self._get_filter_index(generation).mask(filters) if filters else None
+            delta = self._live_delta(generation)
+            if delta is not None and delta.vector_tombstones.mask() is not None:
+                live = delta.vector_tombstones.mask()
+                mask = live if mask is None else mask & live
+            if backend in ANN_BACKENDS:
+                if sources:
+                    source_mask = index.source_mask(sources)
+                    mask = source_mask if mask is None else mask & source_mask
+                hits = self._get_ann_index(backend, generation).search(embedding, limit, mask=mask)
+            else:
+                hits = index.search(embedding, limit, sources, executor=self._shard_executor, mask=mask)
+            ranked = [(index.ids[row], score) for row, score in hits]
+            if delta is not None:
+                ranked = merge_hits(ranked, delta.search_vectors(embedding, limit, sources, filters), limit)
+            return self._fetch_hits(ranked)
         except Exception as e:
             logging.error(f"Local similarity search failed: {str(e)}")
             return []
 
+    def _bm25_search(self, query: str, limit: int, source: str = None) -> List[Dict]:
+        """Keyword search against the resident BM25 index"""
+        try:
+            generation = self._generation
+            index = self._get_bm25_index(generation)
+            delta = self._live_delta(generation)
+            mask = delta.keyword_tombstones.mask() if delta is not None else None
+            hits = index.search(query, limit, source, mask=mask)
+            ranked = [(index.ids[row], score) for row, score in hits]
+            if delta is not None:
+                ranked = merge_hits(ranked, delta.search_keywords(query, limit, source), limit)
+            return self._fetch_hits(ranked)
+        except Exception as e:
+            logging.error(f"BM25 search failed for query '{query}': {str(e)}")
+            return []
+
+    def _backfill_job(self, route: EmbeddingRoute, batch_size: int = None, processes: int = None,
+                      max_rate: float = None) -> EmbeddingBackfill:
+        return EmbeddingBackfill(
+            self.collection,
+            get_embedding_service(route.model),
+            checkpoint_path=os.getenv("BACKFILL_CHECKPOINT", DEFAULT_CHECKPOINT),
+            batch_size=batch_size or int(os.getenv("BACKFILL_BATCH_SIZE", "512")),
+            processes=processes or int(os.getenv("BACKFILL_PROCESSES", "1")),
+            max_rate=max_rate if max_rate is not None else float(os.getenv("BACKFILL_MAX_RATE", "0")),
+            slot=route.slot
+        )
+
+    def backfill_embeddings(self, batch_size: int = None, processes: int = None,
+                            max_rate: float = None) -> Dict:
+        """
+        Embed entries missing a vector or embedded by another model, in the
+        serving slot and any migration slot. Resumable and throttled; see EmbeddingBackfill.
+        Only the process holding the backfill lease runs; others return {} at once.
+        """
+        lease = BackfillLease(self.db.locks)
+        if not lease.acquire():
+            logging.info("Another process is running the embedding backfill - skipping")
+            return {}
+        try:
+            return {
+                route.slot: self._backfill_job(route, batch_size, processes, max_rate).run(lease)
+                for route in self.embedding_registry.routes()
+            }
+        finally:
+            lease.release()
+
+    def migrate_embeddings(self, processes: int = None, max_rate: float = None) -> Dict:
+        """
+        Re-embed every entry into the migration slot with the new model, then
+        cut queries over to it once the slot is complete. The old slot is kept
+        until retire_embeddings, so workers still on it keep answering.
+        """
+        route = self.embedding_registry.migration()
+        if route is None:
+            raise ValueError("No embedding migration in progress")
+        lease = BackfillLease(self.db.locks)
+        if not lease.acquire():
+            raise RuntimeError("Another process is running the embedding backfill - try again later")
+        try:
+            job = self._backfill_job(route, processes=processes, max_rate=max_rate)
+            stats = job.run(lease)
+        finally:
+            lease.release()
+        remaining = job.remaining()
+        if remaining:
+            logging.warning(f"{remaining} entries still lack {route.model} vectors - not cutting over")
+        else:
+            search_fields = self._search_index_fields() if self._vector_backend() == "atlas" else None
+            self.embedding_registry.cutover(search_fields)
+            self._refresh_route(force=True)
+        return stats
+
+    def retire_embeddings(self) -> int:
+        """Drop the vectors of the model replaced by the last cutover"""
+        retired = self.embedding_registry.retired()
+        if retired is None:
+            raise ValueError("No retired embedding slot to remove")
+        migration = self.embedding_registry.migration()
+        if migration and migration.slot == retired.slot:
+            raise ValueError(f"'{retired.slot}' is already receiving a migration to {migration.model}")
+        result = self.collection.update_many(
+            {retired.slot: {"$exists": True}},
+            {"$unset": {retired.slot: "", model_key(retired.slot): "", dimensions_key(retired.slot): ""}}
+        )
+        self.embedding_registry.clear_retired()
+        logging.info(f"Removed {retired.model} vectors from {result.modified_count} entries")
+        return result.modified_count
+
+    def embedding_status(self) -> Dict:
+        """Serving and migration routes with how many entries each slot covers"""
+        total = self.collection.estimated_document_count()
+        status = {"entries": total}
+        for name, route in (("serving", self.embedding_registry.serving()),
+                            ("migration", self.embedding_registry.migration())):
+            status[name] = route and {
+                **route._asdict(),
+                "covered": self.collection.count_documents(slot_query(route))
+            }
+        return status
+
+    def start_live_updates(self):
+        """
+        Keep the resident indexes current: entry inserts, updates and deletes
+        land in a delta segment searched alongside them within seconds.
+        """
+        if self._live_updater is None:
+            self._live_updater = LiveIndexUpdater(
+                self,
+                poll_interval=float(os.getenv("LIVE_INDEX_POLL_SECONDS", "5")),
+                sweep_interval=float(os.getenv("LIVE_INDEX_SWEEP_SECONDS", "300")),
+                compact_rows=int(os.getenv("LIVE_INDEX_COMPACT_ROWS", "5000"))
+            )
+            self._live_updater.start()
+
+    def _live_delta(self, generation: IndexGeneration = None) -> Optional[DeltaSegment]:
+        """Delta segment over a generation's resident indexes (None unless live updates run)"""
+        if self._live_updater is None:
+            return None
+        generation = generation or self._generation
+        if generation.delta is None:
+            vector_index = self._get_vector_index(generation)
+            bm25_index = self._get_bm25_index(generation)
+            with generation.lock:
+                if generation.delta is None:
+                    generation.delta = DeltaSegment(vector_index, bm25_index, generation.route.slot)
+        return generation.delta
+
+    def _apply_live_upsert(self, doc: Dict):
+        self._live_delta().upsert(doc)
+        if self.reference_table is not None:
+            self.reference_table.add(doc)
+
+    def _apply_live_delete(self, doc_id):
+        self._live_delta().delete(doc_id)
+
+    def compact_live_index(self):
+        """Fold the delta into freshly built base indexes (a new store version if one is on disk)"""
+        if VectorIndex.current_version(self.vector_store_path):
+            self.build_vector_store()
+        else:
+            self._generation = self._build_memory_generation()
+
+    def _build_memory_generation(self) -> IndexGeneration:
+        """No on-disk store: warm a new in-memory generation from MongoDB, ready to swap in"""
+        generation = IndexGeneration(None, self._route)
+        self._get_vector_index(generation)
+        self._get_bm25_index(generation)
+        return generation
+
+    def _refresh_generation_async(self) -> Future:
+        """Rebuild the resident indexes in the background (a new store version if one is on disk)"""
+        if VectorIndex.current_version(self.vector_store_path):
+            return self.rebuild_indexes_async()
+        return self._index_builder.submit(
+            self._build_memory_generation,
+            lambda generation: None,
+            lambda generation: setattr(self, '_generation', generation),
+            key="memory"
+        )
+
+    def _fetch_hits(self, hits: List[tuple]) -> List[Dict]:
+        """
+        Phase two of local retrieval: once the index has picked the final
+        (_id, score) hits, fetch just their projected fields in one $in
+        round trip and return them in rank order.
+        """
+        if not hits:
+            return []
+        ids = [doc_id for doc_id, _ in hits]
+        docs = {
+            doc['_id']: doc
+            for doc in self.collection.find({"_id": {"$in": ids}}, RESULT_PROJECTION)
+        }
+
+        results = []
+        for doc_id, score in hits:
+            doc = docs.get(doc_id)
+            if doc is not None:
+                doc['score'] = score
+                results.append(doc)
+        return results
+
+    def _load_reference_table(self):
+        """Load the in-memory scripture reference table (falls back to DB queries on failure)"""
+        try:
+            self.reference_table = ReferenceTable.from_cursor(self.collection.find(
+                {"source": {"$in": [KnowledgeSource.QURAN.value, KnowledgeSource.BIBLE.value]}},
+                ReferenceTable.PROJECTION
+            ))
+        except Exception as e:
+            logging.error(f"Reference table load failed: {str(e)}")
+            self.reference_table = None
+
+    def get_by_references(self, references: List[str], source: str = None,
+                          neighbours: int = 0) -> Dict[str, List[Dict]]:
+        """
+        Resolve many references, including ranges such as "2:255-257" or
+        "John 3:16-18", in a single round trip. Each reference maps to its
+        documents in verse order; with `neighbours` > 0, surrounding verses
+        from the same chapter are included and flagged with 'context': True.
+        """
+        parsed = {}
+        for reference in references:
+            ref = parse_reference(reference, source)
+            if ref is None:
+                logging.warning(f"Unrecognized reference '{reference}'")
+            else:
+                parsed[reference] = ref
+        if not parsed:
+            return {reference: [] for reference in references}
+
+        if self.reference_table is not None:
+            resolved = {ref: self.reference_table.resolve(p, neighbours) for ref, p in parsed.items()}
+            ids = list({doc_id for pairs in resolved.values() for doc_id, _ in pairs})
+            docs = {doc['_id']: doc for doc in self.collection.find({"_id": {"$in": ids}}, RESULT_PROJECTION)}
+        else:
+            # No table: one $or query over every requested range
+            clauses = [self._reference_clause(p, neighbours) for p in parsed.values()]
+            fetched = list(self.collection.find({"$or": clauses}, RESULT_PROJECTION))
+            table = ReferenceTable.from_cursor(fetched)
+            resolved = {ref: table.resolve(p, neighbours) for ref, p in parsed.items()}
+            docs = {doc['_id']: doc for doc in fetched}
+
+        results = {reference: [] for reference in references}
+        for reference, pairs in resolved.items():
+            for doc_id, is_context in pairs:
+                doc = docs.get(doc_id)
+                if doc is not None:
+                    results[reference].append({**doc, 'context': True} if is_context else doc)
+        return results
+
+    @staticmethod
+    def _reference_clause(parsed: ParsedReference, neighbours: int) -> Dict:
+        verses = {"$gte": parsed.start - neighbours, "$lte": parsed.end + neighbours}
+        if parsed.source == KnowledgeSource.QURAN.value:
+            return {"source": parsed.source, "metadata.surah_number": parsed.chapter,
+                    "metadata.ayah_number": verses}
+        return {"source": parsed.source,
+                "metadata.book": {"$regex": f"^{re.escape(parsed.book)}$", "$options": "i"},
+                "metadata.chapter": parsed.chapter, "metadata.verse": verses}
+
     def get_by_reference(self, reference: str, source: str) -> Optional[Dict]:
         """
         Retrieve document by its reference using existing metadata.
         """
         try:
-            if source == KnowledgeSource.QURAN.value:
-                parts = reference.split(':')
-                if len(parts) == 2:
-                    return self.collection.find_one({
-                        "source": source,
-                        "metadata.surah_number": int(parts[0]),
-                        "metadata.ayah_number": int(parts[1])
-                    })
-            elif source == KnowledgeSource.BIBLE.value:
-                return self.collection.find_one({
-                    "source": source,
-                    "metadata.reference": reference
-                })
-            return None
+            matches = self.get_by_references([reference], source).get(reference, [])
+            return matches[0] if matches else None
         except Exception as e:
-            logging.getLogger(f"Reference lookup failed: {str(e)}")
+            logging.error(f"Reference lookup failed for '{reference}': {str(e)}")
             return None
 
     def __del__(self):
-        """Clean up MongoDB connection"""
+        """Clean up MongoDB connection and search threads"""
+        if getattr(self, '_live_updater', None):
+            self._live_updater.stop()
+        if hasattr(self, '_index_builder'):
+            self._index_builder.shutdown()
+        for executor in ('_search_executor', '_shard_executor'):
+            if hasattr(self, executor):
+                getattr(self, executor).shutdown(wait=False)
         if hasattr(self, 'client') and self.client:
             try:
                 self.client.close()
@@ -0,0 +1,347 @@
+import logging
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+from .bm25_index import BM25Index
+from .embedding_models import VECTOR_SLOTS, model_key
+from .filter_index import FilterIndex, FilterValues
+from .vector_codec import decode_vector
+from .vector_index import normalize_query, top_k
+
+logger = logging.getLogger(__name__)
+
+# Fields a delta entry needs to be searchable by vector, keyword, source and filters
+DELTA_PROJECTION = {
+    "content": 1, "source": 1, "tags": 1, "metadata": 1, "created_at": 1, "updated_at": 1,
+    **{slot: 1 for slot in VECTOR_SLOTS},
+    **{model_key(slot): 1 for slot in VECTOR_SLOTS}
+}
+
+
+def last_changed(doc: Dict) -> Optional[datetime]:
+    """Latest of a document's created_at/updated_at (naive UTC), if it has either"""
+    stamps = [doc[field].replace(tzinfo=None) for field in ('created_at', 'updated_at')
+              if isinstance(doc.get(field), datetime)]
+    return max(stamps) if stamps else None
+
+
+def merge_hits(base: List[Tuple], delta: List[Tuple], limit: int) -> List[Tuple]:
+    """Top `limit` (_id, score) pairs across the base index and the delta segment"""
+    if not delta:
+        return base[:limit]
+    return sorted(base + delta, key=lambda hit: hit[1], reverse=True)[:limit]
+
+
+class TombstoneMask:
+    """Rows of one resident index hidden by later updates or deletes"""
+
+    def __init__(self, ids: Sequence):
+        self._row_of = {doc_id: row for row, doc_id in enumerate(ids)}
+        self.alive = np.ones(len(ids), dtype=bool)
+        self.dead = 0
+
+    def __len__(self) -> int:
+        return len(self.alive)
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self._row_of
+
+    def live_ids(self) -> List:
+        return [doc_id for doc_id, row in self._row_of.items() if self.alive[row]]
+
+    def kill(self, doc_id):
+        row = self._row_of.get(doc_id)
+        if row is not None and self.alive[row]:
+            self.alive[row] = False
+            self.dead += 1
+
+    def mask(self) -> Optional[np.ndarray]:
+        """Live-row mask, or None while nothing has been tombstoned"""
+        return self.alive if self.dead else None
+
+
+class DeltaSegment:
+    """
+    Entries inserted or changed since the resident vector and BM25 indexes
+    were built. A change tombstones the entry's base rows and keeps its
+    current version here, searched exactly, until the next compaction.
+    Catch-up re-reads of base entries last changed before the build are
+    applied too (clock skew), but not counted as pending changes.
+    """
+
+    def __init__(self, vector_index, bm25_index: BM25Index, vector_field: str = 'vector'):
+        self.vector_index = vector_index
+        self.bm25_index = bm25_index
+        self.vector_field = vector_field
+        self.vector_tombstones = TombstoneMask(vector_index.ids)
+        self.keyword_tombstones = TombstoneMask(bm25_index.ids)
+        self._entries: Dict[object, Dict] = {}
+        # Base entries whose delta version is only a re-read from before the build
+        self._replayed: set = set()
+        self._lock = Lock()
+        self._snapshot = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def tombstones(self) -> int:
+        return self.vector_tombstones.dead
+
+    @property
+    def pending(self) -> int:
+        """Delta entries that are real changes since the build"""
+        with self._lock:
+            return len(self._entries) - len(self._replayed)
+
+    @property
+    def changed_rows(self) -> int:
+        """Base vector rows hidden by changes since the build"""
+        with self._lock:
+            replayed = sum(1 for doc_id in self._replayed if doc_id in self.vector_tombstones)
+            return self.vector_tombstones.dead - replayed
+
+    def live_rows(self) -> int:
+        """Searchable vector rows: base rows not tombstoned plus delta entries with vectors"""
+        with self._lock:
+            added = sum(1 for entry in self._entries.values() if entry["vector"] is not None)
+            return len(self.vector_tombstones) - self.vector_tombstones.dead + added
+
+    def upsert(self, doc: Dict):
+        vector = decode_vector(doc.get(self.vector_field))
+        model = doc.get(model_key(self.vector_field), self.vector_index.model_name)
+        if vector is not None and (len(vector) != self.vector_index.dimensions
+                                   or model != self.vector_index.model_name):
+            vector = None
+        entry = {
+            "source": doc.get('source', ''),
+            "tags": doc.get('tags', []),
+            "metadata": doc.get('metadata', {}),
+            "vector": normalize_query(vector) if vector is not None else None,
+            "terms": BM25Index.term_counts(doc.get('content'))
+        }
+        changed = last_changed(doc)
+        built_at = self.vector_index.created_at
+        replay = changed is not None and built_at is not None and changed <= built_at
+        with self._lock:
+            doc_id = doc['_id']
+            in_base = doc_id in self.vector_tombstones or doc_id in self.keyword_tombstones
+            already_changed = doc_id in self._entries and doc_id not in self._replayed
+            if replay and in_base and not already_changed:
+                self._replayed.add(doc_id)
+            else:
+                self._replayed.discard(doc_id)
+            self.vector_tombstones.kill(doc_id)
+            self.keyword_tombstones.kill(doc_id)
+            self._entries[doc_id] = entry
+            self._snapshot = None
+
+    def delete(self, doc_id):
+        with self._lock:
+            self.vector_tombstones.kill(doc_id)
+            self.keyword_tombstones.kill(doc_id)
+            self._entries.pop(doc_id, None)
+            self._replayed.discard(doc_id)
+            self._snapshot = None
+
+    def known_ids(self) -> set:
+        """Every _id the base indexes or the delta still consider live"""
+        with self._lock:
+            return (set(self.vector_tombstones.live_ids()) | set(self.keyword_tombstones.live_ids())
+                    | set(self._entries))
+
+    def _vector_snapshot(self) -> Tuple[List, List[Dict], np.ndarray]:
+        """(ids, entries, matrix) of delta entries with vectors, restacked only after a change"""
+        with self._lock:
+            if self._snapshot is None:
+                items = [(doc_id, e) for doc_id, e in self._entries.items() if e["vector"] is not None]
+                matrix = (np.stack([e["vector"] for _, e in items]) if items
+                          else np.empty((0, self.vector_index.dimensions), dtype=np.float32))
+                self._snapshot = ([doc_id for doc_id, _ in items], [e for _, e in items], matrix)
+            return self._snapshot
+
+    def search_vectors(self, embedding, limit: int, sources: Optional[Sequence[str]] = None,
+                       filters: Dict[str, FilterValues] = None) -> List[Tuple]:
+        """(_id, cosine score) pairs from the delta, with the same source/filter semantics as the base"""
+        ids, entries, matrix = self._vector_snapshot()
+        if not ids:
+            return []
+        keep = np.array([
+            (sources is None or e["source"] in sources) and (not filters or FilterIndex.matches(e, filters))
+            for e in entries
+        ])
+        scores = matrix @ normalize_query(embedding)
+        scores[~keep] = -np.inf
+        return [(ids[i], float(scores[i])) for i in top_k(scores, limit) if keep[i]]
+
+    def search_keywords(self, query: str, limit: int, source: Optional[str] = None) -> List[Tuple]:
+        """(_id, BM25 score) pairs from the delta, scored with the base index's statistics"""
+        with self._lock:
+            items = [(doc_id, e) for doc_id, e in self._entries.items()
+                     if source is None or e["source"] == source]
+        if not items:
+            return []
+        scores = self.bm25_index.score_documents(query, [e["terms"] for _, e in items])
+        return [(items[i][0], float(scores[i])) for i in top_k(scores, limit) if scores[i] > 0]
+
+
+class LiveIndexUpdater:
+    """
+    Background thread that feeds `entries` changes into the retriever's delta
+    segment. Follows a MongoDB change stream when the deployment has one
+    (replica set / Atlas); otherwise polls a created_at/updated_at/_id
+    watermark and periodically sweeps _ids to notice deletes. Compacts the
+    delta into freshly built base indexes once it grows too large.
+    """
+
+    # Slack for clock skew between the writers' created_at and the index build time
+    OVERLAP = timedelta(minutes=1)
+    # Wait after a failed compaction, doubling per consecutive failure up to the maximum
+    COMPACT_BACKOFF = timedelta(minutes=1)
+    MAX_COMPACT_BACKOFF = timedelta(hours=1)
+
+    def __init__(self, retriever, poll_interval: float = 5.0, sweep_interval: float = 300.0,
+                 compact_rows: int = 5000, compact_ratio: float = 0.1):
+        self.retriever = retriever
+        self.poll_interval = poll_interval
+        self.sweep_interval = sweep_interval
+        self.compact_rows = compact_rows
+        self.compact_ratio = compact_ratio
+
+        self.use_change_stream = True
+        self._watermark: Optional[datetime] = None
+        self._resume_token = None
+        self._delta: Optional[DeltaSegment] = None
+        self._last_sweep = datetime.utcnow()
+        self._compact_failures = 0
+        self._compact_after: Optional[datetime] = None
+        self._stop = Event()
+        self._thread = Thread(target=self._run, name="live-index-updater", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=self.poll_interval + 1)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.use_change_stream:
+                    self._follow_change_stream()
+                else:
+                    self._ensure_delta()
+                    self._poll()
+                    self._maybe_sweep()
+                    self._maybe_compact()
+                    self._stop.wait(self.poll_interval)
+            except OperationFailure as e:
+                if self.use_change_stream:
+                    logger.info(f"Change streams unavailable ({e.code}) - polling for entry changes")
+                    self.use_change_stream = False
+                else:
+                    logger.error(f"Live index update failed: {str(e)}")
+                    self._stop.wait(self.poll_interval)
+            except PyMongoError as e:
+                logger.error(f"Live index update failed: {str(e)}")
+                self._stop.wait(self.poll_interval)
+            except Exception as e:
+                # Never let the thread die silently; the next pass starts from a fresh delta
+                logger.exception(f"Live index updater error: {str(e)}")
+                self._stop.wait(self.poll_interval)
+
+    def _ensure_delta(self) -> DeltaSegment:
+        """Current delta; when it is new (startup, compaction, reload) catch up from its base build time"""
+        delta = self.retriever._live_delta()
+        if delta is not self._delta:
+            self._delta = delta
+            created_at = delta.vector_index.created_at
+            self._watermark = created_at - self.OVERLAP if created_at else None
+            if self._watermark is not None:
+                self._poll()
+        return delta
+
+    def _follow_change_stream(self):
+        # Open the stream before catching up so nothing between the two is missed
+        with self.retriever.collection.watch(full_document='updateLookup', resume_after=self._resume_token,
+                                             max_await_time_ms=1000) as stream:
+            self._ensure_delta()
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is None:
+                    # The stream reports deletes, but not those between the index build and the
+                    # stream opening (or across an invalidate), so sweep here as well
+                    self._maybe_sweep()
+                    self._maybe_compact()
+                    self._ensure_delta()
+                    continue
+                self._resume_token = stream.resume_token
+                operation = change['operationType']
+                if operation in ('insert', 'update', 'replace') and change.get('fullDocument'):
+                    self.retriever._apply_live_upsert(change['fullDocument'])
+                elif operation == 'delete':
+                    self.retriever._apply_live_delete(change['documentKey']['_id'])
+                elif operation in ('drop', 'rename', 'invalidate'):
+                    self._resume_token = None
+                    self.retriever.reload_vector_index()
+                    return
+
+    def _poll(self):
+        """Apply every entry created or updated since the watermark"""
+        if self._watermark is None:
+            self._watermark = datetime.utcnow() - self.OVERLAP
+            return
+        since = self._watermark
+        query = {"$or": [
+            {"created_at": {"$gte": since}},
+            {"updated_at": {"$gte": since}},
+            {"_id": {"$gte": ObjectId.from_datetime(since)}}
+        ]}
+        newest = since
+        for doc in self.retriever.collection.find(query, DELTA_PROJECTION):
+            self.retriever._apply_live_upsert(doc)
+            for field in ('created_at', 'updated_at'):
+                if isinstance(doc.get(field), datetime):
+                    newest = max(newest, doc[field].replace(tzinfo=None))
+        # Keep the overlap so writes from slightly skewed clocks are not skipped
+        self._watermark = max(since, min(newest, datetime.utcnow()) - self.OVERLAP)
+
+    def _maybe_sweep(self):
+        """Polling cannot see deletes, so periodically diff the live _ids against the indexes"""
+        if (datetime.utcnow() - self._last_sweep).total_seconds() < self.sweep_interval:
+            return
+        self._last_sweep = datetime.utcnow()
+        live = {doc['_id'] for doc in self.retriever.collection.find({}, {"_id": 1})}
+        removed = self._delta.known_ids() - live
+        for doc_id in removed:
+            self.retriever._apply_live_delete(doc_id)
+        if removed:
+            logger.info(f"Live index sweep removed {len(removed)} deleted entries")
+
+    def _maybe_compact(self):
+        delta = self._delta
+        if delta is None:
+            return
+        if self._compact_after is not None and datetime.utcnow() < self._compact_after:
+            return
+        # Overlap re-reads of entries already in the base do not count, or every
+        # compaction would re-trigger itself for the whole catch-up window
+        base_rows = max(len(delta.vector_tombstones), 1)
+        pending, changed_rows = delta.pending, delta.changed_rows
+        if pending >= self.compact_rows or changed_rows / base_rows >= self.compact_ratio:
+            logger.info(f"Compacting live index ({pending} delta entries, {changed_rows} changed rows)")
+            try:
+                self.retriever.compact_live_index()
+            except Exception as e:
+                # Keep serving base + delta; retry later rather than on every pass
+                self._compact_failures += 1
+                backoff = min(self.COMPACT_BACKOFF * 2 ** (self._compact_failures - 1), self.MAX_COMPACT_BACKOFF)
+                self._compact_after = datetime.utcnow() + backoff
+                logger.error(f"Live index compaction failed ({str(e)}); retrying in {backoff}")
+            else:
+                self._compact_failures = 0
+                self._compact_after = None
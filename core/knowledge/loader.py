@@ -1,14 +1,19 @@
 from sklearn import logger
 from sklearn import cluster
 from sklearn.cluster import KMeans
-from sentence_transformers import SentenceTransformer
+from .embedding_service import get_embedding_service
 import numpy as np
 
 class ThemeGenerator:
     def __init__(self, knowledge_db):
         self.db = knowledge_db
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
         self.themes = {}
+
+    @property
+    def model(self):
+        """The shared service for the model serving queries, so themes follow an embedding cutover"""
+        model = getattr(self.db, 'embedding_model', None)
+        return model if model is not None else get_embedding_service()
         
     def generate_themes(self, n_clusters=5):
         """Auto-generate themes with empty check"""
@@ -18,7 +23,7 @@ class ThemeGenerator:
             return {}
     
         texts = [e['content'] for e in entries]
-        embeddings = self.model.encode(texts)
+        embeddings = self.model.encode_corpus(texts)
     
         # Ensure we have valid embeddings
         if len(embeddings) == 0:
@@ -34,8 +39,8 @@ class ThemeGenerator:
         clusters = kmeans.fit_predict(embeddings)
         
         # Extract keywords for each cluster
-        for cluster_id in range(n_clusters):
-            cluster_texts = [t for t, c in zip(texts, cluster) if c == cluster_id]
+        for cluster_id in range(kmeans.n_clusters):
+            cluster_texts = [t for t, c in zip(texts, clusters) if c == cluster_id]
             self.themes[f"theme_{cluster_id}"] = self._extract_keywords(cluster_texts)
         
         return self.themes
@@ -0,0 +1,210 @@
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from .vector_index import VectorIndex, normalize_query, top_k
+
+logger = logging.getLogger(__name__)
+
+QUANTIZED_FILENAMES = {"int8": "sq8.npz", "pq": "pq.npz"}
+
+
+class ScalarQuantizer:
+    """Per-dimension int8 scalar quantization (4x smaller than float32)"""
+
+    kind = "int8"
+
+    def __init__(self, minimum: np.ndarray, scale: np.ndarray):
+        self.minimum = minimum.astype(np.float32)
+        self.scale = scale.astype(np.float32)
+
+    @classmethod
+    def train(cls, sample: np.ndarray) -> 'ScalarQuantizer':
+        minimum = sample.min(axis=0)
+        scale = (sample.max(axis=0) - minimum) / 255.0
+        scale[scale == 0] = 1.0
+        return cls(minimum, scale)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.minimum) / self.scale)
+        return (np.clip(codes, 0, 255) - 128).astype(np.int8)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray, chunk_size: int = 16384) -> np.ndarray:
+        """Approximate inner products: q.x ~= q.min + (q*scale).(code + 128)"""
+        weights = query * self.scale
+        offset = float(query @ self.minimum + 128.0 * weights.sum())
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), chunk_size):
+            chunk = codes[start:start + chunk_size].astype(np.float32)
+            out[start:start + chunk_size] = chunk @ weights
+        return out + offset
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"minimum": self.minimum, "scale": self.scale}
+
+    def codebook_bytes(self) -> int:
+        return self.minimum.nbytes + self.scale.nbytes
+
+
+class ProductQuantizer:
+    """
+    Product quantization: each vector is split into `m` sub-vectors and each
+    sub-vector is replaced by the id of its nearest of 256 sub-centroids.
+    """
+
+    kind = "pq"
+
+    def __init__(self, codebooks: np.ndarray):
+        # codebooks: (m, ksub, dsub)
+        self.codebooks = codebooks.astype(np.float32)
+
+    @property
+    def m(self) -> int:
+        return self.codebooks.shape[0]
+
+    @property
+    def dsub(self) -> int:
+        return self.codebooks.shape[2]
+
+    @classmethod
+    def train(cls, sample: np.ndarray, m: Optional[int] = None, ksub: int = 256, seed: int = 42) -> 'ProductQuantizer':
+        dimensions = sample.shape[1]
+        m = m or max(1, dimensions // 8)
+        if dimensions % m:
+            raise ValueError(f"PQ sub-quantizers ({m}) must divide the vector dimensions ({dimensions})")
+        ksub = min(ksub, len(sample))
+        dsub = dimensions // m
+
+        codebooks = np.empty((m, ksub, dsub), dtype=np.float32)
+        for i in range(m):
+            kmeans = MiniBatchKMeans(n_clusters=ksub, random_state=seed, n_init=3, batch_size=max(1024, ksub * 4))
+            kmeans.fit(sample[:, i * dsub:(i + 1) * dsub])
+            codebooks[i] = kmeans.cluster_centers_
+        return cls(codebooks)
+
+    def encode(self, vectors: np.ndarray, chunk_size: int = 16384) -> np.ndarray:
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+            for i, codebook in enumerate(self.codebooks):
+                sub = chunk[:, i * self.dsub:(i + 1) * self.dsub]
+                # argmin ||sub - c||^2 == argmax (2 sub.c - ||c||^2)
+                distances = 2 * sub @ codebook.T - (codebook ** 2).sum(axis=1)
+                codes[start:start + chunk_size, i] = np.argmax(distances, axis=1)
+        return codes
+
+    def scores(self, codes: np.ndarray, query: np.ndarray, chunk_size: int = 16384) -> np.ndarray:
+        """Asymmetric inner products via one (m, ksub) lookup table per query"""
+        table = np.einsum('mkd,md->mk', self.codebooks, query.reshape(self.m, self.dsub))
+        subspaces = np.arange(self.m)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), chunk_size):
+            out[start:start + chunk_size] = table[subspaces, codes[start:start + chunk_size]].sum(axis=1)
+        return out
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    def codebook_bytes(self) -> int:
+        return self.codebooks.nbytes
+
+
+QUANTIZERS = {"int8": ScalarQuantizer, "pq": ProductQuantizer}
+
+
+class QuantizedIndex:
+    """
+    Compressed in-memory codes scanned for a shortlist, which is then
+    re-ranked exactly against the full-precision (memory-mapped) vectors.
+    """
+
+    def __init__(self, vector_index: VectorIndex, quantizer, codes: np.ndarray, rerank_factor: int = 4):
+        self.vector_index = vector_index
+        self.quantizer = quantizer
+        self.codes = codes
+        self.rerank_factor = rerank_factor
+
+    @property
+    def kind(self) -> str:
+        return self.quantizer.kind
+
+    @classmethod
+    def build(cls, vector_index: VectorIndex, kind: str = "int8", rerank_factor: int = 4,
+              max_training_points: int = 65536, seed: int = 42, **kwargs) -> 'QuantizedIndex':
+        if kind not in QUANTIZERS:
+            raise ValueError(f"Unknown quantizer '{kind}' (expected one of {list(QUANTIZERS)})")
+        n = len(vector_index)
+        if n == 0:
+            raise ValueError("Cannot quantize an empty vector index")
+
+        rng = np.random.default_rng(seed)
+        sample = vector_index.vectors[np.sort(rng.choice(n, min(n, max_training_points), replace=False))]
+        quantizer = QUANTIZERS[kind].train(np.asarray(sample, dtype=np.float32), **kwargs)
+        codes = quantizer.encode(vector_index.vectors)
+
+        index = cls(vector_index, quantizer, codes, rerank_factor)
+        logger.info(f"Built {kind} quantized index: {index.memory_footprint()}")
+        return index
+
+    def search(self, embedding, limit: int, rerank_factor: Optional[int] = None,
+               mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Shortlist by approximate score (masked rows only), then re-rank with exact cosine"""
+        if not len(self.codes):
+            return []
+        query = normalize_query(embedding)
+        if mask is not None:
+            rows = np.flatnonzero(mask)
+            if rows.size == 0:
+                return []
+            approximate = self.quantizer.scores(self.codes[rows], query)
+            shortlist = rows[top_k(approximate, limit * (rerank_factor or self.rerank_factor))]
+        else:
+            approximate = self.quantizer.scores(self.codes, query)
+            shortlist = top_k(approximate, limit * (rerank_factor or self.rerank_factor))
+
+        shortlist.sort()
+        exact = np.asarray(self.vector_index.vectors[shortlist], dtype=np.float32) @ query
+        best = top_k(exact, limit)
+        return [(int(shortlist[i]), float(exact[i])) for i in best]
+
+    def memory_footprint(self) -> Dict[str, float]:
+        """Resident bytes for the codes versus holding float32 vectors in RAM"""
+        code_bytes = self.codes.nbytes + self.quantizer.codebook_bytes()
+        float32_bytes = len(self.vector_index) * self.vector_index.dimensions * 4
+        return {
+            "rows": len(self.vector_index),
+            "code_bytes": code_bytes,
+            "bytes_per_vector": self.codes.nbytes / max(len(self.codes), 1),
+            "float32_bytes": float32_bytes,
+            "compression_ratio": round(float32_bytes / code_bytes, 2) if code_bytes else 0.0
+        }
+
+    def save(self, version_dir: str):
+        np.savez(
+            os.path.join(version_dir, QUANTIZED_FILENAMES[self.kind]),
+            codes=self.codes,
+            row_count=np.int64(len(self.vector_index)),
+            **self.quantizer.state()
+        )
+        logger.info(f"Saved {self.kind} quantized index to {version_dir}")
+
+    @classmethod
+    def load(cls, version_dir: str, vector_index: VectorIndex, kind: str, rerank_factor: int = 4) -> 'QuantizedIndex':
+        with np.load(os.path.join(version_dir, QUANTIZED_FILENAMES[kind])) as data:
+            if int(data['row_count']) != len(vector_index):
+                raise ValueError("Quantized index does not match the vector store it was loaded with")
+            state = {key: data[key] for key in data.files if key not in ('codes', 'row_count')}
+            return cls(vector_index, QUANTIZERS[kind](**state), data['codes'], rerank_factor)
+
+
+def recall_at_k(candidate, exact: VectorIndex, queries: np.ndarray, k: int = 10) -> float:
+    """Mean fraction of the exact top-k that `candidate.search` also returns"""
+    if not len(queries):
+        return 0.0
+    total = 0.0
+    for query in queries:
+        expected = {row for row, _ in exact.search(query, k)}
+        found = {row for row, _ in candidate.search(query, k)}
+        total += len(expected & found) / max(len(expected), 1)
+    return total / len(queries)
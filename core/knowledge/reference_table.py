@@ -0,0 +1,171 @@
+import logging
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# "2:255", "2:255-257"
+_QURAN_REFERENCE = re.compile(r'^\s*(\d{1,3})\s*:\s*(\d{1,3})(?:\s*[-–]\s*(\d{1,3}))?\s*$')
+# "John 3:16", "1 John 4:7-8", "Song of Solomon 2:1"
+_BIBLE_REFERENCE = re.compile(
+    r'^\s*((?:[1-3]\s*)?[A-Za-z][A-Za-z ]*?)\s+(\d{1,3})\s*:\s*(\d{1,3})(?:\s*[-–]\s*(\d{1,3}))?\s*$'
+)
+
+BIBLE_BOOKS = [
+    "Genesis", "Exodus", "Leviticus", "Numbers", "Deuteronomy", "Joshua", "Judges", "Ruth",
+    "1 Samuel", "2 Samuel", "1 Kings", "2 Kings", "1 Chronicles", "2 Chronicles", "Ezra",
+    "Nehemiah", "Esther", "Job", "Psalms", "Psalm", "Proverbs", "Ecclesiastes", "Song of Solomon",
+    "Isaiah", "Jeremiah", "Lamentations", "Ezekiel", "Daniel", "Hosea", "Joel", "Amos", "Obadiah",
+    "Jonah", "Micah", "Nahum", "Habakkuk", "Zephaniah", "Haggai", "Zechariah", "Malachi",
+    "Matthew", "Mark", "Luke", "John", "Acts", "Romans", "1 Corinthians", "2 Corinthians",
+    "Galatians", "Ephesians", "Philippians", "Colossians", "1 Thessalonians", "2 Thessalonians",
+    "1 Timothy", "2 Timothy", "Titus", "Philemon", "Hebrews", "James", "1 Peter", "2 Peter",
+    "1 John", "2 John", "3 John", "Jude", "Revelation"
+]
+BOOK_ALIASES = {"psalm": "psalms"}
+
+_RANGE = r'(\d{1,3})\s*:\s*(\d{1,3})(?:\s*[-–]\s*(\d{1,3}))?'
+_BOOK_NAMES = '|'.join(
+    re.escape(book).replace(r'\ ', r'\s*') for book in sorted(BIBLE_BOOKS, key=len, reverse=True)
+)
+_BIBLE_CITATION = re.compile(rf'\b({_BOOK_NAMES})\s+{_RANGE}(?![\d:])', re.IGNORECASE)
+# A bare "2:255" only counts when prefixed by Quran/Surah or when it is the whole message
+_QURAN_CITATION = re.compile(rf"(?:\b(?:quran|qur'an|koran|surah|sura)\s*){_RANGE}(?![\d:])", re.IGNORECASE)
+_BARE_CITATION = re.compile(rf'^\W*{_RANGE}\W*$')
+
+# Words that may surround citations in a plain "show me the verse" request
+CITATION_FILLER = {
+    "quran", "qur'an", "koran", "surah", "sura", "bible", "verse", "verses", "ayah", "ayat", "chapter",
+    "and", "or", "the", "of", "a", "to", "me", "please", "show", "read", "recite", "quote", "cite",
+    "give", "what", "does", "do", "say", "says", "is", "are", "in", "from"
+}
+
+RefKey = Tuple[str, str, int, int]  # (source, book, chapter, verse); book is "" for the Quran
+
+
+class ParsedReference(NamedTuple):
+    source: str
+    book: str
+    chapter: int
+    start: int
+    end: int
+
+
+def _book_key(book: str) -> str:
+    """Case/spacing-insensitive book name ("1John" and "1 john" match)"""
+    key = ' '.join(re.sub(r'^([1-3])\s*', r'\1 ', book.strip().lower()).split())
+    return BOOK_ALIASES.get(key, key)
+
+
+def _format_range(chapter: str, start: str, end: Optional[str]) -> str:
+    return f"{int(chapter)}:{int(start)}" + (f"-{int(end)}" if end else "")
+
+
+def detect_references(text: str) -> List[str]:
+    """
+    Find scripture citations in free text: Bible book citations
+    ("John 3:16", "1 John 4:7-8") and Quran citations ("Quran 2:255",
+    "Surah 2:255-257", or a message that is only "2:255").
+    Returns them as strings accepted by parse_reference.
+    """
+    references = []
+    for match in _BIBLE_CITATION.finditer(text):
+        book = ' '.join(re.sub(r'^([1-3])\s*', r'\1 ', match.group(1)).split()).title()
+        references.append(f"{book} {_format_range(*match.group(2, 3, 4))}")
+
+    quran_matches = list(_QURAN_CITATION.finditer(text)) or list(_BARE_CITATION.finditer(text))
+    for match in quran_matches:
+        if 1 <= int(match.group(1)) <= 114:
+            references.append(_format_range(*match.group(1, 2, 3)))
+    return references
+
+
+def strip_references(text: str) -> str:
+    """`text` with every citation detect_references would find removed"""
+    for pattern in (_BIBLE_CITATION, _QURAN_CITATION, _BARE_CITATION):
+        text = pattern.sub(' ', text)
+    return text
+
+
+def is_citation_only(text: str) -> bool:
+    """
+    True when a message is essentially just citations ("John 3:16",
+    "show me Quran 2:255 and 2:256"), with nothing left to answer once
+    they are quoted.
+    """
+    if not detect_references(text):
+        return False
+    remaining = re.findall(r"[a-z']+", strip_references(text).lower())
+    return all(word in CITATION_FILLER for word in remaining)
+
+
+def parse_reference(reference: str, source: Optional[str] = None) -> Optional[ParsedReference]:
+    """
+    Parse a Quran ("2:255", "2:255-257") or Bible ("John 3:16-18")
+    reference, including verse ranges. Returns None if unrecognized.
+    """
+    match = _QURAN_REFERENCE.match(reference)
+    if match and source in (None, 'quran'):
+        chapter, start, end = int(match.group(1)), int(match.group(2)), match.group(3)
+        end = int(end) if end else start
+        return ParsedReference('quran', '', chapter, start, end) if end >= start else None
+
+    match = _BIBLE_REFERENCE.match(reference)
+    if match and source in (None, 'bible'):
+        book, chapter, start, end = match.group(1), int(match.group(2)), int(match.group(3)), match.group(4)
+        end = int(end) if end else start
+        return ParsedReference('bible', _book_key(book), chapter, start, end) if end >= start else None
+    return None
+
+
+class ReferenceTable:
+    """In-memory (source, book, chapter, verse) -> _id map for scripture entries"""
+
+    PROJECTION = {
+        "source": 1,
+        "metadata.surah_number": 1,
+        "metadata.ayah_number": 1,
+        "metadata.book": 1,
+        "metadata.chapter": 1,
+        "metadata.verse": 1
+    }
+
+    def __init__(self):
+        self._ids: Dict[RefKey, object] = {}
+
+    @staticmethod
+    def key_for(doc: Dict) -> Optional[RefKey]:
+        meta = doc.get('metadata', {})
+        if doc.get('source') == 'quran' and 'surah_number' in meta and 'ayah_number' in meta:
+            return ('quran', '', int(meta['surah_number']), int(meta['ayah_number']))
+        if doc.get('source') == 'bible' and 'book' in meta and 'chapter' in meta and 'verse' in meta:
+            return ('bible', _book_key(meta['book']), int(meta['chapter']), int(meta['verse']))
+        return None
+
+    @classmethod
+    def from_cursor(cls, cursor: Iterable[dict]) -> 'ReferenceTable':
+        table = cls()
+        for doc in cursor:
+            table.add(doc)
+        logger.info(f"Loaded reference table with {len(table)} verses")
+        return table
+
+    def add(self, doc: Dict):
+        key = self.key_for(doc)
+        if key is not None:
+            self._ids[key] = doc['_id']
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def resolve(self, parsed: ParsedReference, neighbours: int = 0) -> List[Tuple[object, bool]]:
+        """
+        (_id, is_context) pairs in verse order: every verse of the parsed
+        range, plus up to `neighbours` verses either side in the same chapter.
+        """
+        resolved = []
+        for verse in range(max(1, parsed.start - neighbours), parsed.end + neighbours + 1):
+            doc_id = self._ids.get((parsed.source, parsed.book, parsed.chapter, verse))
+            if doc_id is not None:
+                resolved.append((doc_id, not parsed.start <= verse <= parsed.end))
+        return resolved
@@ -2,10 +2,13 @@ from logging.handlers import RotatingFileHandler
 import os
 import numpy as np
 from typing import List, Dict, Optional
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 from .knowledge_db import KnowledgeRetriever, KnowledgeSource
+from .reference_table import detect_references
+from .index_generation import BackgroundBuilder
+from .theme_tagger import THEME_HIERARCHY, ThemeTagger
 import logging
+from concurrent.futures import Future
 from tenacity import retry, stop_after_attempt, wait_exponential
 from collections import defaultdict
 from sklearn.cluster import KMeans
@@ -44,67 +47,83 @@ configure_logging()
 class SacredScanner:
     def __init__(self, knowledge_db: KnowledgeRetriever):
         self.db = knowledge_db
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
-        self.theme_hierarchy = {
-            'mercy': ['forgive', 'compassion', 'kindness', 'pardon', 'merciful'],
-            'comfort': ['lonely', 'sad', 'ease', 'distress', 'anxiety', 'peace'],
-            'prophets': ['muhammad', 'isa', 'musa', 'abraham', 'david', 'solomon'],
-            'prayer': ['supplication', 'dua', 'worship', 'invocation'],
-            'patience': ['perseverance', 'steadfast', 'endurance', 'trials']
-        }
+        self.theme_hierarchy = THEME_HIERARCHY
+        self.theme_tagger = ThemeTagger(THEME_HIERARCHY, whole_words=True)
         self.thematic_index = defaultdict(list)
-        self._refresh_thematic_index()
+        self._thematic_builder = BackgroundBuilder("thematic-index")
+        # Built in the background; the empty index serves until the first build is swapped in
+        self.refresh_thematic_index_async()
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def scan(self, question: str, context: Optional[Dict] = None) -> Dict[str, List[Dict]]:
         """Enhanced context-aware knowledge retrieval"""
         try:
-            # Step 1: Generate embedding
-            question_embedding = self.embedder.encode(question)
-            logging.info(f"Generated embedding for question: {question}")
-    
-            # Step 2: Try vector search first
-            vector_results = []
-            try:
-                vector_results = self.db.similarity_search_by_embedding(question_embedding, limit=25)
-                logging.info(f"Found {len(vector_results)} vector results")
-            
-                # If we have results, process them
-                if vector_results:
-                    processed_results = self._process_results(vector_results)
-                    return processed_results
-                
-            except Exception as e:
-                logging.error(f"Vector search failed: {str(e)}")
+            # Steps 1-2: Embed and vector search in one call, so the query is encoded by the
+            # model of the vectors it is searched against (even mid embedding migration)
+            question_embedding, vector_results = self.db.vector_search_with_embedding(question, limit=25)
+            logging.info(f"Found {len(vector_results)} vector results")
+
+            # If we have results, process them
+            if vector_results:
+                return self._process_results(vector_results, question_embedding)
     
-            # Step 3: Fallback to text search if vector search fails or returns no results
-            logging.info("Falling back to text search")
-            text_results = self.db.text_search(question, limit=30)
-            return self._process_results(text_results)
+            # Step 3: Fallback to keyword (BM25) search if vector search fails or returns no results
+            logging.info("Falling back to keyword search")
+            text_results = self.db.keyword_search(question, limit=30)
+            return self._process_results(text_results, question_embedding)
     
         except Exception as e:
             logging.error(f"Scan failed completely for question '{question}': {str(e)}", exc_info=True)
             return self._empty_response()
         
-    def _process_results(self, results: List[Dict]) -> Dict[str, List[Dict]]:
+    def lookup_references(self, question: str) -> Optional[Dict[str, List[Dict]]]:
+        """
+        Fast path for direct scripture citations: resolve them through the
+        reference table without embedding or vector search. Returns None when
+        the question cites nothing that exists in the knowledge base.
+        """
+        references = detect_references(question)
+        if not references:
+            return None
+        try:
+            resolved = self.db.get_by_references(references)
+        except Exception as e:
+            logging.error(f"Reference lookup failed for {references}: {str(e)}")
+            return None
+
+        results = [doc for reference in references for doc in resolved.get(reference, [])]
+        if not results:
+            return None
+        for doc in results:
+            doc.setdefault('score', 1.0)
+        logging.info(f"Resolved {references} directly to {len(results)} verses")
+        return self._process_results(results)
+
+    def include_cited(self, cited: Dict[str, List[Dict]], scan_results: Dict[str, List[Dict]]) -> Dict[str, List[Dict]]:
+        """Put verses resolved from citations ahead of a scan's results (without duplicates)"""
+        cited_ids = {r['id'] for r in cited['all_results']}
+        results = cited['all_results'] + [
+            r for r in scan_results.get('all_results', []) if r.get('id') not in cited_ids
+        ]
+        return self._process_results(results, scan_results.get('query_embedding'))
+
+    def _process_results(self, results: List[Dict], query_embedding=None) -> Dict[str, List[Dict]]:
         """Process raw results into organized structure"""
         if not results:
             return self._empty_response()
     
-        # Ensure each result has required fields
+        # Results already carry only the projected fields; fill in defaults in place
         processed = []
         for r in results:
             if not isinstance(r, dict):
                 continue
-            processed.append({
-                'id': r.get('_id', str(hash(str(r)))),
-                'content': r.get('content', ''),
-                'source': r.get('source', ''),
-                'tags': r.get('tags', []),
-                'metadata': r.get('metadata', {}),
-                'score': r.get('score', 0.0),
-                'embedding': r.get('embedding', [])
-            })
+            r.setdefault('id', r.get('_id', str(hash(str(r)))))
+            r.setdefault('content', '')
+            r.setdefault('source', '')
+            r.setdefault('tags', [])
+            r.setdefault('metadata', {})
+            r.setdefault('score', 0.0)
+            processed.append(r)
     
         # Simple organization without clustering
         return {
@@ -112,7 +131,7 @@ class SacredScanner:
             'wisdom': [r for r in processed if r.get('source') != 'quran'][:3],
             'related': [],
             'all_results': processed,
-            'query_embedding': processed[0].get('embedding') if processed else None
+            'query_embedding': query_embedding
         }
         
     def _expand_query(self, question: str, context: Dict) -> str:
@@ -195,13 +214,7 @@ class SacredScanner:
 
     def _get_related_results(self, text: str, context_results: List[Dict]) -> List[Dict]:
         """Find thematically related content"""
-        keywords = self._extract_keywords(text)
-        themes = set()
-        
-        for word in keywords:
-            for theme, theme_words in self.theme_hierarchy.items():
-                if word in theme_words:
-                    themes.add(theme)
+        themes = self.theme_tagger.match(text)
         
         related = []
         for theme in themes:
@@ -211,12 +224,6 @@ class SacredScanner:
         context_ids = {r['id'] for r in context_results if 'id' in r}
         return [r for r in related if r.get('id') not in context_ids][:5]
 
-    def _extract_keywords(self, text: str) -> List[str]:
-        """Extract important keywords from text"""
-        if not text:
-            return []
-        return [word.lower() for word in text.split() if len(word) > 3 and word.isalpha()]
-
     def _deduplicate_results(self, results: List[Dict]) -> List[Dict]:
         """Remove duplicate results while preserving the highest score version"""
         unique_results = {}
@@ -226,9 +233,17 @@ class SacredScanner:
                 unique_results[result_id] = result
         return list(unique_results.values())
 
-    def _refresh_thematic_index(self):
+    def refresh_thematic_index_async(self) -> Future:
+        """Build a new thematic index on a background thread, then swap it in whole"""
+        return self._thematic_builder.submit(
+            self._build_thematic_index,
+            self._validate_thematic_index,
+            self._publish_thematic_index
+        )
+
+    def _build_thematic_index(self) -> Dict[str, List[Dict]]:
         """Build comprehensive thematic index"""
-        self.thematic_index = defaultdict(list)
+        thematic_index = defaultdict(list)
         
         for theme in self.theme_hierarchy.keys():
             try:
@@ -236,10 +251,21 @@ class SacredScanner:
                 bible_results = self.db.vector_search(theme, limit=10, source=KnowledgeSource.BIBLE.value)
                 book_results = self.db.vector_search(theme, limit=5, source=KnowledgeSource.BOOK.value)
                 
-                self.thematic_index[theme] = quran_results + bible_results + book_results
-                logging.info(f"Indexed {len(self.thematic_index[theme])} items for theme {theme}")
+                thematic_index[theme] = quran_results + bible_results + book_results
+                logging.info(f"Indexed {len(thematic_index[theme])} items for theme {theme}")
             except Exception as e:
                 logging.error(f"Error indexing theme {theme}: {str(e)}", exc_info=True)
+        return thematic_index
+
+    def _validate_thematic_index(self, thematic_index: Dict[str, List[Dict]]):
+        """Reject a rebuild that lost more than half of the current index"""
+        current = sum(len(items) for items in self.thematic_index.values())
+        rebuilt = sum(len(items) for items in thematic_index.values())
+        if rebuilt < current / 2:
+            raise ValueError(f"Thematic index shrank from {current} to {rebuilt} items")
+
+    def _publish_thematic_index(self, thematic_index: Dict[str, List[Dict]]):
+        self.thematic_index = thematic_index
 
     def _empty_response(self) -> Dict[str, List[Dict]]:
         return {
@@ -5,11 +5,13 @@ import numpy as np
 from collections import Counter
 from sklearn.feature_extraction.text import TfidfVectorizer
 from .knowledge_db import KnowledgeSource
+from .theme_tagger import THEME_HIERARCHY, ThemeTagger
 
 class UniversalSynthesizer:
     def __init__(self, knowledge_db):
         self.db = knowledge_db
         self.vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
+        self.theme_tagger = ThemeTagger(THEME_HIERARCHY, whole_words=True)
         
     def blend(self, scanner_output: Dict, context: Optional[Dict] = None) -> Dict:
         """Analyze all results and generate comprehensive response"""
@@ -31,6 +33,32 @@ class UniversalSynthesizer:
             'detected_themes': analysis['themes']
         }
 
+    def cite(self, scanner_output: Dict) -> Dict:
+        """Quote directly cited verses without theme analysis"""
+        results = scanner_output.get('all_results') if scanner_output else None
+        if not results:
+            return self._empty_response()
+
+        response_parts = ["*etches sacred words* As it is written:"]
+        for result in results:
+            reference = result.get('metadata', {}).get('reference', '')
+            response_parts.append(f"* {reference} - '{self._clean_content(result.get('content', ''))}'")
+        response_parts.append("*brushes hands* Thus is wisdom preserved across the ages.")
+
+        themes = []
+        for result in results:
+            themes.extend(t for t in result.get('tags', []) if t != 'general' and t not in themes)
+
+        return {
+            'content': "\n".join(response_parts),
+            'primary_theme': themes[0] if themes else 'default',
+            'sources': results[:3],
+            'supporting_sources': results[3:6],
+            'confidence': 0.95,
+            'mood_score': 0.5,
+            'detected_themes': themes
+        }
+
     def _analyze_all_results(self, results: List[Dict], context: Optional[Dict]) -> Dict:
         """Deep analysis of all search results"""
         # 1. Extract and clean all content
@@ -194,13 +222,7 @@ class UniversalSynthesizer:
             top_terms = [terms[i] for i in np.argsort(scores)[-5:][::-1]]
             
             # Match terms to themes
-            detected = []
-            for term in top_terms + tags:
-                for theme, keywords in self.theme_hierarchy.items():
-                    if term in keywords and theme not in detected:
-                        detected.append(theme)
-            
-            return detected
+            return self.theme_tagger.match(" ".join(top_terms + tags))
         
         return []
 
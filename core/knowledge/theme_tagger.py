@@ -0,0 +1,89 @@
+import re
+from typing import Dict, Iterable, List, Set
+
+# Scripture themes shared by the scanner's thematic index and the synthesizer
+THEME_HIERARCHY = {
+    'mercy': ['forgive', 'compassion', 'kindness', 'pardon', 'merciful'],
+    'comfort': ['lonely', 'sad', 'ease', 'distress', 'anxiety', 'peace'],
+    'prophets': ['muhammad', 'isa', 'musa', 'abraham', 'david', 'solomon'],
+    'prayer': ['supplication', 'dua', 'worship', 'invocation'],
+    'patience': ['perseverance', 'steadfast', 'endurance', 'trials']
+}
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex equivalent to the alternation of `words`, factored into a prefix
+    trie so matching at a position costs the keyword length, not the keyword
+    count. Optional tails are greedy, so the longest keyword wins.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{pattern})?' if '' in node else pattern
+
+    return build(trie)
+
+
+class ThemeTagger:
+    """
+    Keyword-to-theme matcher compiled once from a {theme: [keywords]} lexicon.
+    All keywords go into a single trie-shaped regex that is scanned over the
+    (lower-cased) text in one pass. By default a keyword matches anywhere,
+    like `kw in text` (so 'forgiv' tags 'forgiveness'); with whole_words it
+    must be a complete word. match() returns themes in lexicon order.
+    """
+
+    def __init__(self, lexicon: Dict[str, Iterable[str]], whole_words: bool = False):
+        self.themes = list(lexicon)
+        self.whole_words = whole_words
+        self._themes_of: Dict[str, Set[str]] = {}
+        for theme, keywords in lexicon.items():
+            for keyword in filter(None, keywords):
+                self._themes_of.setdefault(keyword.lower(), set()).add(theme)
+        trie = _trie_pattern(self._themes_of)
+        if whole_words:
+            self._pattern = re.compile(rf'\b({trie})\b')
+        else:
+            # Zero-width lookahead so occurrences overlapping an earlier match are still seen
+            self._pattern = re.compile(f'(?=({trie}))')
+        self._matched_cache: Dict[str, Set[str]] = {}
+
+    def _themes_for(self, matched: str) -> Set[str]:
+        """
+        Themes of the longest keyword matched at a position plus every shorter
+        keyword that also matches there (necessarily a prefix of it).
+        """
+        themes = self._matched_cache.get(matched)
+        if themes is None:
+            themes = set()
+            for end in range(1, len(matched) + 1):
+                prefix = matched[:end]
+                if prefix in self._themes_of and (not self.whole_words or end == len(matched)
+                                                  or self._is_boundary(matched, end)):
+                    themes |= self._themes_of[prefix]
+            self._matched_cache[matched] = themes
+        return themes
+
+    @staticmethod
+    def _is_boundary(text: str, index: int) -> bool:
+        return (text[index - 1].isalnum() or text[index - 1] == '_') != (text[index].isalnum() or text[index] == '_')
+
+    def match(self, text: str) -> List[str]:
+        if not text or not self._themes_of:
+            return []
+        found: Set[str] = set()
+        for match in self._pattern.finditer(text.lower()):
+            found |= self._themes_for(match.group(1))
+            if len(found) == len(self.themes):
+                break
+        return [theme for theme in self.themes if theme in found]
@@ -0,0 +1,127 @@
+import argparse
+import logging
+import os
+from typing import Dict, Iterable, Optional
+import numpy as np
+from bson import Binary
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+VECTOR_STORAGE_FORMATS = ("array", "float32", "float16")
+
+# BSON vector subtype (Atlas-indexable): 1 dtype byte + 1 padding byte, then little-endian floats
+BSON_VECTOR_SUBTYPE = 9
+BSON_FLOAT32_DTYPE = 0x27
+# float16 has no BSON vector dtype, so it lives in a user-defined subtype (raw little-endian halves)
+FLOAT16_SUBTYPE = 128
+
+
+def vector_storage() -> str:
+    """Configured format for newly written vectors (VECTOR_STORAGE, default "array")"""
+    storage = os.getenv("VECTOR_STORAGE", "array").lower()
+    if storage not in VECTOR_STORAGE_FORMATS:
+        raise ValueError(f"Unknown VECTOR_STORAGE '{storage}' (expected one of {VECTOR_STORAGE_FORMATS})")
+    return storage
+
+
+def encode_vector(vector, storage: Optional[str] = None):
+    """Pack an embedding for MongoDB: a list of doubles, or float32/float16 BinData"""
+    storage = storage or vector_storage()
+    array = np.asarray(vector, dtype=np.float32).ravel()
+    if storage == "float32":
+        header = bytes([BSON_FLOAT32_DTYPE, 0])
+        return Binary(header + array.astype('<f4').tobytes(), BSON_VECTOR_SUBTYPE)
+    if storage == "float16":
+        return Binary(array.astype('<f2').tobytes(), FLOAT16_SUBTYPE)
+    return array.tolist()
+
+
+def decode_vector(value) -> Optional[np.ndarray]:
+    """
+    Inverse of encode_vector. BinData is decoded zero-copy with np.frombuffer
+    (the result is a read-only view; float16 stays float16 until stacked).
+    """
+    if value is None:
+        return None
+    if isinstance(value, Binary):
+        if value.subtype == BSON_VECTOR_SUBTYPE:
+            if value[0] != BSON_FLOAT32_DTYPE:
+                raise ValueError(f"Unsupported BSON vector dtype 0x{value[0]:02x}")
+            return np.frombuffer(value, dtype='<f4', offset=2)
+        if value.subtype == FLOAT16_SUBTYPE:
+            return np.frombuffer(value, dtype='<f2')
+        raise ValueError(f"Unsupported vector BinData subtype {value.subtype}")
+    return np.asarray(value, dtype=np.float32)
+
+
+def storage_of(value) -> Optional[str]:
+    """Which VECTOR_STORAGE_FORMATS entry a stored vector uses"""
+    if isinstance(value, Binary):
+        return {BSON_VECTOR_SUBTYPE: "float32", FLOAT16_SUBTYPE: "float16"}.get(value.subtype)
+    return "array" if isinstance(value, list) else None
+
+
+def migrate_vectors(collection, storage: str, batch_size: int = 500,
+                    slots: Iterable[str] = ("vector",)) -> Dict[str, int]:
+    """
+    Re-encode every vector stored in the `slots` fields into `storage`.
+    Vectors already in the target format are skipped, so an interrupted
+    migration can simply be rerun. `converted` counts updated documents.
+    """
+    if storage not in VECTOR_STORAGE_FORMATS:
+        raise ValueError(f"Unknown vector storage '{storage}' (expected one of {VECTOR_STORAGE_FORMATS})")
+    slots = list(slots)
+    stats = {"scanned": 0, "converted": 0, "bytes_before": 0, "bytes_after": 0}
+    batch = []
+
+    query = {"$or": [{slot: {"$ne": None}} for slot in slots]}
+    for doc in collection.find(query, {slot: 1 for slot in slots}):
+        updates = {}
+        for slot in slots:
+            if doc.get(slot) is None:
+                continue
+            stats["scanned"] += 1
+            if storage_of(doc[slot]) == storage:
+                continue
+            updates[slot] = encode_vector(decode_vector(doc[slot]), storage)
+            stats["bytes_before"] += _payload_bytes(doc[slot])
+            stats["bytes_after"] += _payload_bytes(updates[slot])
+        if not updates:
+            continue
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": updates}))
+        if len(batch) >= batch_size:
+            stats["converted"] += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        stats["converted"] += collection.bulk_write(batch, ordered=False).modified_count
+
+    logger.info(f"Vector migration to {storage}: {stats}")
+    return stats
+
+
+def _payload_bytes(value) -> int:
+    """Approximate BSON size of a stored vector (arrays pay a type byte and index key per element)"""
+    if isinstance(value, Binary):
+        return len(value) + 5
+    return sum(1 + len(str(i)) + 1 + 8 for i in range(len(value))) + 5
+
+
+def main():
+    from .embedding_models import VECTOR_SLOTS
+    from .knowledge_db import KnowledgeRetriever
+
+    parser = argparse.ArgumentParser(description="Convert stored entry vectors to another storage format")
+    parser.add_argument("--to", dest="storage", choices=VECTOR_STORAGE_FORMATS, required=True,
+                        help="Target format (float16 is for the local backends; Atlas indexes array/float32)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    retriever = KnowledgeRetriever()
+    # Every slot, including one still being migrated into or not yet retired
+    stats = migrate_vectors(retriever.collection, args.storage, args.batch_size, VECTOR_SLOTS)
+    print(f"Converted {stats['converted']} of {stats['scanned']} vectors to {args.storage} "
+          f"({stats['bytes_before']} -> {stats['bytes_after']} bytes)")
+
+if __name__ == "__main__":
+    main()
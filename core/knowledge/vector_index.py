@@ -0,0 +1,309 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from concurrent.futures import Executor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from bson import ObjectId
+from .vector_codec import decode_vector
+
+logger = logging.getLogger(__name__)
+
+STORE_FORMAT_VERSION = 1
+CURRENT_POINTER = "CURRENT"
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row in place (zero rows are left untouched)"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def normalize_query(embedding) -> np.ndarray:
+    """Convert a query embedding to a normalized float32 vector"""
+    query = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = np.linalg.norm(query)
+    return query / norm if norm else query
+
+
+def top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+    """Indices of the `limit` highest scores, best first"""
+    if limit <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if limit >= scores.size:
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, limit - 1)[:limit]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def file_checksum(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_id(doc_id) -> str:
+    return f"oid:{doc_id}" if isinstance(doc_id, ObjectId) else f"str:{doc_id}"
+
+
+def decode_id(value: str):
+    kind, _, raw = value.partition(':')
+    return ObjectId(raw) if kind == 'oid' else raw
+
+
+class VectorIndex:
+    """
+    Resident exact cosine index over the `entries` vectors.
+    Holds one contiguous float32 matrix of pre-normalized rows plus an
+    _id/reference/source sidecar aligned with the row order. Rows are
+    grouped by source, so each KnowledgeSource is a contiguous shard.
+    """
+
+    def __init__(self, vectors: np.ndarray, ids: List, references: List[str], sources: List[str],
+                 version: Optional[str] = None, model_name: str = 'all-MiniLM-L6-v2',
+                 created_at: Optional[datetime] = None):
+        # Contiguous float32 input (including a read-only memmap) is kept as-is
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.ids = list(ids)
+        self.references = list(references)
+        self.sources = list(sources)
+        self.version = version
+        self.model_name = model_name
+        # When the source documents were read; later changes belong to the live delta
+        self.created_at = created_at
+        self.shards = self._build_shards()
+
+    def _build_shards(self) -> Dict[str, Union[slice, np.ndarray]]:
+        """Row slice per source (index array if a legacy store is not grouped)"""
+        shards = {}
+        sources = np.asarray(self.sources, dtype=object)
+        for source in dict.fromkeys(self.sources):
+            rows = np.flatnonzero(sources == source)
+            if rows[-1] - rows[0] + 1 == len(rows):
+                shards[source] = slice(int(rows[0]), int(rows[-1]) + 1)
+            else:
+                shards[source] = rows
+        return shards
+
+    def source_mask(self, sources: Sequence[str]) -> np.ndarray:
+        """Boolean row mask selecting the given sources"""
+        mask = np.zeros(len(self), dtype=bool)
+        for source in sources:
+            if source in self.shards:
+                mask[self.shards[source]] = True
+        return mask
+
+    @classmethod
+    def from_cursor(cls, cursor: Iterable[dict], dimensions: Optional[int] = None, field: str = 'vector',
+                    model_name: str = 'all-MiniLM-L6-v2') -> 'VectorIndex':
+        """
+        Build the index from documents carrying `field` (an array or
+        float32/float16 BinData), `source` and `metadata.reference`
+        """
+        ids, references, sources, rows = [], [], [], []
+        skipped = 0
+        started = datetime.utcnow()
+
+        for doc in cursor:
+            vector = decode_vector(doc.get(field))
+            if vector is None or len(vector) == 0:
+                continue
+            if dimensions is None:
+                dimensions = len(vector)
+            elif len(vector) != dimensions:
+                skipped += 1
+                continue
+            ids.append(doc['_id'])
+            # Stored nulls become '' so the source sort never compares None with str
+            references.append((doc.get('metadata') or {}).get('reference') or '')
+            sources.append(doc.get('source') or '')
+            rows.append(vector)
+
+        if skipped:
+            logger.warning(f"Skipped {skipped} vectors with unexpected dimensions")
+
+        # Group rows by source so every shard is a contiguous slice
+        order = sorted(range(len(ids)), key=sources.__getitem__)
+        vectors = np.asarray([rows[i] for i in order], dtype=np.float32).reshape(len(rows), dimensions or 0)
+        normalize_rows(vectors)
+        logger.info(f"Built vector index with {len(ids)} rows")
+        return cls(
+            vectors,
+            [ids[i] for i in order],
+            [references[i] for i in order],
+            [sources[i] for i in order],
+            model_name=model_name,
+            created_at=started
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dimensions(self) -> int:
+        return self.vectors.shape[1]
+
+    def search(self, embedding, limit: int, sources: Optional[Sequence[str]] = None,
+               executor: Optional[Executor] = None,
+               mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Return (row, cosine score) pairs for the top `limit` rows.
+        With `sources`, only those shards are scored; with an executor,
+        multi-shard searches run one shard per task and merge their top-k.
+        A boolean row `mask` (e.g. from FilterIndex) restricts scoring to its rows.
+        """
+        if not len(self):
+            return []
+        query = normalize_query(embedding)
+        if query.shape[0] != self.dimensions:
+            raise ValueError(f"Expected embedding of length {self.dimensions}, got {query.shape[0]}")
+
+        if mask is not None:
+            if sources is not None:
+                mask = mask & self.source_mask(sources)
+            rows = np.flatnonzero(mask)
+            if rows.size * 2 > len(self):
+                # Dense mask (e.g. a few tombstones): score everything rather than gather rows
+                scores = self.vectors @ query
+                scores[~mask] = -np.inf
+                return [(int(row), float(scores[row])) for row in top_k(scores, min(limit, rows.size))]
+            scores = self.vectors[rows] @ query
+            best = top_k(scores, limit)
+            return [(int(rows[i]), float(scores[i])) for i in best]
+
+        if sources is None and executor is None:
+            scores = self.vectors @ query
+            rows = top_k(scores, limit)
+            return [(int(row), float(scores[row])) for row in rows]
+
+        shards = [self.shards[s] for s in (self.shards if sources is None else sources) if s in self.shards]
+        if len(shards) > 1 and executor is not None:
+            partials = list(executor.map(lambda shard: self._search_shard(shard, query, limit), shards))
+        else:
+            partials = [self._search_shard(shard, query, limit) for shard in shards]
+        if not partials:
+            return []
+
+        rows = np.concatenate([rows for rows, _ in partials])
+        scores = np.concatenate([scores for _, scores in partials])
+        best = top_k(scores, limit)
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+    def _search_shard(self, shard: Union[slice, np.ndarray], query: np.ndarray,
+                      limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (global rows, scores) within one shard"""
+        scores = self.vectors[shard] @ query
+        best = top_k(scores, limit)
+        rows = np.arange(shard.start, shard.stop)[best] if isinstance(shard, slice) else shard[best]
+        return rows, scores[best]
+
+    def save(self, directory: str, keep: int = 2, publish: bool = True) -> str:
+        """
+        Write a new store version under `directory` and point CURRENT at it.
+        Layout: <directory>/<version>/{vectors.npy, meta.json}
+        With publish=False the version is only written, so it can be validated
+        before `publish` makes it current.
+        """
+        version = datetime.utcnow().strftime('v%Y%m%d%H%M%S%f')
+        version_dir = os.path.join(directory, version)
+        os.makedirs(version_dir, exist_ok=True)
+
+        vectors_path = os.path.join(version_dir, 'vectors.npy')
+        np.save(vectors_path, self.vectors)
+
+        meta = {
+            "format_version": STORE_FORMAT_VERSION,
+            "version": version,
+            "model": self.model_name,
+            "count": len(self),
+            "dimensions": self.dimensions,
+            "dtype": "float32",
+            "checksum": file_checksum(vectors_path),
+            "created_at": (self.created_at or datetime.utcnow()).isoformat(),
+            "ids": [encode_id(doc_id) for doc_id in self.ids],
+            "references": self.references,
+            "sources": self.sources
+        }
+        with open(os.path.join(version_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        self.version = version
+        if publish:
+            self.publish(directory, version, keep)
+        logger.info(f"Saved vector store {version} with {len(self)} rows to {directory}")
+        return version_dir
+
+    @classmethod
+    def publish(cls, directory: str, version: str, keep: int = 2):
+        """Atomically point CURRENT at `version` and prune older versions"""
+        pointer_tmp = os.path.join(directory, CURRENT_POINTER + '.tmp')
+        with open(pointer_tmp, 'w') as f:
+            f.write(version)
+        os.replace(pointer_tmp, os.path.join(directory, CURRENT_POINTER))
+        cls._prune_versions(directory, keep, version)
+
+    @staticmethod
+    def _prune_versions(directory: str, keep: int, current: str):
+        # Versions newer than the published one may still be building
+        versions = sorted(
+            name for name in os.listdir(directory)
+            if name.startswith('v') and name <= current and os.path.isdir(os.path.join(directory, name))
+        )
+        for name in versions[:-keep] if keep > 0 else []:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    @staticmethod
+    def current_version(directory: str) -> Optional[str]:
+        """Directory of the published store version, if any"""
+        pointer = os.path.join(directory, CURRENT_POINTER)
+        if not os.path.exists(pointer):
+            return None
+        with open(pointer) as f:
+            version_dir = os.path.join(directory, f.read().strip())
+        return version_dir if os.path.isdir(version_dir) else None
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True, verify: bool = True) -> 'VectorIndex':
+        """
+        Open the current store version. With mmap the matrix is backed by the
+        page cache, so every worker process shares a single physical copy.
+        """
+        version_dir = cls.current_version(directory)
+        if version_dir is None:
+            raise FileNotFoundError(f"No published vector store in {directory}")
+        return cls.load_version(version_dir, mmap, verify)
+
+    @classmethod
+    def load_version(cls, version_dir: str, mmap: bool = True, verify: bool = True) -> 'VectorIndex':
+        """Open one specific store version, published or not"""
+        with open(os.path.join(version_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get("format_version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector store format: {meta.get('format_version')}")
+
+        vectors_path = os.path.join(version_dir, 'vectors.npy')
+        if verify and file_checksum(vectors_path) != meta["checksum"]:
+            raise ValueError(f"Checksum mismatch for {vectors_path}")
+
+        vectors = np.load(vectors_path, mmap_mode='r' if mmap else None)
+        if vectors.shape != (meta["count"], meta["dimensions"]):
+            raise ValueError(f"Vector store shape {vectors.shape} does not match its metadata")
+
+        logger.info(f"Loaded vector store {meta['version']} ({meta['count']} rows, mmap={mmap})")
+        return cls(
+            vectors,
+            [decode_id(value) for value in meta["ids"]],
+            meta["references"],
+            meta["sources"],
+            version=meta["version"],
+            model_name=meta["model"],
+            created_at=datetime.fromisoformat(meta["created_at"])
+        )
@@ -7,6 +7,7 @@ from .memory_system import MemoryDatabase
 import random
 import numpy as np
 import logging 
+from core.knowledge.theme_tagger import ThemeTagger
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,6 +32,7 @@ class InteractiveLearner:
             'prayer': ['salah', 'pray', 'worship', 'dua'],
             'afterlife': ['hereafter', 'judgment', 'paradise', 'hell']
         }
+        self.topic_tagger = ThemeTagger(self.theme_keywords)
 
     def analyze_conversation(self, conv_id: str) -> Optional[Dict]:
         """Generate and store conversation insights"""
@@ -102,11 +104,4 @@ class InteractiveLearner:
 
     def _extract_topics(self, text: str) -> List[str]:
         """Identify key discussion topics"""
-        text_lower = text.lower()
-        topics = []
-        
-        for theme, keywords in self.theme_keywords.items():
-            if any(kw in text_lower for kw in keywords):
-                topics.append(theme)
-                
-        return topics if topics else ["general"]
\ No newline at end of file
+        return self.topic_tagger.match(text) or ["general"]
\ No newline at end of file
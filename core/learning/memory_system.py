@@ -8,17 +8,27 @@ import random
 import numpy as np
 import logging
 import os
+from core.knowledge.theme_tagger import ThemeTagger
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Common Islamic topics
+ISLAMIC_TOPICS = {
+    'mercy': ['mercy', 'compassion', 'rahma'],
+    'forgiveness': ['forgive', 'pardon', 'maghfira'],
+    'prayer': ['pray', 'salah', 'dua'],
+    'prophets': ['prophet', 'muhammad', 'isa', 'musa']
+}
+
 class MemoryDatabase:
     def __init__(self, db_uri: str = (os.getenv("MONGODB_URI"))):
         self.client = MongoClient(db_uri)
         self.db = self.client[os.getenv("DB_NAME", "AdamAI-MemoryDB")]
         self.conversations = self.db.conversations
         self.summaries = self.db.summaries
+        self.topic_tagger = ThemeTagger(ISLAMIC_TOPICS)
         self._create_indexes()
 
     def _create_indexes(self):
@@ -91,19 +101,4 @@ class MemoryDatabase:
 
     def _extract_topics(self, text: str) -> List[str]:
         """Improved topic extraction logic"""
-        text_lower = text.lower()
-        topics = []
-        
-        # Common Islamic topics
-        islamic_topics = {
-            'mercy': ['mercy', 'compassion', 'rahma'],
-            'forgiveness': ['forgive', 'pardon', 'maghfira'],
-            'prayer': ['pray', 'salah', 'dua'],
-            'prophets': ['prophet', 'muhammad', 'isa', 'musa']
-        }
-        
-        for theme, keywords in islamic_topics.items():
-            if any(keyword in text_lower for keyword in keywords):
-                topics.append(theme)
-        
-        return topics
\ No newline at end of file
+        return self.topic_tagger.match(text)
\ No newline at end of file
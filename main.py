@@ -1,4 +1,5 @@
 import time
+from threading import Thread
 from typing import Dict, Optional
 import logging
 from logging.handlers import RotatingFileHandler
@@ -7,6 +8,7 @@ import torch
 from modal_services.scanner import SacredScanner
 from modal_services.synthesizer import UniversalSynthesizer
 from core.knowledge.knowledge_db import KnowledgeRetriever
+from core.knowledge.reference_table import is_citation_only
 from core.knowledge.sacred_scanner import SacredScanner
 from core.knowledge.synthesizer import UniversalSynthesizer
 from core.knowledge.mind_integrator import MindIntegrator
@@ -65,6 +67,8 @@ configure_logging()
 
 load_dotenv()
 
+logger = logging.getLogger('adam.system')
+
 class AdamAI:
     def __init__(self):
         """Initialize with silent logging"""
@@ -105,12 +109,17 @@ class AdamAI:
 
     def _initialize_system(self):
         """Initialize system components"""
-        logging.getLogger("Building thematic index...")
-        self.scanner._refresh_thematic_index()
-    
+        # The scanner already started building its thematic index in the background
         if os.getenv("BACKFILL_EMBEDDINGS", "false").lower() == "true":
-            logging.getLogger("Backfilling embeddings...")
-            self.db.backfill_embeddings()
+            # One worker wins the backfill lease; throttled by default so it can run alongside live traffic
+            logger.info("Backfilling embeddings in the background...")
+            max_rate = float(os.getenv("BACKFILL_MAX_RATE", "100"))
+            Thread(target=self.db.backfill_embeddings, kwargs={"max_rate": max_rate},
+                   name="embedding-backfill", daemon=True).start()
+
+        if os.getenv("LIVE_INDEX_UPDATES", "false").lower() == "true":
+            logger.info("Starting live index updates...")
+            self.db.start_live_updates()
 
     def _load_models(self):
         self.synthesizer.summarizer = pipeline(
@@ -138,6 +147,18 @@ class AdamAI:
                 return "*sets clay aside* I cannot respond to that which may cause harm."
             
             print("DEBUG: Safety check passed")  # Temporary debug
+
+            # A message that only cites scripture ("2:255", "John 3:16") skips emotion
+            # analysis, vector retrieval and synthesis: one indexed lookup. Citations
+            # inside a real question are resolved too and added to the normal scan.
+            cited = self.scanner.lookup_references(message)
+            if cited and is_citation_only(message):
+                response = self.integrator.integrate(
+                    self.synthesizer.cite(cited),
+                    user_context={"user_id": user_id, "mood": 0.5, "is_offensive": False}
+                )
+                self._store_conversation(user_id, message, response)
+                return response
         
             # Emotion analysis
             emotion = self.emotion.analyze(message)
@@ -149,17 +170,11 @@ class AdamAI:
             print(f"DEBUG: Context prepared with {len(context.get('conversation_history', []))} history items")  # Temporary debug
         
             # Knowledge retrieval
-            try:
-                print("DEBUG: Attempting scan...")  # Temporary debug
-                scan_results = self.scanner.scan(message, context)
-                print(f"DEBUG: Scan completed with {len(scan_results.get('all_results', []))} results")  # Temporary debug
-            except Exception as scan_error:
-                if "text index required" in str(scan_error):
-                    logging.error("Text index missing - attempting to create...")
-                    self.db.create_text_index()
-                    scan_results = self.scanner.scan(message, context)
-                else:
-                    raise        
+            print("DEBUG: Attempting scan...")  # Temporary debug
+            scan_results = self.scanner.scan(message, context)
+            if cited:
+                scan_results = self.scanner.include_cited(cited, scan_results)
+            print(f"DEBUG: Scan completed with {len(scan_results.get('all_results', []))} results")  # Temporary debug
 
             # Step 4: Knowledge Synthesis
             synthesized = self.synthesizer.blend(
@@ -0,0 +1,183 @@
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+pytest.importorskip("sentence_transformers")
+
+from core.knowledge.backfill import BackfillLease, EmbeddingBackfill  # noqa: E402
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(_matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            if "$exists" in condition and (key in doc) != condition["$exists"]:
+                return False
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+            if "$gt" in condition and (value is None or not value > condition["$gt"]):
+                return False
+            if "$lt" in condition and (value is None or not value < condition["$lt"]):
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class _Cursor(list):
+    def sort(self, field, direction):
+        return _Cursor(sorted(self, key=lambda doc: doc[field], reverse=direction < 0))
+
+    def limit(self, n):
+        return _Cursor(self[:n])
+
+
+class _Result:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = {doc["_id"]: doc for doc in docs}
+
+    def find(self, query, projection=None):
+        return _Cursor(dict(doc) for doc in self.docs.values() if _matches(doc, query))
+
+    def count_documents(self, query):
+        return len(self.find(query))
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            self.docs[operation._filter["_id"]].update(operation._doc["$set"])
+        return _Result(len(operations))
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query["_id"])
+        if doc is None and upsert:
+            self.docs[query["_id"]] = {"_id": query["_id"], **update["$set"]}
+        elif doc is not None and _matches(doc, query):
+            doc.update(update["$set"])
+        elif upsert:
+            raise DuplicateKeyError("E11000 duplicate key")
+
+    def delete_one(self, query):
+        doc = self.docs.get(query["_id"])
+        if doc is not None and _matches(doc, query):
+            del self.docs[query["_id"]]
+
+
+class FakeEmbedder:
+    model_name = "model-b"
+
+    def __init__(self, fail_on_call=None):
+        self.encoded = []
+        self.fail_on_call = fail_on_call
+
+    def encode_corpus(self, texts, pool=None):
+        if self.fail_on_call == len(self.encoded) + 1:
+            raise RuntimeError("encoder crashed")
+        self.encoded.append(list(texts))
+        return np.ones((len(texts), 3), dtype=np.float32)
+
+
+def _entries(n=10):
+    docs = []
+    for i in range(n):
+        doc = {"_id": ObjectId(), "content": f"entry {i}"}
+        if i % 3 == 0:
+            doc.update(vector=[0.5, 0.5], vector_model="model-a")  # embedded by the old model
+        elif i % 3 == 1:
+            doc.update(vector=[1.0, 0.0, 0.0], vector_model="model-b")  # already current
+        docs.append(doc)
+    return FakeCollection(docs)
+
+
+def _job(collection, tmp_path, embedder=None, **kwargs):
+    return EmbeddingBackfill(collection, embedder or FakeEmbedder(), str(tmp_path / "checkpoint.json"),
+                             batch_size=2, **kwargs)
+
+
+def test_fills_pending_entries_and_stamps_updated_at(tmp_path):
+    collection = _entries()
+    job = _job(collection, tmp_path)
+    pending = job.remaining()
+    before = datetime.utcnow()
+
+    stats = job.run()
+
+    assert stats["processed"] == stats["written"] == pending == 7
+    assert job.remaining() == 0
+    assert all(doc["vector_model"] == "model-b" for doc in collection.docs.values())
+    rewritten = [doc for doc in collection.docs.values() if "updated_at" in doc]
+    assert len(rewritten) == 7 and all(doc["updated_at"] >= before for doc in rewritten)
+    assert not (tmp_path / "checkpoint.json").exists()
+
+
+def test_resumes_from_the_checkpoint(tmp_path):
+    collection = _entries()
+    with pytest.raises(RuntimeError):
+        _job(collection, tmp_path, FakeEmbedder(fail_on_call=2)).run()
+    checkpoint = json.loads((tmp_path / "checkpoint.json").read_text())
+    assert checkpoint["done"] == 2 and checkpoint["model"] == "model-b"
+
+    embedder = FakeEmbedder()
+    stats = _job(collection, tmp_path, embedder).run()
+    assert stats["processed"] == 5 and stats["total"] == 7
+    assert sum(len(batch) for batch in embedder.encoded) == 5
+    assert not (tmp_path / "checkpoint.json").exists()
+
+
+def test_checkpoint_for_another_model_is_ignored(tmp_path):
+    collection = _entries()
+    (tmp_path / "checkpoint.json").write_text(json.dumps(
+        {"model": "model-a", "slot": "vector", "last_id": f"oid:{max(collection.docs)}", "done": 9}
+    ))
+    assert _job(collection, tmp_path).run()["processed"] == 7
+
+
+def test_lease_is_exclusive_until_it_expires():
+    locks = FakeCollection()
+    first, second = BackfillLease(locks), BackfillLease(locks)
+    assert first.acquire()
+    assert not second.acquire()
+    assert first.renew()
+
+    second.release()  # not the owner: no effect
+    assert not second.acquire()
+
+    locks.docs["embedding-backfill"]["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+    assert second.acquire()
+    assert not first.renew()
+
+    second.release()
+    assert first.acquire()
+
+
+def test_losing_the_lease_stops_and_keeps_the_checkpoint(tmp_path):
+    collection, locks = _entries(), FakeCollection()
+    lease = BackfillLease(locks)
+
+    class StolenAfterOneBatch:
+        calls = 0
+
+        def renew(self):
+            self.calls += 1
+            if self.calls == 2:
+                locks.docs["embedding-backfill"] = {"_id": "embedding-backfill", "owner": "other",
+                                                    "expires_at": datetime.utcnow() + timedelta(minutes=5)}
+            return lease.renew()
+
+    stats = _job(collection, tmp_path).run(StolenAfterOneBatch())
+    assert stats["processed"] == 2
+    assert json.loads((tmp_path / "checkpoint.json").read_text())["done"] == 2
@@ -0,0 +1,90 @@
+import json
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+import pytest
+
+from core.knowledge.bible_fetcher import BibleFetcher
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    """Static files, plus one 503 per path in `fail_once` and a concurrency gauge"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            fail = self.path in server.fail_once
+            server.fail_once.discard(self.path)
+        try:
+            time.sleep(server.delay)
+            if fail:
+                self.send_error(503)
+            else:
+                super().do_GET()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api(tmp_path):
+    chapters = tmp_path / "kjv" / "books" / "genesis" / "chapters"
+    chapters.mkdir(parents=True)
+    for chapter in range(1, 13):
+        rows = [{"verse": str(verse), "text": f"Genesis {chapter}:{verse}"} for verse in (2, 1)]
+        (chapters / f"{chapter}.json").write_text(json.dumps({"data": rows}))
+    # Jude has no chapter file, only verse files
+    verses = tmp_path / "kjv" / "books" / "jude" / "chapters" / "1" / "verses"
+    verses.mkdir(parents=True)
+    for verse in (1, 2, 3):
+        (verses / f"{verse}.json").write_text(json.dumps({"text": f"Jude 1:{verse}"}))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_Handler, directory=str(tmp_path)))
+    server.lock, server.active, server.peak = Lock(), 0, 0
+    server.fail_once, server.delay = set(), 0.0
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _fetcher(server, **kwargs):
+    return BibleFetcher(f"http://127.0.0.1:{server.server_address[1]}", backoff=0.01, timeout=5, **kwargs)
+
+
+def test_chapter_file_is_sorted_by_verse(api):
+    fetcher = _fetcher(api)
+    assert fetcher.fetch_chapter("kjv", "Genesis", 1) == [
+        {"verse": 1, "text": "Genesis 1:1"}, {"verse": 2, "text": "Genesis 1:2"}
+    ]
+
+
+def test_missing_chapter_falls_back_to_verses(api):
+    fetcher = _fetcher(api)
+    verses = fetcher.fetch_chapter("kjv", "Jude", 1)
+    assert [v["text"] for v in verses] == ["Jude 1:1", "Jude 1:2", "Jude 1:3"]
+    # Chapter file 404, three verses, then the 404 that ends the chapter
+    assert fetcher.requests == 5
+
+
+def test_server_errors_are_retried(api):
+    api.fail_once.add("/kjv/books/genesis/chapters/3.json")
+    fetcher = _fetcher(api)
+    assert fetcher.fetch_chapter("kjv", "Genesis", 3)[0]["text"] == "Genesis 3:1"
+    assert not api.fail_once
+
+
+def test_per_host_limit(api):
+    api.delay = 0.05
+    fetcher = _fetcher(api, max_workers=8, per_host=2)
+    fetched = list(fetcher.fetch_books("kjv", [{"name": "Genesis", "chapters": 12}]))
+    assert sorted(chapter for _, chapter, _ in fetched) == list(range(1, 13))
+    assert api.peak == 2
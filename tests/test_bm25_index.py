@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+import pytest
+
+from core.knowledge.bm25_index import BM25Index, analyze, decode_varints, encode_varints
+
+DOCS = [
+    {"_id": "a", "source": "quran", "content": "Mercy and mercy again: the Merciful forgives."},
+    {"_id": "b", "source": "bible", "content": "Blessed are the merciful, for they shall obtain mercy."},
+    {"_id": "c", "source": "bible", "content": "Be patient in trials and steadfast in prayer."},
+    {"_id": "d", "source": "quran", "content": "Patience is a light."},
+]
+
+
+def test_varints_round_trip():
+    values = [0, 1, 127, 128, 300, 16383, 16384, 2 ** 21, 2 ** 35]
+    encoded = encode_varints(values)
+    assert decode_varints(np.frombuffer(bytes(encoded), dtype=np.uint8)).tolist() == values
+
+
+def test_varint_bytes():
+    assert bytes(encode_varints([0, 127, 128, 300])) == b'\x00\x7f\x80\x01\xac\x02'
+    assert decode_varints(np.empty(0, dtype=np.uint8)).size == 0
+
+
+def test_postings_hold_rows_and_frequencies():
+    index = BM25Index.build(DOCS)
+    rows, tf = index._posting(index.vocabulary["merci"])
+    assert rows.tolist() == [0, 1]
+    assert tf.tolist() == [3, 2]
+    assert index.doc_freq[index.vocabulary["merci"]] == 2
+
+
+def _reference_score(index, query, doc):
+    """Okapi BM25 written out directly"""
+    counts = BM25Index.term_counts(doc["content"])
+    length = sum(counts.values())
+    score = 0.0
+    for term in set(analyze(query)):
+        tf = counts.get(term, 0)
+        df = sum(term in BM25Index.term_counts(d["content"]) for d in DOCS)
+        idf = math.log(1 + (len(DOCS) - df + 0.5) / (df + 0.5))
+        score += idf * tf * (index.k1 + 1) / (tf + index.k1 * (1 - index.b + index.b * length / index.avg_length))
+    return score
+
+
+def test_search_scores_match_okapi_bm25():
+    index = BM25Index.build(DOCS)
+    results = index.search("merciful patience", limit=10)
+    assert [row for row, _ in results] == sorted(
+        (row for row in range(len(DOCS)) if _reference_score(index, "merciful patience", DOCS[row]) > 0),
+        key=lambda row: -_reference_score(index, "merciful patience", DOCS[row])
+    )
+    for row, score in results:
+        assert score == pytest.approx(_reference_score(index, "merciful patience", DOCS[row]), rel=1e-5)
+
+
+def test_score_documents_agrees_with_search():
+    index = BM25Index.build(DOCS)
+    scores = index.score_documents("mercy", [BM25Index.term_counts(doc["content"]) for doc in DOCS])
+    for row, score in index.search("mercy", limit=10):
+        assert scores[row] == pytest.approx(score, rel=1e-5)
+
+
+def test_source_and_mask_filters():
+    index = BM25Index.build(DOCS)
+    assert [row for row, _ in index.search("mercy", 10, source="bible")] == [1]
+    assert index.search("mercy", 10, source="hadith") == []
+    mask = np.array([False, True, True, True])
+    assert [row for row, _ in index.search("mercy", 10, mask=mask)] == [1]
+    assert index.search("the and", 10) == []
+
+
+def test_save_and_load(tmp_path):
+    index = BM25Index.build(DOCS)
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    assert loaded.ids == index.ids
+    assert loaded.search("patient trials", 10) == index.search("patient trials", 10)
@@ -0,0 +1,74 @@
+import pytest
+
+from core.knowledge.document_chunker import DocumentChunker, NearDuplicateFilter, estimate_tokens
+
+TEXT = " ".join(f"Sentence number {i} has six words." for i in range(1, 21))
+
+
+def test_short_text_is_one_chunk():
+    chunks = DocumentChunker(max_tokens=50, overlap_tokens=10).split("One sentence. Another one!")
+    assert [chunk.text for chunk in chunks] == ["One sentence. Another one!"]
+
+
+def test_chunks_respect_window_and_offsets():
+    chunker = DocumentChunker(max_tokens=30, overlap_tokens=8)
+    chunks = chunker.split(TEXT)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert estimate_tokens(chunk.text) <= 30
+        assert TEXT[chunk.start:chunk.end] == chunk.text
+        assert chunk.text.startswith("Sentence") and chunk.text.endswith(".")
+    assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+    assert chunks[0].start == 0 and chunks[-1].end == len(TEXT)
+
+
+def test_chunks_overlap_by_whole_sentences():
+    # Each sentence is 7 tokens: 4 fit a 30-token window and 1 fits an 8-token overlap
+    chunks = DocumentChunker(max_tokens=30, overlap_tokens=8).split(TEXT)
+    assert chunks[0].text.endswith("Sentence number 4 has six words.")
+    for previous, chunk in zip(chunks, chunks[1:]):
+        last_sentence = "Sentence" + previous.text.rsplit("Sentence", 1)[1]
+        assert chunk.text.startswith(last_sentence)
+        assert chunk.start == previous.end - len(last_sentence)
+
+
+def test_no_overlap_tiles_the_text():
+    chunks = DocumentChunker(max_tokens=30, overlap_tokens=0).split(TEXT)
+    assert " ".join(chunk.text for chunk in chunks) == TEXT
+
+
+def test_oversized_sentence_is_cut_on_words():
+    text = " ".join(f"w{i}" for i in range(50)) + "."
+    chunks = DocumentChunker(max_tokens=10, overlap_tokens=2).split(text)
+    assert all(estimate_tokens(chunk.text) <= 10 for chunk in chunks)
+    assert " ".join(chunk.text for chunk in chunks).split() == text.split()
+
+
+def test_overlap_must_be_smaller_than_window():
+    with pytest.raises(ValueError):
+        DocumentChunker(max_tokens=10, overlap_tokens=10)
+
+
+def test_near_duplicates_are_dropped():
+    passage = "And the Lord is my shepherd and I shall not want for anything in these green pastures"
+    dedupe = NearDuplicateFilter(threshold=0.8)
+    assert dedupe.add(passage)
+    assert not dedupe.add(passage.upper())
+    assert not dedupe.add(passage + " today")
+    assert dedupe.add("Be patient, for the promise of God is true and steadfast in every trial")
+    assert (dedupe.kept, dedupe.dropped) == (2, 2)
+
+
+def test_signatures_estimate_jaccard():
+    dedupe = NearDuplicateFilter(num_perm=256, bands=32)
+    a = " ".join(f"word{i}" for i in range(40))
+    b = " ".join(f"word{i}" for i in range(20, 60))
+    shingles_a, shingles_b = dedupe.shingles(a), dedupe.shingles(b)
+    jaccard = len(shingles_a & shingles_b) / len(shingles_a | shingles_b)
+    estimate = (dedupe.signature(a) == dedupe.signature(b)).mean()
+    assert abs(estimate - jaccard) < 0.1
+
+
+def test_bands_must_divide_permutations():
+    with pytest.raises(ValueError):
+        NearDuplicateFilter(num_perm=64, bands=10)
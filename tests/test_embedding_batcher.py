@@ -0,0 +1,97 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+import numpy as np
+import pytest
+
+from core.knowledge.embedding_batcher import EmbeddingBatcher
+
+
+class RecordingEncoder:
+    """encode_fn stand-in: embeds a text as [len, sum of code points] and records each batch"""
+
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+        self._lock = Lock()
+
+    def __call__(self, texts, batch_size=None):
+        with self._lock:
+            self.batches.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        return np.array([[len(text), sum(map(ord, text))] for text in texts], dtype=np.float32)
+
+
+def _expected(text):
+    return [len(text), sum(map(ord, text))]
+
+
+@pytest.fixture
+def make_batcher():
+    batchers = []
+
+    def make(encoder, **kwargs):
+        batcher = EmbeddingBatcher(encoder, **kwargs)
+        batchers.append(batcher)
+        return batcher
+
+    yield make
+    for batcher in batchers:
+        batcher.close()
+
+
+def test_flushes_when_the_batch_is_full(make_batcher):
+    encoder = RecordingEncoder()
+    # A deadline far beyond the result timeout: only a full batch can flush in time
+    batcher = make_batcher(encoder, max_batch_size=4, max_wait_ms=10_000)
+    futures = [batcher.submit(f"text {i}") for i in range(4)]
+    for future in futures:
+        future.result(timeout=2)
+    assert [len(batch) for batch in encoder.batches] == [4]
+
+
+def test_flushes_a_partial_batch_after_the_wait(make_batcher):
+    encoder = RecordingEncoder()
+    batcher = make_batcher(encoder, max_batch_size=100, max_wait_ms=50)
+    started = time.monotonic()
+    futures = [batcher.submit("a"), batcher.submit("bb")]
+    for future in futures:
+        future.result(timeout=2)
+    assert time.monotonic() - started >= 0.04
+    assert encoder.batches == [["a", "bb"]]
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["texts"] == 2
+
+
+def test_each_caller_gets_its_own_embedding(make_batcher):
+    encoder = RecordingEncoder()
+    batcher = make_batcher(encoder, max_batch_size=8, max_wait_ms=20)
+    texts = [f"query number {i % 12}" for i in range(40)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda text: batcher.submit(text).result(timeout=5), texts))
+    for text, embedding in zip(texts, results):
+        assert embedding.tolist() == _expected(text)
+    # Duplicates within a batch are encoded once, shortest texts first
+    for batch in encoder.batches:
+        assert len(batch) == len(set(batch)) and batch == sorted(batch, key=len)
+
+
+def test_encode_errors_reach_every_waiting_caller(make_batcher):
+    encoder = RecordingEncoder(error=RuntimeError("model crashed"))
+    batcher = make_batcher(encoder, max_batch_size=3, max_wait_ms=200)
+    futures = [batcher.submit(text) for text in ("a", "b", "a")]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            future.result(timeout=2)
+
+    # The worker survives and serves later requests
+    encoder.error = None
+    assert batcher.submit("ok").result(timeout=2).tolist() == _expected("ok")
+
+
+def test_submit_after_close_fails(make_batcher):
+    batcher = make_batcher(RecordingEncoder())
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit("late")
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from core.knowledge.filter_index import FilterIndex
+
+DOCS = [
+    {"_id": 0, "tags": ["mercy", "prayer"], "metadata": {"revelation_type": "Meccan"}},
+    {"_id": 1, "tags": ["mercy"], "metadata": {"revelation_type": "Medinan"}},
+    {"_id": 2, "tags": ["patience"], "metadata": {"book": "Psalms", "version": "kjv"}},
+    {"_id": 3, "tags": "comfort", "metadata": {"book": "John", "version": "kjv"}},
+    {"_id": 4, "tags": [], "metadata": {"revelation_type": "Meccan"}},
+    # Nine rows, so the packed bitmaps span more than one byte
+    {"_id": 5, "tags": ["mercy"], "metadata": {"book": "Psalms", "version": "asv"}},
+    {"_id": 6},
+    {"_id": 7, "tags": ["prayer"], "metadata": {"revelation_type": "meccan"}},
+    {"_id": 8, "tags": ["mercy", "comfort"], "metadata": {"book": "John", "version": "asv"}},
+]
+# Row order differs from cursor order, as it does for a source-grouped VectorIndex
+IDS = [8, 7, 6, 5, 4, 3, 2, 1, 0]
+
+
+def _rows(index, filters):
+    return [IDS[row] for row in np.flatnonzero(index.mask(filters))]
+
+
+@pytest.fixture
+def index():
+    return FilterIndex.build(IDS, DOCS)
+
+
+def test_single_value(index):
+    assert sorted(_rows(index, {"tags": "mercy"})) == [0, 1, 5, 8]
+
+
+def test_values_are_normalized(index):
+    assert sorted(_rows(index, {"revelation_type": " MECCAN "})) == [0, 4, 7]
+
+
+def test_any_of_values_within_a_field(index):
+    assert sorted(_rows(index, {"book": ["psalms", "john"]})) == [2, 3, 5, 8]
+
+
+def test_all_fields_must_match(index):
+    assert sorted(_rows(index, {"tags": ["mercy", "comfort"], "version": "asv"})) == [5, 8]
+    assert _rows(index, {"tags": "prayer", "revelation_type": "medinan"}) == []
+
+
+def test_unknown_value_and_field(index):
+    assert not index.mask({"tags": "joy"}).any()
+    assert index.mask({}).all()
+    with pytest.raises(ValueError, match="expected one of"):
+        index.mask({"colour": "red"})
+    with pytest.raises(ValueError, match="expected one of"):
+        FilterIndex.matches(DOCS[0], {"colour": "red"})
+
+
+def test_matches_agrees_with_mask(index):
+    filters = {"tags": ["mercy", "prayer"], "revelation_type": "meccan"}
+    mask = index.mask(filters)
+    assert [FilterIndex.matches(DOCS[doc_id], filters) for doc_id in IDS] == mask.tolist()
+
+
+def test_save_and_load(index, tmp_path):
+    index.save(str(tmp_path))
+    loaded = FilterIndex.load(str(tmp_path), len(IDS))
+    assert (loaded.mask({"tags": "mercy", "version": "asv"}) == index.mask({"tags": "mercy", "version": "asv"})).all()
+    with pytest.raises(ValueError):
+        FilterIndex.load(str(tmp_path), len(IDS) + 1)
@@ -0,0 +1,71 @@
+import pytest
+
+from core.knowledge.fusion import RRF_K, reciprocal_rank_fusion, weighted_fusion
+
+
+def _hits(*pairs):
+    return [{"_id": doc_id, "score": score} for doc_id, score in pairs]
+
+
+def _ids(results):
+    return [doc["_id"] for doc in results]
+
+
+def test_weighted_fusion_normalizes_and_sums():
+    vector = _hits(("a", 0.8), ("b", 0.4))
+    keyword = _hits(("b", 10.0), ("c", 5.0))
+    fused = weighted_fusion([vector, keyword], [0.7, 0.3])
+    scores = {doc["_id"]: doc["combined_score"] for doc in fused}
+    assert scores == pytest.approx({"a": 0.7, "b": 0.35 + 0.3, "c": 0.15})
+    assert _ids(fused) == ["a", "b", "c"]
+
+
+def test_weighted_fusion_document_from_one_retriever():
+    fused = weighted_fusion([_hits(("a", 2.0)), _hits(("z", 1.0))], [0.5, 0.5])
+    assert _ids(fused) == ["a", "z"]
+    assert [doc["combined_score"] for doc in fused] == pytest.approx([0.5, 0.5])
+
+
+def test_weighted_fusion_with_an_empty_side():
+    fused = weighted_fusion([_hits(("a", 3.0), ("b", 1.5)), []], [0.6, 0.4])
+    assert _ids(fused) == ["a", "b"]
+    assert [doc["combined_score"] for doc in fused] == pytest.approx([0.6, 0.3])
+    assert weighted_fusion([[], []], [0.5, 0.5]) == []
+
+
+def test_weighted_fusion_zero_scores_do_not_divide_by_zero():
+    fused = weighted_fusion([_hits(("a", 0.0), ("b", 0.0))], [1.0])
+    assert [doc["combined_score"] for doc in fused] == [0.0, 0.0]
+
+
+def test_ties_keep_first_seen_order():
+    # Equal fused scores: the sort is stable, so the earlier list's order wins
+    fused = weighted_fusion([_hits(("a", 1.0), ("b", 0.5)), _hits(("b", 1.0), ("a", 0.5))], [0.5, 0.5])
+    assert _ids(fused) == ["a", "b"]
+    assert fused[0]["combined_score"] == pytest.approx(fused[1]["combined_score"])
+
+    fused = reciprocal_rank_fusion([_hits(("a", 1), ("b", 1)), _hits(("b", 1), ("a", 1))])
+    assert _ids(fused) == ["a", "b"]
+    assert fused[0]["combined_score"] == pytest.approx(fused[1]["combined_score"])
+
+
+def test_rrf_scores_by_rank():
+    fused = reciprocal_rank_fusion([_hits(("a", 9), ("b", 1)), _hits(("b", 0.1), ("c", 0.05))])
+    scores = {doc["_id"]: doc["combined_score"] for doc in fused}
+    assert scores == pytest.approx({
+        "a": 1 / (RRF_K + 1), "b": 1 / (RRF_K + 2) + 1 / (RRF_K + 1), "c": 1 / (RRF_K + 2)
+    })
+    assert _ids(fused) == ["b", "a", "c"]
+
+
+def test_rrf_document_from_one_retriever_and_an_empty_side():
+    fused = reciprocal_rank_fusion([_hits(("a", 1), ("b", 1)), []], k=1)
+    assert _ids(fused) == ["a", "b"]
+    assert [doc["combined_score"] for doc in fused] == pytest.approx([1 / 2, 1 / 3])
+    assert reciprocal_rank_fusion([[], []]) == []
+
+
+def test_fusion_matches_ids_by_string_and_keeps_the_first_copy():
+    first = {"_id": 1, "score": 1.0, "from": "vector"}
+    fused = reciprocal_rank_fusion([[first], [{"_id": "1", "score": 1.0, "from": "keyword"}]])
+    assert len(fused) == 1 and fused[0] is first
@@ -0,0 +1,54 @@
+from threading import Event
+
+import pytest
+
+from core.knowledge.index_generation import BackgroundBuilder
+
+
+@pytest.fixture
+def builder():
+    builder = BackgroundBuilder("test-builder")
+    yield builder
+    builder.shutdown()
+
+
+def test_runs_build_validate_publish(builder):
+    published = []
+    future = builder.submit(lambda: "generation", lambda g: None, published.append)
+    assert future.result(timeout=5) == "generation"
+    assert published == ["generation"]
+
+
+def test_rejected_generation_is_never_published(builder):
+    published = []
+
+    def validate(generation):
+        raise ValueError("Recall probe failed")
+
+    future = builder.submit(lambda: "generation", validate, published.append)
+    with pytest.raises(ValueError, match="Recall probe"):
+        future.result(timeout=5)
+    assert published == []
+
+    # A failed build does not block the next one
+    assert builder.submit(lambda: "next", lambda g: None, published.append).result(timeout=5) == "next"
+    assert published == ["next"]
+
+
+def test_same_key_joins_the_pending_build(builder):
+    release, builds = Event(), []
+
+    def build():
+        builds.append(1)
+        release.wait(5)
+        return len(builds)
+
+    first = builder.submit(build, lambda g: None, lambda g: None, key=("store", None))
+    second = builder.submit(build, lambda g: None, lambda g: None, key=("store", None))
+    other = builder.submit(build, lambda g: None, lambda g: None, key=("store", "/tmp/other"))
+    assert second is first and other is not first
+
+    release.set()
+    assert first.result(timeout=5) == 1
+    assert other.result(timeout=5) == 2
+    assert len(builds) == 2
@@ -0,0 +1,124 @@
+import time
+from threading import Event, Thread
+
+import pytest
+
+from core.knowledge.ingest_pipeline import IngestPipeline, normalize_record, read_records
+
+
+class FakeWriter:
+    """ImportBatchWriter stand-in: 'prepares' a batch as its contents and records each write"""
+
+    def __init__(self, batch_size=4, fail_prepare_on=None, fail_write_on=None, gate=None):
+        self.batch_size = batch_size
+        self.prepared, self.written = [], []
+        self.fail_prepare_on, self.fail_write_on = fail_prepare_on, fail_write_on
+        self.gate = gate
+        self.closed = False
+
+    def prepare(self, docs):
+        self.prepared.append(len(docs))
+        if len(self.prepared) == self.fail_prepare_on:
+            raise RuntimeError("embedding failed")
+        return [doc["content"] for doc in docs]
+
+    def write(self, operations):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if len(self.written) + 1 == self.fail_write_on:
+            raise RuntimeError("write failed")
+        self.written.append(operations)
+
+    def close(self):
+        self.closed = True
+        return {"written": sum(len(batch) for batch in self.written)}
+
+
+def _records(n, consumed=None):
+    for i in range(n):
+        if consumed is not None:
+            consumed.append(i)
+        yield {"content": f"entry {i}", "reference": str(i)}
+
+
+def _run(pipeline, records, timeout=5):
+    """Run the pipeline in a thread, so a hang fails the test instead of stalling it"""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["stats"] = pipeline.run(records, "test")
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "pipeline did not drain"
+    return outcome
+
+
+def _tagger(content):
+    return ["untagged"]
+
+
+def test_writes_every_record_in_order():
+    writer = FakeWriter(batch_size=4)
+    records = list(_records(10))
+    records.insert(3, {"content": "   "})
+    outcome = _run(IngestPipeline(writer, _tagger, queue_size=2), records)
+
+    assert outcome["stats"] == {"written": 10, "skipped": 1}
+    assert writer.prepared == [4, 4, 2]
+    assert [content for batch in writer.written for content in batch] == [f"entry {i}" for i in range(10)]
+    assert writer.closed
+
+
+@pytest.mark.parametrize("writer, records", [
+    (FakeWriter(batch_size=2, fail_prepare_on=2), _records(200)),
+    (FakeWriter(batch_size=2, fail_write_on=2), _records(200)),
+    (FakeWriter(batch_size=2), (record if i < 50 else 1 / 0 for i, record in enumerate(_records(200)))),
+], ids=["embed", "write", "read"])
+def test_a_failing_stage_drains_the_pipeline(writer, records):
+    outcome = _run(IngestPipeline(writer, _tagger, queue_size=2), records)
+    assert isinstance(outcome["error"], (RuntimeError, ZeroDivisionError))
+    assert writer.closed
+    assert sum(len(batch) for batch in writer.written) < 200
+
+
+def test_bounded_queues_hold_back_the_reader():
+    gate, consumed = Event(), []
+    writer = FakeWriter(batch_size=2, gate=gate)
+    pipeline = IngestPipeline(writer, _tagger, queue_size=2)
+    thread = Thread(target=pipeline.run, args=(_records(1000, consumed), "test"), daemon=True)
+    thread.start()
+    time.sleep(0.3)
+
+    # Docs queue, the batch being built, the operations queue and the batch being written
+    bound = writer.batch_size * (pipeline.queue_size + 1) + writer.batch_size * (pipeline.queue_size + 3)
+    assert len(consumed) <= bound + 1
+
+    gate.set()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert len(consumed) == 1000 and sum(len(batch) for batch in writer.written) == 1000
+
+
+def test_normalize_record_moves_extra_fields_into_metadata():
+    doc = normalize_record({"text": " a  b ", "reference": 7, "tags": "x; y", "book": "Psalms", "empty": ""},
+                           "bible", _tagger, "file:1")
+    assert doc["content"] == "a b" and doc["source"] == "bible" and doc["tags"] == ["x", "y"]
+    assert doc["metadata"] == {"book": "Psalms", "reference": "7"}
+    assert normalize_record({"content": ""}, "bible", _tagger, "file:2") is None
+
+
+def test_read_records_formats(tmp_path):
+    (tmp_path / "a.jsonl").write_text('{"content": "one"}\n\n{"content": "two"}\n')
+    (tmp_path / "b.csv").write_text("content,reference\nthree,3\n")
+    (tmp_path / "c.json").write_text('{"data": [{"content": "four"}]}')
+    (tmp_path / "d.txt").write_text("five")
+    assert [r["content"] for r in read_records(str(tmp_path / "a.jsonl"))] == ["one", "two"]
+    assert list(read_records(str(tmp_path / "b.csv"))) == [{"content": "three", "reference": "3"}]
+    assert [r["content"] for r in read_records(str(tmp_path / "c.json"))] == ["four"]
+    with pytest.raises(ValueError, match="Unsupported corpus file type"):
+        list(read_records(str(tmp_path / "d.txt")))
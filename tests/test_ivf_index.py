@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from core.knowledge.ivf_index import IVFIndex
+from core.knowledge.quantization import recall_at_k
+from core.knowledge.vector_index import VectorIndex, normalize_rows
+
+
+def _clustered_index(clusters=20, per_cluster=40, dimensions=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimensions))
+    vectors = np.repeat(centers, per_cluster, axis=0) + 0.3 * rng.normal(size=(clusters * per_cluster, dimensions))
+    vectors = normalize_rows(vectors.astype(np.float32))
+    n = len(vectors)
+    return VectorIndex(vectors, [f"doc{i}" for i in range(n)], [str(i) for i in range(n)], ["quran"] * n)
+
+
+@pytest.fixture(scope="module")
+def exact():
+    return _clustered_index()
+
+
+@pytest.fixture(scope="module")
+def queries(exact):
+    rng = np.random.default_rng(1)
+    return exact.vectors[rng.choice(len(exact), 25, replace=False)] + 0.05 * rng.normal(size=(25, exact.dimensions))
+
+
+def test_lists_partition_every_row(exact):
+    ivf = IVFIndex.build(exact, nlist=16)
+    assert ivf.list_offsets[-1] == len(exact)
+    assert sorted(ivf.list_rows.tolist()) == list(range(len(exact)))
+
+
+def test_recall_against_exact_search(exact, queries):
+    ivf = IVFIndex.build(exact, nlist=16, nprobe=4)
+    assert recall_at_k(ivf, exact, queries, k=10) >= 0.9
+
+
+def test_probing_every_list_is_exact(exact, queries):
+    ivf = IVFIndex.build(exact, nlist=16, nprobe=16)
+    for query in queries[:5]:
+        assert [row for row, _ in ivf.search(query, 10)] == [row for row, _ in exact.search(query, 10)]
+
+
+def test_mask_widens_probe_until_limit(exact, queries):
+    ivf = IVFIndex.build(exact, nlist=16, nprobe=1)
+    mask = np.zeros(len(exact), dtype=bool)
+    mask[::50] = True
+    results = ivf.search(queries[0], 10, mask=mask)
+    assert len(results) == 10
+    assert all(mask[row] for row, _ in results)
+
+
+def test_save_and_load(exact, queries, tmp_path):
+    ivf = IVFIndex.build(exact, nlist=16, nprobe=4)
+    ivf.save(str(tmp_path))
+    loaded = IVFIndex.load(str(tmp_path), exact, nprobe=4)
+    assert loaded.search(queries[0], 5) == ivf.search(queries[0], 5)
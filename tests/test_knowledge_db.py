@@ -0,0 +1,175 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from core.knowledge import knowledge_db  # noqa: E402
+from core.knowledge.embedding_models import EmbeddingRoute  # noqa: E402
+from core.knowledge.index_generation import BackgroundBuilder, IndexGeneration  # noqa: E402
+from core.knowledge.knowledge_db import KnowledgeRetriever  # noqa: E402
+from core.knowledge.sacred_scanner import SacredScanner  # noqa: E402
+from core.knowledge.vector_index import VectorIndex  # noqa: E402
+
+OLD = EmbeddingRoute("vector", "old-model", 4)
+NEW = EmbeddingRoute("vector_alt", "new-model", 6)
+
+
+def _get(doc, path):
+    for key in path.split('.'):
+        doc = doc.get(key) if isinstance(doc, dict) else None
+    return doc
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = _get(doc, key)
+            if "$exists" in condition and (value is not None) != condition["$exists"]:
+                return False
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif _get(doc, key) != condition:
+            return False
+    return True
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query=None, projection=None):
+        return [dict(doc) for doc in self.docs if _matches(doc, query or {})]
+
+    def aggregate(self, pipeline):
+        raise AssertionError("Atlas search used without USE_ATLAS_VECTOR_SEARCH")
+
+
+class FakeService:
+    def __init__(self, model, dimensions):
+        self.model_name, self.dimensions = model, dimensions
+
+    def encode_query(self, text):
+        return np.ones(self.dimensions, dtype=np.float32)
+
+
+SERVICES = {OLD.model: FakeService(OLD.model, 4), NEW.model: FakeService(NEW.model, 6)}
+
+
+def _docs(n=20):
+    rng = np.random.default_rng(0)
+    return [{
+        "_id": f"doc{i}", "source": "quran", "content": f"verse {i}", "metadata": {"reference": str(i)},
+        "vector": rng.normal(size=4).tolist(), "vector_model": OLD.model,
+        "vector_alt": rng.normal(size=6).tolist(), "vector_alt_model": NEW.model
+    } for i in range(n)]
+
+
+@pytest.fixture
+def retriever(monkeypatch, tmp_path):
+    monkeypatch.delenv("VECTOR_SEARCH_BACKEND", raising=False)
+    monkeypatch.delenv("USE_ATLAS_VECTOR_SEARCH", raising=False)
+    monkeypatch.setattr(knowledge_db, "get_embedding_service", lambda model=None: SERVICES[model])
+    retriever = object.__new__(KnowledgeRetriever)
+    retriever.collection = FakeCollection(_docs())
+    retriever.vector_store_path = str(tmp_path / "vector_store")
+    retriever._live_updater = None
+    retriever._index_builder = BackgroundBuilder("test-indexes")
+    retriever._search_executor = ThreadPoolExecutor(2)
+    retriever._shard_executor = ThreadPoolExecutor(2)
+    retriever.reference_table = None
+    # Mid-migration: the registry already serves the new slot, the resident generation is still the old one
+    retriever._route, retriever._route_checked = NEW, time.monotonic()
+    retriever._generation = IndexGeneration(None, OLD)
+    return retriever
+
+
+def test_local_search_encodes_with_the_generation_model(retriever):
+    embedding, results = retriever.vector_search_with_embedding("mercy", limit=5)
+    assert embedding.shape == (OLD.dimensions,)
+    assert len(results) == 5
+    assert retriever.similarity_search_by_embedding(embedding, limit=3)
+
+
+def test_scan_searches_with_a_matching_embedding(retriever):
+    scanner = object.__new__(SacredScanner)
+    scanner.db = retriever
+    results = scanner.scan("what is mercy?")
+    assert results["all_results"]
+    assert len(results["query_embedding"]) == OLD.dimensions
+
+
+@pytest.fixture
+def store(retriever):
+    """Retriever serving the old route from a published on-disk store of 20 rows"""
+    retriever._route = OLD
+    retriever._generation = IndexGeneration(None, OLD)
+    retriever.build_vector_store()
+    assert len(retriever._generation.vector_index) == 20
+    return retriever
+
+
+def _versions(retriever):
+    return sorted(name for name in os.listdir(retriever.vector_store_path) if name.startswith('v'))
+
+
+def _assert_rejected(retriever, match):
+    serving, versions = retriever._generation, _versions(retriever)
+    current = VectorIndex.current_version(retriever.vector_store_path)
+    with pytest.raises(ValueError, match=match):
+        retriever.rebuild_indexes_async().result(timeout=30)
+    # The old generation keeps serving and the rejected version is gone
+    assert retriever._generation is serving
+    assert VectorIndex.current_version(retriever.vector_store_path) == current
+    assert _versions(retriever) == versions
+    assert retriever.vector_search("mercy", limit=3)
+
+
+def test_rebuild_publishes_a_valid_generation(store):
+    serving = store._generation
+    generation = store.rebuild_indexes_async().result(timeout=30)
+    assert store._generation is generation is not serving
+    assert VectorIndex.current_version(store.vector_store_path) == generation.version_dir
+
+
+def test_rejects_a_build_that_shrank(store):
+    store.collection.docs = store.collection.docs[:10]
+    _assert_rejected(store, "down from 20")
+
+
+def test_rejects_a_corrupted_build(store, monkeypatch):
+    save = VectorIndex.save
+
+    def save_and_corrupt(index, directory, *args, **kwargs):
+        version_dir = save(index, directory, *args, **kwargs)
+        with open(os.path.join(version_dir, 'vectors.npy'), 'r+b') as f:
+            f.seek(-4, os.SEEK_END)
+            f.write(b'\xff\xff\xff\xff')
+        return version_dir
+
+    monkeypatch.setattr(VectorIndex, "save", save_and_corrupt)
+    _assert_rejected(store, "Checksum mismatch")
+
+
+def test_rejects_a_build_failing_the_recall_probe(store, monkeypatch):
+    monkeypatch.setenv("INDEX_MIN_RECALL", "1.01")
+    _assert_rejected(store, "Recall probe")
+
+
+def test_self_recall_detects_a_broken_searcher(store):
+    index = store._generation.vector_index
+
+    class Broken:
+        def search(self, embedding, k):
+            return [(len(index) - 1, 1.0)]
+
+    assert KnowledgeRetriever._self_recall(index, index) == 1.0
+    assert KnowledgeRetriever._self_recall(Broken(), index) < 0.2
@@ -0,0 +1,239 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from bson import ObjectId
+
+pytest.importorskip("sentence_transformers")
+
+from core.knowledge.bm25_index import BM25Index  # noqa: E402
+from core.knowledge.live_index import DeltaSegment, LiveIndexUpdater, merge_hits  # noqa: E402
+from core.knowledge.vector_index import VectorIndex  # noqa: E402
+
+DIMENSIONS = 4
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            if "$gte" in condition and (value is None or value < condition["$gte"]):
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.finds = 0
+
+    def find(self, query=None, projection=None):
+        self.finds += 1
+        return [dict(doc) for doc in self.docs.values() if _matches(doc, query or {})]
+
+
+class FakeRetriever:
+    """What the updater needs from KnowledgeRetriever; compaction rebuilds from the collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.compactions = 0
+        self.fail_compaction = False
+        self.delta = self._build()
+
+    def _build(self):
+        docs = list(self.collection.find({}))
+        return DeltaSegment(VectorIndex.from_cursor(docs), BM25Index.build(docs))
+
+    def _live_delta(self):
+        return self.delta
+
+    def _apply_live_upsert(self, doc):
+        self.delta.upsert(doc)
+
+    def _apply_live_delete(self, doc_id):
+        self.delta.delete(doc_id)
+
+    def compact_live_index(self):
+        self.compactions += 1
+        if self.fail_compaction:
+            raise RuntimeError("rebuild failed")
+        self.delta = self._build()
+
+
+def _doc(i, created_at, **fields):
+    rng = np.random.default_rng(i)
+    return {"_id": ObjectId(), "source": "quran" if i % 2 else "bible", "content": f"verse {i} about mercy",
+            "tags": ["mercy"] if i % 3 == 0 else ["patience"], "metadata": {"reference": str(i)},
+            "vector": rng.normal(size=DIMENSIONS).tolist(), "created_at": created_at, **fields}
+
+
+def _collection(n=50, age=timedelta(hours=1)):
+    created_at = datetime.utcnow() - age
+    return FakeCollection([_doc(i, created_at) for i in range(n)])
+
+
+@pytest.fixture
+def delta():
+    return FakeRetriever(_collection(10)).delta
+
+
+def test_upsert_replaces_the_base_row(delta):
+    doc_id = delta.vector_index.ids[0]
+    updated = dict(_doc(0, datetime.utcnow()), _id=doc_id, vector=[1.0, 0.0, 0.0, 0.0])
+    delta.upsert(updated)
+
+    assert len(delta) == 1 and delta.tombstones == 1
+    assert not delta.vector_tombstones.mask()[0]
+    assert delta.keyword_tombstones.mask() is not None
+    assert delta.search_vectors([1, 0, 0, 0], 5) == [(doc_id, pytest.approx(1.0))]
+    assert delta.live_rows() == 10
+
+
+def test_insert_and_delete(delta):
+    doc = _doc(99, datetime.utcnow())
+    delta.upsert(doc)
+    assert delta.tombstones == 0 and delta.live_rows() == 11
+    assert doc["_id"] in delta.known_ids()
+
+    delta.delete(doc["_id"])
+    base_id = delta.vector_index.ids[3]
+    delta.delete(base_id)
+    assert len(delta) == 0 and delta.tombstones == 1
+    assert delta.live_rows() == 9
+    assert not {doc["_id"], base_id} & delta.known_ids()
+
+
+def test_mismatched_vectors_stay_keyword_only(delta):
+    short = _doc(1, datetime.utcnow(), vector=[1.0, 0.0])
+    other_model = _doc(2, datetime.utcnow(), vector_model="another-model")
+    delta.upsert(short)
+    delta.upsert(other_model)
+    assert delta.search_vectors([1, 0, 0, 0], 5) == []
+    assert {doc_id for doc_id, _ in delta.search_keywords("mercy", 5)} == {short["_id"], other_model["_id"]}
+
+
+def test_delta_search_applies_sources_and_filters(delta):
+    quran = _doc(1, datetime.utcnow(), vector=[1.0, 0.0, 0.0, 0.0], tags=["mercy"])
+    bible = _doc(2, datetime.utcnow(), vector=[0.9, 0.1, 0.0, 0.0], tags=["comfort"])
+    delta.upsert(quran)
+    delta.upsert(bible)
+    assert [doc_id for doc_id, _ in delta.search_vectors([1, 0, 0, 0], 5)] == [quran["_id"], bible["_id"]]
+    assert [doc_id for doc_id, _ in delta.search_vectors([1, 0, 0, 0], 5, sources=["bible"])] == [bible["_id"]]
+    assert [doc_id for doc_id, _ in delta.search_vectors([1, 0, 0, 0], 5, filters={"tags": "comfort"})] == [
+        bible["_id"]
+    ]
+    assert [doc_id for doc_id, _ in delta.search_keywords("verse", 5, source="quran")] == [quran["_id"]]
+
+
+def test_merge_hits_orders_by_score():
+    base = [("a", 0.9), ("b", 0.5), ("c", 0.1)]
+    assert merge_hits(base, [], 2) == [("a", 0.9), ("b", 0.5)]
+    assert merge_hits(base, [("d", 0.7), ("e", 0.05)], 4) == [("a", 0.9), ("d", 0.7), ("b", 0.5), ("c", 0.1)]
+
+
+def test_overlap_re_reads_are_not_pending_changes(delta):
+    # Rewritten before the base build (within the catch-up overlap): applied, but not a change
+    old = dict(_doc(0, delta.vector_index.created_at - timedelta(seconds=5)), _id=delta.vector_index.ids[0])
+    delta.upsert(old)
+    assert delta.tombstones == 1
+    assert delta.pending == 0 and delta.changed_rows == 0
+
+    # The same entry changed after the build counts, and stays counted
+    delta.upsert(dict(old, updated_at=datetime.utcnow()))
+    delta.upsert(old)
+    assert delta.pending == 1 and delta.changed_rows == 1
+
+
+def test_watermark_starts_at_base_build_minus_overlap():
+    retriever = FakeRetriever(_collection(10))
+    updater = LiveIndexUpdater(retriever)
+    updater._ensure_delta()
+    assert updater._watermark >= retriever.delta.vector_index.created_at - LiveIndexUpdater.OVERLAP
+
+    retriever.delta = retriever._build()
+    updater._ensure_delta()
+    assert updater._watermark >= retriever.delta.vector_index.created_at - LiveIndexUpdater.OVERLAP
+
+
+def test_poll_applies_changes_and_keeps_the_overlap():
+    collection = _collection(10)
+    retriever = FakeRetriever(collection)
+    updater = LiveIndexUpdater(retriever)
+    updater._ensure_delta()
+    since = updater._watermark
+
+    new = _doc(50, datetime.utcnow())
+    collection.docs[new["_id"]] = new
+    updater._poll()
+    assert new["_id"] in retriever.delta.known_ids()
+    assert since <= updater._watermark <= datetime.utcnow() - LiveIndexUpdater.OVERLAP + timedelta(seconds=1)
+
+    # The watermark never moves backwards
+    watermark = updater._watermark
+    updater._poll()
+    assert updater._watermark >= watermark
+
+
+def test_poll_without_watermark_starts_from_now():
+    updater = LiveIndexUpdater(FakeRetriever(_collection(3)))
+    updater._poll()
+    assert abs((datetime.utcnow() - LiveIndexUpdater.OVERLAP - updater._watermark).total_seconds()) < 1
+
+
+def test_one_bulk_update_compacts_exactly_once():
+    collection = _collection(50)
+    retriever = FakeRetriever(collection)
+    updater = LiveIndexUpdater(retriever, compact_ratio=0.1)
+    updater._ensure_delta()
+
+    for doc in list(collection.docs.values())[:10]:
+        doc.update(content=doc["content"] + " edited", updated_at=datetime.utcnow())
+    for _ in range(5):
+        updater._ensure_delta()
+        updater._poll()
+        updater._maybe_compact()
+
+    assert retriever.compactions == 1
+    # The catch-up after the compaction re-read the edits (and the recent _ids), without counting them
+    assert retriever.delta.tombstones >= 10
+    assert retriever.delta.pending == 0 and retriever.delta.changed_rows == 0
+
+
+def test_small_delta_does_not_compact():
+    collection = _collection(50)
+    retriever = FakeRetriever(collection)
+    updater = LiveIndexUpdater(retriever, compact_ratio=0.1)
+    updater._ensure_delta()
+    next(iter(collection.docs.values()))["updated_at"] = datetime.utcnow()
+    updater._poll()
+    updater._maybe_compact()
+    assert retriever.compactions == 0
+
+
+def test_failed_compaction_backs_off():
+    collection = _collection(20)
+    retriever = FakeRetriever(collection)
+    retriever.fail_compaction = True
+    updater = LiveIndexUpdater(retriever, compact_ratio=0.1)
+    updater._ensure_delta()
+    for doc in list(collection.docs.values())[:5]:
+        doc["updated_at"] = datetime.utcnow()
+    updater._poll()
+
+    updater._maybe_compact()
+    updater._maybe_compact()
+    assert retriever.compactions == 1
+    assert updater._compact_after > datetime.utcnow() + timedelta(seconds=50)
+
+    # Once the backoff has passed it retries, and a success clears the failure count
+    retriever.fail_compaction = False
+    updater._compact_after = datetime.utcnow() - timedelta(seconds=1)
+    updater._maybe_compact()
+    assert retriever.compactions == 2
+    assert updater._compact_failures == 0 and updater._compact_after is None
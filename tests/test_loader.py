@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from core.knowledge.loader import ThemeGenerator  # noqa: E402
+
+TEXTS = ["mercy and forgiveness", "mercy for the forgiven", "patience in hardship", "patience through trials"]
+
+
+class FakeService:
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.encoded = []
+
+    def encode_corpus(self, texts):
+        self.encoded.append(list(texts))
+        return np.array([[1.0, 0.0] if "mercy" in text else [0.0, 1.0] for text in texts])
+
+
+class FakeRetriever:
+    def __init__(self, model_name):
+        self.embedding_model = FakeService(model_name)
+
+    def get_all_entries(self):
+        return [{"content": text} for text in TEXTS]
+
+
+def test_themes_use_the_serving_model():
+    db = FakeRetriever("old-model")
+    generator = ThemeGenerator(db)
+    themes = generator.generate_themes(n_clusters=2)
+    assert db.embedding_model.encoded == [TEXTS]
+    assert sorted("mercy" in keywords for keywords in themes.values()) == [False, True]
+
+    # A cutover swaps the retriever's shared service; the next run follows it
+    db.embedding_model = FakeService("new-model")
+    generator.generate_themes(n_clusters=2)
+    assert db.embedding_model.encoded == [TEXTS]
+    assert generator.model.model_name == "new-model"
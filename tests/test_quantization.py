@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from core.knowledge.quantization import ProductQuantizer, QuantizedIndex, ScalarQuantizer, recall_at_k
+from core.knowledge.vector_index import VectorIndex, normalize_rows
+
+
+@pytest.fixture(scope="module")
+def exact():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 32))
+    vectors = normalize_rows((np.repeat(centers, 40, axis=0) + 0.3 * rng.normal(size=(800, 32))).astype(np.float32))
+    return VectorIndex(vectors, [f"doc{i}" for i in range(800)], [str(i) for i in range(800)], ["quran"] * 800)
+
+
+@pytest.fixture(scope="module")
+def queries(exact):
+    rng = np.random.default_rng(1)
+    return exact.vectors[rng.choice(len(exact), 25, replace=False)] + 0.05 * rng.normal(size=(25, exact.dimensions))
+
+
+def test_scalar_scores_approximate_inner_products():
+    rng = np.random.default_rng(2)
+    vectors = normalize_rows(rng.normal(size=(200, 16)).astype(np.float32))
+    query = vectors[0]
+    quantizer = ScalarQuantizer.train(vectors)
+    approximate = quantizer.scores(quantizer.encode(vectors), query)
+    assert np.abs(approximate - vectors @ query).max() < 0.05
+
+
+def test_pq_codes_and_lookup_scores():
+    rng = np.random.default_rng(3)
+    vectors = normalize_rows(rng.normal(size=(300, 16)).astype(np.float32))
+    quantizer = ProductQuantizer.train(vectors, m=4, ksub=32)
+    codes = quantizer.encode(vectors)
+    assert codes.shape == (300, 4) and codes.dtype == np.uint8
+    # Lookup-table scores equal the inner product with the reconstructed vectors
+    reconstructed = np.concatenate([quantizer.codebooks[i][codes[:, i]] for i in range(4)], axis=1)
+    assert np.allclose(quantizer.scores(codes, vectors[0]), reconstructed @ vectors[0], atol=1e-5)
+
+
+def test_pq_rejects_uneven_split():
+    with pytest.raises(ValueError):
+        ProductQuantizer.train(np.zeros((10, 10), dtype=np.float32), m=3)
+
+
+@pytest.mark.parametrize("kind, kwargs", [("int8", {}), ("pq", {"m": 8, "ksub": 64})])
+def test_recall_against_exact_search(exact, queries, kind, kwargs):
+    index = QuantizedIndex.build(exact, kind, rerank_factor=4, **kwargs)
+    assert recall_at_k(index, exact, queries, k=10) >= 0.95
+    assert index.memory_footprint()["compression_ratio"] > 1
+
+
+def test_reranked_scores_are_exact(exact, queries):
+    index = QuantizedIndex.build(exact, "int8")
+    expected = dict(exact.search(queries[0], 10))
+    for row, score in index.search(queries[0], 10):
+        assert score == pytest.approx(expected[row], abs=1e-5)
+
+
+def test_mask_and_reload(exact, queries, tmp_path):
+    index = QuantizedIndex.build(exact, "pq", m=8, ksub=64)
+    mask = np.zeros(len(exact), dtype=bool)
+    mask[:100] = True
+    assert all(row < 100 for row, _ in index.search(queries[0], 10, mask=mask))
+    index.save(str(tmp_path))
+    loaded = QuantizedIndex.load(str(tmp_path), exact, "pq")
+    assert loaded.search(queries[0], 5) == index.search(queries[0], 5)
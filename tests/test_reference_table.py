@@ -0,0 +1,76 @@
+import pytest
+
+from core.knowledge.reference_table import (
+    ParsedReference, ReferenceTable, detect_references, is_citation_only, parse_reference
+)
+
+
+@pytest.mark.parametrize("reference, expected", [
+    ("2:255", ParsedReference("quran", "", 2, 255, 255)),
+    (" 2 : 255 - 257 ", ParsedReference("quran", "", 2, 255, 257)),
+    ("2:255–257", ParsedReference("quran", "", 2, 255, 257)),
+    ("John 3:16", ParsedReference("bible", "john", 3, 16, 16)),
+    ("John 3:16-18", ParsedReference("bible", "john", 3, 16, 18)),
+    ("1John 4:7-8", ParsedReference("bible", "1 john", 4, 7, 8)),
+    ("1 john 4:7", ParsedReference("bible", "1 john", 4, 7, 7)),
+    ("Song of Solomon 2:1", ParsedReference("bible", "song of solomon", 2, 1, 1)),
+    ("Psalm 23:1", ParsedReference("bible", "psalms", 23, 1, 1)),
+])
+def test_parse_reference(reference, expected):
+    assert parse_reference(reference) == expected
+
+
+@pytest.mark.parametrize("reference", ["2:257-255", "John 3:18-16", "John 3", "hello", "2255", ""])
+def test_unparseable_references(reference):
+    assert parse_reference(reference) is None
+
+
+def test_source_restricts_the_format():
+    assert parse_reference("2:255", source="bible") is None
+    assert parse_reference("John 3:16", source="quran") is None
+    assert parse_reference("John 3:16", source="bible").book == "john"
+
+
+def _table():
+    docs = [{"_id": f"q{v}", "source": "quran", "metadata": {"surah_number": 2, "ayah_number": v}}
+            for v in range(250, 260)]
+    docs += [{"_id": f"j{v}", "source": "bible", "metadata": {"book": "John", "chapter": 3, "verse": v}}
+             for v in range(1, 20)]
+    docs.append({"_id": "other", "source": "hadith", "metadata": {"reference": "1"}})
+    return ReferenceTable.from_cursor(docs)
+
+
+def test_resolve_range_with_neighbours():
+    table = _table()
+    assert len(table) == 29
+    assert table.resolve(parse_reference("2:255-256"), neighbours=1) == [
+        ("q254", True), ("q255", False), ("q256", False), ("q257", True)
+    ]
+    assert table.resolve(parse_reference("1 john 3:16")) == []
+    assert [doc_id for doc_id, _ in table.resolve(parse_reference("john 3:1"), neighbours=2)] == ["j1", "j2", "j3"]
+
+
+def test_missing_verses_are_skipped():
+    assert _table().resolve(parse_reference("2:258-262")) == [("q258", False), ("q259", False)]
+
+
+def test_detect_references():
+    assert detect_references("Compare John 3:16-18 with 1john 4:8 and Quran 2:255") == [
+        "John 3:16-18", "1 John 4:8", "2:255"
+    ]
+    assert detect_references("2:255") == ["2:255"]
+    # A bare chapter:verse inside a sentence is a time or ratio, not a citation
+    assert detect_references("meet at 10:30 about Surah 200:1") == []
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("John 3:16", True),
+    ("2:255", True),
+    ("Show me Quran 2:255 please", True),
+    ("read John 3:16 and Psalm 23:1", True),
+    ("What does John 3:16 mean for forgiveness?", False),
+    ("I feel lonely, does Surah 94:5 apply to me?", False),
+    ("Tell me about patience", False),
+])
+def test_is_citation_only(message, expected):
+    assert is_citation_only(message) is expected
@@ -0,0 +1,52 @@
+import re
+
+import pytest
+
+from core.knowledge.theme_tagger import THEME_HIERARCHY, ThemeTagger, _trie_pattern
+
+WORDS = ["for", "forgive", "forgiveness", "fort", "pardon", "a+b"]
+
+
+def test_trie_pattern_matches_exactly_the_words():
+    pattern = re.compile(f"(?:{_trie_pattern(WORDS)})$")
+    for word in WORDS:
+        assert pattern.match(word)
+    for other in ["fo", "forg", "forgiv", "pardons", "ab", ""]:
+        assert not pattern.match(other)
+
+
+def test_trie_pattern_prefers_longest_keyword():
+    pattern = re.compile(_trie_pattern(WORDS))
+    assert pattern.match("forgiveness is").group() == "forgiveness"
+    assert pattern.match("forgiven").group() == "forgive"
+    assert pattern.match("fortune").group() == "fort"
+
+
+def test_substring_matching_like_keyword_in_text():
+    lexicon = {"mercy": ["forgiv", "merc"], "fortitude": ["fort"], "general": ["for"]}
+    tagger = ThemeTagger(lexicon)
+    text = "Comfort me, forgiving Lord, for your mercy"
+    assert tagger.match(text) == [theme for theme, words in lexicon.items() if any(w in text.lower() for w in words)]
+
+
+def test_overlapping_keywords_are_all_seen():
+    tagger = ThemeTagger({"a": ["abc"], "b": ["bcd"]})
+    assert tagger.match("xabcdx") == ["a", "b"]
+
+
+def test_whole_words():
+    tagger = ThemeTagger(THEME_HIERARCHY, whole_words=True)
+    assert tagger.match("Forgive me, I feel lonely") == ["mercy", "comfort"]
+    assert tagger.match("forgiveness and peaceful days") == []
+    assert tagger.match("Musa prayed at dawn with dua") == ["prophets", "prayer"]
+
+
+def test_shorter_keyword_inside_longer_word_needs_a_boundary():
+    tagger = ThemeTagger({"short": ["peace"], "long": ["peaceful"]}, whole_words=True)
+    assert tagger.match("a peaceful day") == ["long"]
+    assert tagger.match("peace-ful") == ["short"]
+
+
+@pytest.mark.parametrize("text", ["", None])
+def test_empty_text(text):
+    assert ThemeTagger(THEME_HIERARCHY).match(text) == []
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from bson import BSON, Binary
+
+from core.knowledge.vector_codec import (BSON_VECTOR_SUBTYPE, FLOAT16_SUBTYPE, decode_vector, encode_vector,
+                                         migrate_vectors, storage_of)
+
+VECTOR = [0.25, -1.5, 3.0, 0.1]
+
+
+def _round_trip(value):
+    """Through BSON and back, as MongoDB would store and return it"""
+    return BSON.decode(BSON.encode({"vector": value}))["vector"]
+
+
+def test_float32_round_trip():
+    stored = _round_trip(encode_vector(VECTOR, "float32"))
+    assert isinstance(stored, Binary) and stored.subtype == BSON_VECTOR_SUBTYPE
+    assert storage_of(stored) == "float32"
+    decoded = decode_vector(stored)
+    assert decoded.dtype == np.float32
+    assert decoded.tolist() == np.asarray(VECTOR, dtype=np.float32).tolist()
+
+
+def test_float16_round_trip():
+    stored = _round_trip(encode_vector(VECTOR, "float16"))
+    assert isinstance(stored, Binary) and stored.subtype == FLOAT16_SUBTYPE
+    assert storage_of(stored) == "float16"
+    decoded = decode_vector(stored)
+    assert decoded.dtype == np.float16
+    np.testing.assert_allclose(decoded, VECTOR, atol=1e-3)
+
+
+def test_legacy_list_vectors():
+    stored = _round_trip(encode_vector(np.asarray(VECTOR), "array"))
+    assert stored == pytest.approx(VECTOR) and storage_of(stored) == "array"
+    decoded = decode_vector([1, 2, 3])
+    assert decoded.dtype == np.float32 and decoded.tolist() == [1.0, 2.0, 3.0]
+
+
+def test_missing_vector_decodes_to_none():
+    assert decode_vector(None) is None
+    assert storage_of(None) is None
+
+
+def test_storage_comes_from_the_environment(monkeypatch):
+    monkeypatch.setenv("VECTOR_STORAGE", "float16")
+    assert storage_of(encode_vector(VECTOR)) == "float16"
+    monkeypatch.setenv("VECTOR_STORAGE", "bfloat16")
+    with pytest.raises(ValueError, match="Unknown VECTOR_STORAGE"):
+        encode_vector(VECTOR)
+
+
+def test_unsupported_bindata_is_rejected():
+    with pytest.raises(ValueError, match="subtype 0"):
+        decode_vector(Binary(b"\x00" * 8, 0))
+    # A BSON vector of int8 (dtype 0x03) is not a float32 embedding
+    with pytest.raises(ValueError, match="dtype 0x03"):
+        decode_vector(Binary(bytes([0x03, 0]) + b"\x01\x02", BSON_VECTOR_SUBTYPE))
+    assert storage_of(Binary(b"\x00" * 8, 0)) is None
+
+
+class _Result:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+
+    def find(self, query, projection=None):
+        return [dict(doc) for doc in self.docs.values()]
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            self.docs[operation._filter["_id"]].update(operation._doc["$set"])
+        return _Result(len(operations))
+
+
+def test_migration_skips_converted_vectors_and_can_rerun():
+    collection = FakeCollection([
+        {"_id": 1, "vector": VECTOR},
+        {"_id": 2, "vector": encode_vector(VECTOR, "float32")},
+        {"_id": 3, "vector": None, "vector_alt": VECTOR},
+    ])
+    stats = migrate_vectors(collection, "float32", batch_size=1, slots=("vector", "vector_alt"))
+    assert stats["scanned"] == 3 and stats["converted"] == 2
+    assert stats["bytes_after"] < stats["bytes_before"]
+    assert all(storage_of(doc["vector"] or doc["vector_alt"]) == "float32" for doc in collection.docs.values())
+    assert migrate_vectors(collection, "float32", slots=("vector", "vector_alt"))["converted"] == 0
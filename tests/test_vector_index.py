@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from core.knowledge.vector_index import VectorIndex, top_k
+
+SOURCES = ["quran", "bible", "hadith"]
+
+
+@pytest.fixture(scope="module")
+def index():
+    rng = np.random.default_rng(0)
+    # Sources interleaved in the cursor, as they come back from MongoDB
+    docs = [
+        {"_id": f"doc{i}", "source": SOURCES[i % 3], "vector": rng.normal(size=8).tolist(),
+         "metadata": {"reference": str(i)}}
+        for i in range(90)
+    ]
+    return VectorIndex.from_cursor(docs)
+
+
+@pytest.fixture(scope="module")
+def query():
+    return np.random.default_rng(1).normal(size=8)
+
+
+def _brute_force(index, query, limit, rows):
+    scores = index.vectors[rows] @ (query / np.linalg.norm(query))
+    return [int(rows[i]) for i in np.argsort(-scores)[:limit]]
+
+
+def test_top_k_orders_best_first():
+    assert top_k(np.array([0.1, 0.9, 0.5, 0.7]), 2).tolist() == [1, 3]
+    assert top_k(np.array([0.1, 0.9]), 5).tolist() == [1, 0]
+    assert top_k(np.array([0.1]), 0).size == 0
+
+
+def test_rows_are_grouped_into_contiguous_shards(index):
+    assert set(index.shards) == set(SOURCES)
+    for source, shard in index.shards.items():
+        assert isinstance(shard, slice)
+        assert set(index.sources[shard]) == {source}
+        assert shard.stop - shard.start == 30
+
+
+def test_null_source_and_metadata_are_tolerated():
+    docs = [
+        {"_id": "a", "source": "quran", "vector": [1.0, 0.0], "metadata": {"reference": "1:1"}},
+        {"_id": "b", "source": None, "vector": [0.0, 1.0], "metadata": None},
+        {"_id": "c", "vector": [1.0, 1.0], "metadata": {"reference": None}},
+    ]
+    index = VectorIndex.from_cursor(docs)
+    assert index.ids == ["b", "c", "a"]
+    assert index.sources == ["", "", "quran"] and index.references == ["", "", "1:1"]
+    assert index.shards[""] == slice(0, 2)
+
+
+def test_source_search_matches_brute_force(index, query):
+    for sources in (["bible"], ["quran", "hadith"]):
+        rows = np.flatnonzero(index.source_mask(sources))
+        assert [row for row, _ in index.search(query, 5, sources=sources)] == _brute_force(index, query, 5, rows)
+    assert index.search(query, 5, sources=["unknown"]) == []
+
+
+def test_parallel_fan_out_matches_serial(index, query):
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        assert index.search(query, 10, executor=executor) == index.search(query, 10)
+
+
+def test_mask_combines_with_sources(index, query):
+    mask = np.zeros(len(index), dtype=bool)
+    mask[::4] = True
+    results = index.search(query, 5, sources=["quran"], mask=mask)
+    rows = np.flatnonzero(mask & index.source_mask(["quran"]))
+    assert [row for row, _ in results] == _brute_force(index, query, 5, rows)
+
+
+def test_dimension_mismatch(index):
+    with pytest.raises(ValueError):
+        index.search(np.ones(4), 5)
+
+
+def test_save_and_load_keep_the_shards(index, query, tmp_path):
+    index.save(str(tmp_path))
+    loaded = VectorIndex.load(str(tmp_path))
+    assert loaded.ids == index.ids
+    assert loaded.shards == index.shards
+    assert loaded.search(query, 5, sources=["bible"]) == index.search(query, 5, sources=["bible"])